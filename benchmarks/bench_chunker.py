@@ -0,0 +1,93 @@
+"""Benchmark trs.chunker.TextSplitter against llama_index's SentenceSplitter.
+
+Measures cold import time (in a fresh interpreter), split time and the
+resulting chunk sizes for the default 1024/200 configuration. The
+llama_index comparison is skipped if it is not installed.
+
+    python benchmarks/bench_chunker.py --paragraphs 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from trs.chunker import TextSplitter  # noqa: E402
+from trs.utils import get_encoding  # noqa: E402
+
+
+WORDS = (
+    'threat actor loader payload persistence registry scheduled task beacon '
+    'command control server exfiltration credential dumping lateral movement '
+    'phishing attachment macro powershell rundll32 T1059.001 CVE-2023-34362'
+).split()
+
+
+def synthetic_report(paragraphs: int, seed: int = 1337) -> str:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(paragraphs):
+        sentences = [
+            ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + '.'
+            for _ in range(rng.randint(2, 8))
+        ]
+        out.append(' '.join(sentences))
+    return '\n\n'.join(out)
+
+
+def import_time(statement: str) -> str:
+    code = f'import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)'
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return 'unavailable'
+    return f'{float(result.stdout.strip().splitlines()[-1]):.3f}s'
+
+
+def timed(func, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def describe(name: str, seconds: float, chunks) -> None:
+    encoding = get_encoding('cl100k_base')
+    sizes = [len(encoding.encode_ordinary(chunk)) for chunk in chunks]
+    print(
+        f'{name:<22} {seconds:>9.3f}s {len(chunks):>7} chunks '
+        f'avg {sum(sizes) / max(len(sizes), 1):>7.1f} tok  max {max(sizes, default=0):>5} tok'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark text chunking')
+    parser.add_argument('--paragraphs', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--overlap', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('cold import')
+    print(f'  trs.chunker            {import_time("import trs.chunker")}')
+    print(f'  llama_index splitter   {import_time("from llama_index.text_splitter import SentenceSplitter")}')
+
+    text = synthetic_report(args.paragraphs)
+    get_encoding('cl100k_base')  # exclude the one-time encoding load
+    print(f'\nsplit {len(text)} chars (chunk_size={args.chunk_size}, overlap={args.overlap})')
+
+    splitter = TextSplitter(chunk_size=args.chunk_size, overlap=args.overlap)
+    describe('trs TextSplitter', *timed(lambda: splitter.split(text), args.repeat))
+
+    try:
+        from llama_index.text_splitter import SentenceSplitter
+    except Exception as err:
+        print(f'llama_index unavailable, skipping comparison: {err}')
+    else:
+        legacy = SentenceSplitter(chunk_size=args.chunk_size, chunk_overlap=args.overlap)
+        describe('llama_index splitter', *timed(lambda: legacy.split_text(text), args.repeat))
@@ -0,0 +1,82 @@
+"""Benchmark IOC extraction on large synthetic reports.
+
+Compares the single-pass `trs.iocs.extract_iocs` with the previous
+implementation (three iocextract passes with list-based dedupe).
+
+    python benchmarks/bench_iocs.py --rows 20000
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+
+import iocextract
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trs.iocs import extract_iocs  # noqa: E402
+
+
+def legacy_extract_iocs(content: str) -> dict:
+    iocs = {'ips': [], 'urls': [], 'hashes': []}
+    for ioc in iocextract.extract_ipv4s(content):
+        if ioc not in iocs['ips']:
+            iocs['ips'].append(ioc)
+    for ioc in iocextract.extract_urls(content, defang=True):
+        if ioc not in iocs['urls']:
+            iocs['urls'].append(ioc)
+    for ioc in iocextract.extract_hashes(content):
+        if ioc not in iocs['hashes']:
+            iocs['hashes'].append(ioc)
+    return iocs
+
+
+def synthetic_report(rows: int, seed: int = 1337) -> str:
+    """Report prose followed by IOC tables, the shape that hurts the most"""
+    rng = random.Random(seed)
+    lines = [
+        'The threat actor used spearphishing attachments to deliver a loader that '
+        'contacted its command and control infrastructure over HTTPS (T1071.001).'
+    ] * (rows // 10)
+
+    for i in range(rows):
+        ip = '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+        digest = hashlib.sha256(str(i).encode()).hexdigest()
+        md5 = hashlib.md5(str(i).encode()).hexdigest()
+        domain = f'c2-{rng.randint(0, rows)}.example{rng.randint(0, 50)}.com'
+        lines.append(f'| {ip} | hxxps://{domain.replace(".", "[.]")}/gate.php | {digest} | {md5} | CVE-2023-{i % 9999:04d} |')
+    return '\n'.join(lines)
+
+
+def timed(func, content: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark IOC extraction')
+    parser.add_argument('--rows', type=int, nargs='+', default=[500, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '--legacy-max-rows',
+        type=int,
+        default=500,
+        help='Only time the legacy extractor up to this many rows (it takes minutes beyond that)'
+    )
+    args = parser.parse_args()
+
+    print(f'{"rows":>8} {"chars":>12} {"current (s)":>12} {"legacy (s)":>12} {"speedup":>8}')
+    for rows in args.rows:
+        content = synthetic_report(rows)
+        current = timed(extract_iocs, content, args.repeat)
+        if rows > args.legacy_max_rows:
+            print(f'{rows:>8} {len(content):>12} {current:>12.3f} {"-":>12} {"-":>8}')
+            continue
+        legacy = timed(legacy_extract_iocs, content, args.repeat)
+        print(f'{rows:>8} {len(content):>12} {current:>12.3f} {legacy:>12.3f} {legacy / current:>7.1f}x')
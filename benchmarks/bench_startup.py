@@ -0,0 +1,69 @@
+"""Measure trs cold-start cost in fresh interpreters.
+
+Each measurement runs in a new Python process inside a temporary working
+directory (TRS keeps its data in ./data), and the median of `--repeat`
+runs is reported. No network access is needed: the OpenAI connectivity
+check is deferred and never triggered here.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SETUP = 'import time; t = time.perf_counter()\n'
+REPORT = '\nprint(time.perf_counter() - t)'
+
+CASES = {
+    'import trs.main': 'import trs.main',
+    'TRS()': 'from trs.main import TRS\nTRS(openai_key="sk-benchmark")',
+    'TRS() + splitter': 'from trs.main import TRS\nTRS(openai_key="sk-benchmark").splitter',
+    'TRS() + vdb': 'from trs.main import TRS\nTRS(openai_key="sk-benchmark").vdb',
+    'TRS() + llm': 'from trs.main import TRS\nTRS(openai_key="sk-benchmark").llm',
+}
+
+
+def run(code: str, cwd: str) -> float:
+    env = {**os.environ, 'PYTHONPATH': ROOT, 'LOGURU_LEVEL': 'WARNING'}
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def cli_help(cwd: str) -> float:
+    code = (
+        'import time, subprocess, sys; t = time.perf_counter(); '
+        f'subprocess.run([sys.executable, {os.path.join(ROOT, "trs-cli.py")!r}, "--help"], capture_output=True)'
+        + REPORT
+    )
+    return run(code, cwd)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark trs startup')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='trs-bench-')
+    shutil.copytree(os.path.join(ROOT, 'prompts'), os.path.join(workdir, 'prompts'))
+    try:
+        print(f'{"case":<22} {"median (s)":>10} {"min (s)":>10}')
+        measurements = {name: lambda code=code: run(SETUP + code + REPORT, workdir) for name, code in CASES.items()}
+        measurements['trs-cli.py --help'] = lambda: cli_help(workdir)
+
+        for name, measure in measurements.items():
+            try:
+                times = [measure() for _ in range(args.repeat)]
+            except RuntimeError as err:
+                print(f'{name:<22} failed: {err}')
+                continue
+            print(f'{name:<22} {statistics.median(times):>10.3f} {min(times):>10.3f}')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
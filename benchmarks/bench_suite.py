@@ -0,0 +1,289 @@
+"""Offline end-to-end benchmark suite for trs.
+
+Runs against local stand-ins only (see `fakes.py`): a fake OpenAI server
+with configurable latency, a fixture HTTP server for a generated corpus of
+HTML and PDF reports, and the deterministic `hashing` embedding backend.
+No API key or internet access is used.
+
+Cases (all metrics are seconds, lower is better):
+  iocs       extract_iocs on synthetic reports of increasing size
+  chunker    TextSplitter.split on a synthetic report
+  query      VectorDB.query latency (p50/p95) at increasing collection sizes
+  ingest     TRS.ingest_many over the HTML and PDF fixture corpus
+  retrieve   TRS.retrieve latency (p50) for exact-token and free-text queries
+  summarize  end-to-end TRS.summarize latency on fresh URLs
+
+Save a baseline and compare later runs against it to catch regressions:
+
+    python benchmarks/bench_suite.py --output baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json --tolerance 0.25
+
+Note: tiktoken downloads its `cl100k_base` encoding on first use and the
+HTML parser may need NLTK data; run once online (or set TIKTOKEN_CACHE_DIR
+to a warm cache) before using the suite offline. Cases that fail are
+reported and skipped.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import urllib.request
+
+from typing import Callable, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from fakes import FakeOpenAI, FixtureServer, synthetic_report  # noqa: E402
+from trs.embeddings import BACKENDS, get_backend  # noqa: E402
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def bench_iocs(args, workdir: str) -> Dict[str, float]:
+    from trs.iocs import extract_iocs
+
+    metrics = {}
+    for paragraphs in args.ioc_paragraphs:
+        text = synthetic_report(paragraphs, ioc_rate=0.05)
+        metrics[f'iocs.extract[{paragraphs}p]'] = best_of(lambda: extract_iocs(text), args.repeat)
+    return metrics
+
+
+def bench_chunker(args, workdir: str) -> Dict[str, float]:
+    from trs.chunker import TextSplitter
+
+    splitter = TextSplitter(chunk_size=1024, overlap=200)
+    text = synthetic_report(args.chunker_paragraphs)
+    splitter.split(text[:1000])  # load the encoding outside the timing
+    return {f'chunker.split[{args.chunker_paragraphs}p]': best_of(lambda: splitter.split(text), args.repeat)}
+
+
+def bench_query(args, workdir: str) -> Dict[str, float]:
+    from trs.vectordb import VectorDB
+
+    metrics = {}
+    for size in args.query_sizes:
+        vdb = VectorDB(
+            collection_name=f'bench-{args.embeddings}-{size}',
+            db_dir=os.path.join(workdir, 'query'),
+            n_results=3,
+            embeddings=get_backend(args.embeddings, openai_key='sk-benchmark')
+        )
+        texts = synthetic_report(size, seed=size).split('\n\n')
+        for i in range(0, len(texts), 1000):
+            vdb.add_texts(
+                texts=texts[i:i + 1000],
+                metadatas=[{'source': f'bench://{j}'} for j in range(i, i + len(texts[i:i + 1000]))]
+            )
+
+        questions = synthetic_report(args.queries, seed=size + 1).split('\n\n')
+        timings = []
+        for question in questions:
+            start = time.perf_counter()
+            vdb.query(question)
+            timings.append(time.perf_counter() - start)
+        metrics[f'query.p50[{size}]'] = statistics.median(timings)
+        metrics[f'query.p95[{size}]'] = percentile(timings, 95)
+    return metrics
+
+
+_trs = None
+
+
+def get_trs(args):
+    """One TRS instance in the working directory, shared by the ingest and summarize cases"""
+    global _trs
+    if _trs is None:
+        from trs.main import TRS
+        _trs = TRS(
+            openai_key='sk-benchmark',
+            use_cache=False,
+            embeddings=get_backend(args.embeddings, openai_key='sk-benchmark')
+        )
+    return _trs
+
+
+def bench_ingest(args, workdir: str, fixtures: FixtureServer) -> Dict[str, float]:
+    pdf_dir = os.path.join(workdir, 'pdfs')
+    os.makedirs(pdf_dir, exist_ok=True)
+    sources = fixtures.urls('.html')
+    for url in fixtures.urls('.pdf'):
+        path = os.path.join(pdf_dir, os.path.basename(url))
+        with urllib.request.urlopen(url) as response, open(path, 'wb') as fp:
+            fp.write(response.read())
+        sources.append(path)
+
+    trs = get_trs(args)
+    start = time.perf_counter()
+    results = trs.ingest_many(sources, max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if not result.success]
+    if failed:
+        raise RuntimeError(f'{len(failed)} sources failed, e.g. {failed[0].source}: {failed[0].error}')
+    chunks = sum(result.chunks for result in results)
+    print(f'  ingest: {len(results)} sources, {chunks} chunks, {len(results) / elapsed:.1f} docs/s, {chunks / elapsed:.1f} chunks/s')
+    return {f'ingest.total[{len(results)}docs]': elapsed}
+
+
+def bench_retrieve(args, workdir: str, fixtures: FixtureServer) -> Dict[str, float]:
+    trs = get_trs(args)
+    if trs.vdb.count() == 0:
+        bench_ingest(args, workdir, fixtures)
+
+    # exact-token queries skip the query embedding; free-text queries fuse BM25 and vector results
+    questions = {
+        'exact': ['powershell', 'ransomware', 'CVE-2021-1234', 'beacon', 'webshell'],
+        'hybrid': synthetic_report(args.queries, seed=99).split('\n\n'),
+    }
+    metrics = {}
+    for kind, queries in questions.items():
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            trs.retrieve(query)
+            timings.append(time.perf_counter() - start)
+        metrics[f'retrieve.{kind}.p50'] = statistics.median(timings)
+    return metrics
+
+
+def bench_summarize(args, workdir: str, fixtures: FixtureServer) -> Dict[str, float]:
+    trs = get_trs(args)
+    timings = []
+    for url in fixtures.urls('.html')[:args.summaries]:
+        start = time.perf_counter()
+        summary, mindmap, iocs = trs.summarize(url)
+        timings.append(time.perf_counter() - start)
+        if summary is None or mindmap is None:
+            raise RuntimeError(f'summarize returned no result for {url}')
+    return {
+        'summarize.p50': statistics.median(timings),
+        'summarize.max': max(timings),
+    }
+
+
+def compare(metrics: Dict[str, float], baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, 'r') as fp:
+        baseline = json.load(fp)['metrics']
+
+    ok = True
+    print(f'\n{"metric":<32} {"baseline":>10} {"current":>10} {"ratio":>7}')
+    for name, value in metrics.items():
+        if name not in baseline:
+            continue
+        ratio = value / baseline[name] if baseline[name] else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            ok, flag = False, '  REGRESSION'
+        print(f'{name:<32} {baseline[name]:>10.4f} {value:>10.4f} {ratio:>6.2f}x{flag}')
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline trs benchmark suite')
+    parser.add_argument('--cases', nargs='+', default=['iocs', 'chunker', 'query', 'ingest', 'retrieve', 'summarize'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05, help='fake OpenAI latency per request (s)')
+    parser.add_argument('--fetch-latency', type=float, default=0.01, help='fixture server latency per request (s)')
+    parser.add_argument('--html-reports', type=int, default=40)
+    parser.add_argument('--pdf-reports', type=int, default=10)
+    parser.add_argument('--paragraphs', type=int, default=60, help='paragraphs per fixture report')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument(
+        '--embeddings', choices=BACKENDS, default='hashing',
+        help='embedding backend; openai runs against the fake server (local downloads its model on first use)'
+    )
+    parser.add_argument('--ioc-paragraphs', type=int, nargs='+', default=[500, 5000])
+    parser.add_argument('--chunker-paragraphs', type=int, default=2000)
+    parser.add_argument('--query-sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--summaries', type=int, default=5)
+    parser.add_argument('--output', metavar='FILE', help='write results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    workdir = tempfile.mkdtemp(prefix='trs-bench-')
+    shutil.copytree(os.path.join(ROOT, 'prompts'), os.path.join(workdir, 'prompts'))
+    # TRS keeps its data in ./data and reads prompts from ./prompts
+    os.chdir(workdir)
+
+    import openai
+    fake_openai = FakeOpenAI(latency=args.latency).start()
+    openai.api_base = fake_openai.api_base
+    fixtures = FixtureServer(
+        html_reports=args.html_reports,
+        pdf_reports=args.pdf_reports,
+        paragraphs=args.paragraphs,
+        latency=args.fetch_latency
+    ).start()
+    summary_fixtures = FixtureServer(
+        html_reports=args.summaries,
+        paragraphs=args.paragraphs,
+        latency=args.fetch_latency,
+        seed=7331
+    ).start()
+
+    cases = {
+        'iocs': lambda: bench_iocs(args, workdir),
+        'chunker': lambda: bench_chunker(args, workdir),
+        'query': lambda: bench_query(args, workdir),
+        'ingest': lambda: bench_ingest(args, workdir, fixtures),
+        'retrieve': lambda: bench_retrieve(args, workdir, fixtures),
+        'summarize': lambda: bench_summarize(args, workdir, summary_fixtures),
+    }
+
+    metrics, errors = {}, {}
+    try:
+        for name in args.cases:
+            print(f'running {name}...')
+            try:
+                metrics.update(cases[name]())
+            except Exception as err:
+                errors[name] = f'{type(err).__name__}: {err}'
+                print(f'  {name} failed: {errors[name]}')
+    finally:
+        fixtures.stop()
+        summary_fixtures.stop()
+        fake_openai.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f'\n{"metric":<32} {"seconds":>10}')
+    for name, value in metrics.items():
+        print(f'{name:<32} {value:>10.4f}')
+    print(f'\nfake OpenAI requests: {fake_openai.requests}')
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({
+                'metrics': metrics,
+                'errors': errors,
+                'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+            }, fp, indent=2)
+
+    ok = not errors
+    if args.baseline:
+        ok = compare(metrics, args.baseline, args.tolerance) and ok
+    sys.exit(0 if ok else 1)
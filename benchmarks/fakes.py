@@ -0,0 +1,301 @@
+"""Offline stand-ins used by the benchmark suite.
+
+* `FakeOpenAI` - a local OpenAI-compatible HTTP server (chat completions,
+  streaming, embeddings and model listing) with configurable latency
+* `FixtureServer` - a local HTTP server for a generated corpus of HTML and
+  PDF threat reports, with ETag support
+* `synthetic_report` / `make_pdf` - deterministic corpus generators
+
+Everything binds to 127.0.0.1 on an ephemeral port and runs in a daemon thread.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trs.embeddings import hash_embedding  # noqa: E402
+
+
+WORDS = (
+    'threat actor loader payload persistence registry scheduled task beacon '
+    'command control server exfiltration credential dumping lateral movement '
+    'phishing attachment macro powershell rundll32 ransomware encryptor '
+    'webshell implant dropper stager backdoor tunnel proxy obfuscation'
+).split()
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def _ioc(rng: random.Random) -> str:
+    kind = rng.randrange(5)
+    if kind == 0:
+        return '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+    if kind == 1:
+        return f'{rng.choice(WORDS)}-{rng.randint(1, 999)}.{rng.choice(["com", "net", "ru", "io"])}'
+    if kind == 2:
+        return hashlib.sha256(str(rng.random()).encode()).hexdigest()
+    if kind == 3:
+        return f'CVE-{rng.randint(2015, 2024)}-{rng.randint(1000, 49999)}'
+    return f'hxxp://{rng.choice(WORDS)}[.]example[.]com/{rng.choice(WORDS)}.php'
+
+
+def synthetic_report(paragraphs: int, seed: int = 1337, ioc_rate: float = 0.05) -> str:
+    """Deterministic report text with indicators sprinkled through the prose"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = [
+                _ioc(rng) if rng.random() < ioc_rate else rng.choice(WORDS)
+                for _ in range(rng.randint(6, 30))
+            ]
+            sentences.append(' '.join(words).capitalize() + '.')
+        out.append(' '.join(sentences))
+    return '\n\n'.join(out)
+
+
+def report_html(title: str, text: str) -> str:
+    body = '\n'.join(f'<p>{paragraph}</p>' for paragraph in text.split('\n\n'))
+    return f'<html><head><title>{title}</title></head><body><h1>{title}</h1>\n{body}\n</body></html>'
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(pages: List[str], line_chars: int = 90, lines_per_page: int = 60) -> bytes:
+    """Minimal single-font PDF with one text stream per page (no dependencies)"""
+    page_streams = []
+    for page in pages:
+        lines = []
+        for paragraph in page.split('\n'):
+            words, line = paragraph.split(), ''
+            for word in words:
+                if line and len(line) + len(word) + 1 > line_chars:
+                    lines.append(line)
+                    line = ''
+                line = f'{line} {word}' if line else word
+            lines.append(line)
+        ops = ' '.join(f'({_pdf_escape(line)}) Tj T*' for line in lines[:lines_per_page])
+        page_streams.append(f'BT /F1 9 Tf 11 TL 40 800 Td {ops} ET'.encode('latin-1', 'replace'))
+
+    n = len(pages)
+    # objects: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(f'{4 + 2 * i} 0 R' for i in range(n)), n)).encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for i, stream in enumerate(page_streams):
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>'.encode()
+        )
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+    out, offsets = bytearray(b'%PDF-1.4\n'), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class _Server:
+    handler = BaseHTTPRequestHandler
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self):
+        server = self
+
+        class Handler(self.handler):
+            owner = server
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class _OpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip('/').endswith('/models'):
+            self._json({'object': 'list', 'data': [{'id': 'gpt-4-1106-preview', 'object': 'model'}]})
+        else:
+            self._json({'error': {'message': 'not found'}}, status=404)
+
+    def do_POST(self) -> None:
+        fake = self.owner
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        fake.record(self.path)
+        time.sleep(fake.latency)
+
+        if self.path.endswith('/embeddings'):
+            inputs = request.get('input', [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            tokens = sum(len(TOKEN_RE.findall(text)) for text in inputs)
+            self._json({
+                'object': 'list',
+                'model': request.get('model'),
+                'data': [
+                    {'object': 'embedding', 'index': i, 'embedding': hash_embedding(text, fake.embedding_dim)}
+                    for i, text in enumerate(inputs)
+                ],
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+            })
+            return
+
+        if not self.path.endswith('/chat/completions'):
+            self._json({'error': {'message': 'not found'}}, status=404)
+            return
+
+        content = fake.completion(request.get('messages', []))
+        if not request.get('stream'):
+            self._json({
+                'id': 'chatcmpl-bench',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': fake.usage(request.get('messages', []), content)
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for token in re.findall(r'\S+\s*', content):
+            chunk = {
+                'id': 'chatcmpl-bench',
+                'object': 'chat.completion.chunk',
+                'model': request.get('model'),
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.close_connection = True
+
+
+class FakeOpenAI(_Server):
+    """OpenAI-compatible server; point `openai.api_base` at `api_base`"""
+
+    handler = _OpenAIHandler
+
+    def __init__(self, latency: float = 0.0, completion_words: int = 200, embedding_dim: int = 256) -> None:
+        self.latency = latency
+        self.completion_words = completion_words
+        self.embedding_dim = embedding_dim
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def api_base(self) -> str:
+        return f'{self.base_url}/v1'
+
+    def record(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    @staticmethod
+    def usage(messages: List[dict], content: str) -> dict:
+        """Approximate token usage (word counts) in the OpenAI response format"""
+        prompt = sum(len(TOKEN_RE.findall(message.get('content', ''))) for message in messages)
+        completion = len(TOKEN_RE.findall(content))
+        return {'prompt_tokens': prompt, 'completion_tokens': completion, 'total_tokens': prompt + completion}
+
+    def completion(self, messages: List[dict]) -> str:
+        prompt = messages[-1]['content'] if messages else ''
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        return ' '.join(rng.choice(WORDS) for _ in range(self.completion_words))
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        fixtures = self.owner
+        time.sleep(fixtures.latency)
+        item = fixtures.files.get(self.path)
+        if item is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body, content_type = item
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureServer(_Server):
+    """Serves a generated corpus at /reports/<n>.html and /reports/<n>.pdf"""
+
+    handler = _FixtureHandler
+
+    def __init__(self, html_reports: int = 50, pdf_reports: int = 0, paragraphs: int = 40, latency: float = 0.0, seed: int = 1337) -> None:
+        self.latency = latency
+        self.files: Dict[str, Tuple[bytes, str]] = {}
+        for i in range(html_reports):
+            text = synthetic_report(paragraphs, seed=seed + i)
+            self.files[f'/reports/{i}.html'] = (report_html(f'Report {i}', text).encode(), 'text/html; charset=utf-8')
+        for i in range(pdf_reports):
+            text = synthetic_report(paragraphs, seed=seed + html_reports + i)
+            pages = [page for page in text.split('\n\n')]
+            pages = ['\n'.join(pages[j:j + 4]) for j in range(0, len(pages), 4)]
+            self.files[f'/reports/{i}.pdf'] = (make_pdf(pages), 'application/pdf')
+
+    def urls(self, suffix: str = '.html') -> List[str]:
+        return [f'{self.base_url}{path}' for path in self.files if path.endswith(suffix)]
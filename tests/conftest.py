@@ -0,0 +1,76 @@
+import os
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# the benchmark stand-ins (fake OpenAI server, PDF generator) double as test fixtures
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+class FakeEncoding:
+    """Deterministic tokenizer standing in for tiktoken's cl100k_base.
+
+    Letters are grouped four to a token and every digit or punctuation
+    character is its own token, so token density varies inside a word
+    much like it does with the real encoding.
+    """
+
+    TOKEN_RE = re.compile(r'\d|[^\W\d]{1,4}|[^\w\s]')
+
+    def encode(self, text, **kwargs):
+        return self.TOKEN_RE.findall(text)
+
+    def encode_ordinary(self, text):
+        return self.encode(text)
+
+    def encode_ordinary_batch(self, texts, **kwargs):
+        return [self.encode(text) for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def fake_encoding(monkeypatch):
+    """tiktoken downloads its encodings on first use; keep the tests offline and deterministic"""
+    import tiktoken
+    from trs.utils import get_encoding
+
+    encoding = FakeEncoding()
+    monkeypatch.setattr(tiktoken, 'get_encoding', lambda name: encoding)
+    get_encoding.cache_clear()
+    yield encoding
+    get_encoding.cache_clear()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory; TRS keeps its data/ directory under the working directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def make_trs(workdir):
+    from trs.embeddings import HashingEmbeddings
+    from trs.main import TRS
+
+    def factory(**kwargs):
+        kwargs.setdefault('embeddings', HashingEmbeddings())
+        return TRS(openai_key='sk-test', **kwargs)
+    return factory
+
+
+@pytest.fixture
+def trs(make_trs):
+    return make_trs()
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Local OpenAI-compatible server; the openai module is pointed at it"""
+    import openai
+    from fakes import FakeOpenAI
+
+    with FakeOpenAI(completion_words=20) as server:
+        monkeypatch.setattr(openai, 'api_base', server.api_base)
+        yield server
@@ -0,0 +1,40 @@
+import asyncio
+
+from fakes import synthetic_report
+from trs.aio import AsyncTRS
+from trs.schema import Document
+
+
+def test_async_and_sync_prompts_send_the_same_requests(make_trs, fake_openai):
+    trs = make_trs(use_cache=False)
+    # small enough that the report is map-reduced over several sections
+    trs.llm.token_limit = trs.llm.completion_tokens + 600
+    trs.llm.map_tokens = 250
+    doc = Document(source='report', text=synthetic_report(12))
+
+    expected = trs.llm.summarize(doc).summary
+    sync_requests = fake_openai.requests.pop('/v1/chat/completions')
+    assert sync_requests > 2
+
+    async def run():
+        async with AsyncTRS(openai_key='sk-test', trs=trs, api_base=fake_openai.api_base) as atrs:
+            return await atrs._generic_prompt('summary', doc)
+
+    assert asyncio.run(run()) == expected
+    assert fake_openai.requests['/v1/chat/completions'] == sync_requests
+
+
+def test_async_summarize_indexes_new_sources(make_trs, fake_openai, monkeypatch):
+    trs = make_trs()
+    text = 'The implant beacons to 203.0.113.7.'
+    monkeypatch.setattr(trs.loader, 'prepare_fetch', lambda url: (Document(source=url, text=text), {}, None))
+
+    async def run():
+        async with AsyncTRS(openai_key='sk-test', trs=trs, api_base=fake_openai.api_base) as atrs:
+            return await atrs.summarize('https://example.com/report')
+
+    summary, mindmap, iocs = asyncio.run(run())
+
+    assert summary and mindmap and iocs.ips == ['203.0.113.7']
+    assert 'https://example.com/report' in trs.registry
+    assert [record['text'] for record in trs.vdb.list_records(where={'type': 'summary'})] == [summary]
@@ -0,0 +1,46 @@
+from trs.cache import QnACache, ResponseCache
+
+
+def test_response_cache_tracks_size_and_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_items=1, max_bytes=25)
+    cache.set('a', 'x' * 10)
+    cache.set('b', 'y' * 10)
+    cache.set('b', 'z' * 5)
+    assert cache._total == 15
+
+    assert cache.get('a') == 'x' * 10
+    cache.set('c', 'w' * 12)
+
+    assert cache._total == cache._stored_bytes() == 22
+    assert cache.get('b') is None
+    assert cache.get('a') == 'x' * 10 and cache.get('c') == 'w' * 12
+
+
+def test_response_cache_purges_expired_rows_periodically(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl=60, purge_every=3)
+    cache.set('old', 'value')
+    monkeypatch.setattr('trs.cache.time.time', lambda: 1e12)
+
+    cache.set('new1', 'value')
+    assert cache._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] == 2
+    cache.set('new2', 'value')
+    assert cache._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] == 2
+    assert cache._total == 10
+
+
+def test_response_cache_total_survives_reopen(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ResponseCache(path).set('a', 'value')
+    cache = ResponseCache(path)
+    assert cache._total == 5
+    cache.clear()
+    assert cache._total == 0
+
+
+def test_qna_cache_similar_questions_must_name_the_same_identifiers():
+    cache = QnACache(threshold=0.9)
+    cache.set('What malware does APT29 use?', 'WellMess', results=[], embedding=[1.0, 0.0])
+
+    assert cache.get('Which malware does APT29 use', embedding=[1.0, 0.01]) == 'WellMess'
+    # embeds identically, but names a different group
+    assert cache.get('What malware does APT28 use?', embedding=[1.0, 0.0]) is None
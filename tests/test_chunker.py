@@ -0,0 +1,41 @@
+from trs.chunker import TextSplitter
+
+
+def test_overlap_is_only_kept_when_the_next_segment_fits():
+    splitter = TextSplitter(chunk_size=10, overlap=5)
+    # three 3-token sentences, then a 9-token sentence that cannot share a chunk with any of them
+    text = 'ab cd. ef gh. ij kl. 12345678.'
+
+    chunks = list(splitter.iter_chunks(text))
+
+    assert [chunk.text for chunk in chunks] == ['ab cd. ef gh. ij kl.', '12345678.']
+    assert [chunk.num_tokens for chunk in chunks] == [9, 9]
+
+
+def test_overlap_repeats_trailing_segments():
+    splitter = TextSplitter(chunk_size=10, overlap=5)
+    chunks = splitter.split('ab cd. ef gh. ij kl. mn op.')
+    assert chunks == ['ab cd. ef gh. ij kl.', 'ij kl. mn op.']
+
+
+def test_chunks_always_advance():
+    splitter = TextSplitter(chunk_size=12, overlap=8)
+    text = ' '.join(['ab cd.', '1234567.', 'ef.', '123456789.', 'gh ij kl.'] * 20)
+
+    chunks = list(splitter.iter_chunks(text))
+
+    ends = [chunk.end for chunk in chunks]
+    assert ends == sorted(set(ends))
+    assert all(chunk.num_tokens <= 12 for chunk in chunks)
+
+
+def test_giant_word_pieces_never_exceed_chunk_size():
+    splitter = TextSplitter(chunk_size=10, overlap=2)
+    # letters are 4 characters per token and digits 1, so a proportional split overshoots on the digits
+    word = 'a' * 40 + '1' * 40 + 'b' * 40
+
+    chunks = list(splitter.iter_chunks(word))
+
+    assert ''.join(chunk.text for chunk in chunks) == word
+    assert all(chunk.num_tokens <= 10 for chunk in chunks)
+    assert [chunk.num_tokens for chunk in chunks] == [10] * 6
@@ -0,0 +1,42 @@
+from trs.context import format_context, format_sources, merge_passages, pack_context
+
+TEXT = 'one two three four five six'
+
+
+def num_tokens(text):
+    return len(text.split())
+
+
+def chunk(chunk_id, start, end, **metadata):
+    return {'id': chunk_id, 'text': TEXT[start:end], 'metadata': {'source': 'report', 'start': start, 'end': end, **metadata}}
+
+
+A = chunk('a', 0, 13)  # one two three
+B = chunk('b', 8, 18)  # three four
+C = chunk('c', 24, 27, page=2)  # six
+SUMMARY = {'id': 's', 'text': 'a summary', 'metadata': {'source': 'report', 'type': 'summary'}}
+
+
+def test_merge_passages_joins_overlapping_chunks_in_rank_order():
+    passages = merge_passages([B, SUMMARY, A, C], num_tokens)
+
+    assert [passage['chunk_ids'] for passage in passages] == [['a', 'b'], ['s'], ['c']]
+    assert passages[0]['text'] == 'one two three four' and passages[0]['tokens'] == 4
+    assert passages[0]['rank'] == 0
+
+
+def test_pack_context_charges_overlapping_chunks_only_for_new_text():
+    # each passage pays a 9 token source header; 'a' plus the new word of 'b' cost 4, 'c' costs 1
+    passages = pack_context([A, B, C], budget=13, num_tokens=num_tokens)
+
+    assert [passage['chunk_ids'] for passage in passages] == [['a', 'b']]
+    assert [passage['chunk_ids'] for passage in pack_context([A, B, C], 23, num_tokens)] == [['a', 'b'], ['c']]
+
+
+def test_format_sources_lists_only_cited_passages():
+    context, citations = format_context(merge_passages([A, B, C], num_tokens))
+
+    assert context == '[1] report\none two three four\n\n[2] report (page 2)\nsix'
+    assert format_sources('It counts [2].', citations) == '\n\nSources:\n[2] report (page 2)'
+    assert format_sources('It counts [1, 2].', citations).count('\n[') == 2
+    assert format_sources('No citations.', citations) == '' and format_sources(None, citations) == ''
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from fakes import FixtureServer
+from trs.cache import FetchCache
+from trs.embeddings import OpenAIEmbeddings
+from trs.loader import Loader
+from trs.schema import Document
+
+
+def test_fake_openai_serves_chat_and_embeddings(fake_openai):
+    import openai
+
+    response = openai.ChatCompletion.create(model='gpt-4-1106-preview', messages=[{'role': 'user', 'content': 'hi'}], api_key='sk-test')
+    content = response['choices'][0]['message']['content']
+    assert len(content.split()) == 20 and response['usage']['completion_tokens'] > 0
+
+    vectors = OpenAIEmbeddings(api_key='sk-test', batch_size=2).embed(['a', 'b', 'c'])
+    assert len(vectors) == 3 and len(vectors[0]) == fake_openai.embedding_dim
+    assert fake_openai.requests['/v1/embeddings'] == 2
+
+
+def test_fixture_server_pages_are_revalidated_from_cache(tmp_path, monkeypatch):
+    # the real partitioner needs NLTK data downloads
+    monkeypatch.setattr(
+        'unstructured.partition.html.partition_html',
+        lambda text: [SimpleNamespace(text=text[:40])]
+    )
+    loader = Loader(cache=FetchCache(str(tmp_path / 'fetch.db')), max_age=0)
+
+    with FixtureServer(html_reports=1, pdf_reports=1) as fixtures:
+        [url] = fixtures.urls()
+        first = loader.url(url)
+        monkeypatch.setattr('unstructured.partition.html.partition_html', None)
+        second = loader.url(url)
+
+        assert isinstance(first, Document) and second.text == first.text
+        assert len(fixtures.urls('.pdf')) == 1
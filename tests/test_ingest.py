@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+
+from trs.schema import Document
+
+
+def fake_load(trs, fail=()):
+    """Replace fetching with an instant loader that tracks how many documents are held in memory"""
+    state = {'held': 0, 'peak': 0, 'lock': threading.Lock()}
+
+    def load_and_split(source):
+        if source in fail:
+            raise ValueError(f'Error retrieving Document: {source}')
+        with state['lock']:
+            state['held'] += 1
+            state['peak'] = max(state['peak'], state['held'])
+        doc = Document(source=source, text=f'report {source} mentions evil-{source}.com')
+        return doc, [doc.text]
+
+    original = trs._index_documents
+
+    def index_documents(batch):
+        time.sleep(0.02)
+        try:
+            return original(batch)
+        finally:
+            with state['lock']:
+                state['held'] -= len(batch)
+
+    trs._load_and_split = load_and_split
+    trs._index_documents = index_documents
+    return state
+
+
+def test_ingest_many_reports_each_source(trs):
+    fake_load(trs, fail={'bad'})
+    results = trs.ingest_many(['a', 'b', 'bad', 'a', ''], max_workers=2, embed_workers=1)
+
+    by_source = {result.source: result for result in results}
+    assert sorted(by_source) == ['a', 'b', 'bad']
+    assert by_source['a'].success and by_source['a'].chunks == 1
+    assert not by_source['bad'].success and 'bad' in by_source['bad'].error
+    assert 'a' in trs.registry and 'bad' not in trs.registry
+
+
+def test_ingest_many_bounds_documents_waiting_for_embedding(trs):
+    # loading is instant and embedding is slow, so without backpressure every document would be held at once
+    state = fake_load(trs)
+    sources = [f'src{i}' for i in range(60)]
+    results = trs.ingest_many(sources, max_workers=2, embed_workers=1, batch_size=1)
+
+    assert all(result.success for result in results)
+    assert trs.vdb.count() == 60
+    # loads in flight (max_workers * 2), plus up to embed_workers * 2 queued batches of those loads
+    assert state['peak'] <= 2 * 2 * (1 + 1 * 2)
+
+
+def test_ingest_many_resumes_from_checkpoint(trs, workdir):
+    checkpoint = workdir / 'ingest.checkpoint'
+    checkpoint.write_text(json.dumps({'source': 'done', 'success': True}) + '\n')
+    fake_load(trs, fail={'bad'})
+
+    results = trs.ingest_many(['done', 'new', 'bad'], checkpoint_path=str(checkpoint))
+
+    assert {result.source: result.skipped for result in results} == {'done': True, 'new': False, 'bad': False}
+    lines = [json.loads(line) for line in checkpoint.read_text().splitlines()]
+    assert sorted(line['source'] for line in lines[1:]) == ['bad', 'done', 'new']
+    assert trs._read_checkpoint(str(checkpoint)) == {'done', 'new'}
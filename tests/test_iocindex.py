@@ -0,0 +1,22 @@
+from trs.iocindex import IOCIndex
+
+
+def test_lookup_normalizes_defanged_indicators(tmp_path):
+    index = IOCIndex(str(tmp_path / 'iocs.sqlite3'))
+    index.add_chunks('report', ['C2 at 198.51.100.23 and evil.example.com', 'evil.example.com again'], ['c1', 'c2'])
+
+    assert [hit.chunk_id for hit in index.lookup('198.51.100[.]23')] == ['c1']
+    assert index.sources('EVIL[.]example.com') == ['report']
+    assert index.lookup('') == [] and index.lookup('   ') == []
+
+
+def test_lookup_backfills_chunks_stored_before_the_index(make_trs):
+    trs = make_trs()
+    # chunks (and a summary) written straight to the vector database, as before the index existed
+    trs.vdb.add_texts(['beacon to 203.0.113.7'], [{'source': 'old-report'}])
+    trs.vdb.add_texts(['summary citing 203.0.113.8'], [{'source': 'old-report', 'type': 'summary'}])
+    assert not trs.ioc_index.backfilled
+
+    assert [hit.source for hit in trs.lookup_ioc('203.0.113.7')] == ['old-report']
+    assert trs.lookup_ioc('203.0.113.8') == []
+    assert make_trs().ioc_index.backfilled
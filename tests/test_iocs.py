@@ -0,0 +1,41 @@
+from trs.iocs import extract_iocs, extract_iocs_from_chunks, iter_iocs
+
+
+REPORT = (
+    'The dropper beacons to hxxps://evil[.]example[.]com/gate.php and 198.51.100[.]23, '
+    'mails ops[@]badmail(.)org, exploits cve-2023-23397 and writes loader.exe '
+    '(sha256 E3B0C44298FC1C149AFBF4C8996FB92427AE41E4649B934CA495991B7852B855). '
+    'IPv6 C2: 2001:db8::1, not dead::beef.'
+)
+
+
+def test_extracts_defanged_indicators():
+    iocs = extract_iocs(REPORT)
+
+    assert iocs.ips == ['198.51.100.23']
+    assert iocs.ipv6s == ['2001:db8::1']
+    assert iocs.emails == ['ops@badmail.org']
+    assert iocs.cves == ['CVE-2023-23397']
+    assert iocs.hashes == ['e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855']
+    assert iocs.domains == ['evil.example.com', 'badmail.org']
+    assert len(iocs.urls) == 1 and 'evil' in iocs.urls[0]
+
+
+def test_code_and_prose_are_not_domains():
+    text = (
+        '$c = New-Object System.Net.WebClient; $s = [System.Text.Encoding]::UTF8; '
+        'p = os.path.join(a, b); window.location.href = u; the payload ran wild.later the '
+        'attack.the operators staged it on evil[.]com and dropped stage2.dll.'
+    )
+    assert extract_iocs(text).domains == ['evil.com']
+
+
+def test_urls_can_be_kept_refanged():
+    urls = [ioc for field, ioc in iter_iocs(REPORT, defang_urls=False) if field == 'urls']
+    assert urls == ['https://evil.example.com/gate.php']
+
+
+def test_overlapping_chunks_are_deduplicated():
+    iocs = extract_iocs_from_chunks(['seen at 203.0.113.9 and', 'at 203.0.113.9 and evil.net'])
+    assert iocs.ips == ['203.0.113.9']
+    assert iocs.domains == ['evil.net']
@@ -0,0 +1,16 @@
+from trs.schema import Document
+
+
+def test_retrieve_backfills_chunks_stored_before_a_new_ingest(make_trs):
+    trs = make_trs()
+    # a chunk written straight to the vector database, as before the lexical index existed
+    trs.vdb.add_texts(['dropper exploits CVE-2023-34362'], [{'source': 'old-report'}])
+    # ingesting first must not hide the older chunk from the backfill
+    trs.index_document(Document(source='new-report', text='loader uses T1059.001'))
+    assert len(trs.lexical) == 1 and not trs.lexical.backfilled
+
+    results = trs.retrieve('CVE-2023-34362')
+
+    assert [result['metadata']['source'] for result in results] == ['old-report']
+    assert len(trs.lexical) == 2
+    assert make_trs().lexical.backfilled
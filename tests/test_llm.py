@@ -0,0 +1,77 @@
+from trs.cache import ResponseCache
+from trs.llm import LLM
+from trs.schema import Document
+
+
+def make_llm(tmp_path, fail=()):
+    llm = LLM(openai_api_key='sk-test', cache=ResponseCache(str(tmp_path / 'responses.db')))
+    llm.map_tokens = 1
+    calls = []
+
+    def call_openai(user_prompt, system_prompt=None, cache_key=None, prompt_tokens=None):
+        calls.append(user_prompt)
+        if any(section in user_prompt for section in fail):
+            return None
+        return f'partial {len(calls)}'
+
+    llm._call_openai = call_openai
+    return llm, calls
+
+
+def test_map_reduce_combines_every_section(tmp_path):
+    llm, calls = make_llm(tmp_path)
+    doc = Document(source='report', text='one\ntwo\nthree', chunks=['one', 'two', 'three'])
+
+    result = llm.run_steps(llm._map_reduce_document('Summarize {document}', doc))
+
+    assert result == 'partial 4'
+    assert len(calls) == 4 and 'partial 1' in calls[-1]
+    assert llm.cache.get(ResponseCache.make_key(llm.model, 'Summarize {document}', doc.text)) == result
+
+
+def test_map_reduce_failed_section_is_not_cached(tmp_path):
+    llm, calls = make_llm(tmp_path, fail={'two'})
+    doc = Document(source='report', text='one\ntwo\nthree', chunks=['one', 'two', 'three'])
+
+    assert llm.run_steps(llm._map_reduce_document('Summarize {document}', doc)) is None
+    assert len(calls) == 3
+    assert llm.cache.get(ResponseCache.make_key(llm.model, 'Summarize {document}', doc.text)) is None
+
+
+def test_map_reduce_cuts_sections_without_retokenizing(tmp_path):
+    llm, _ = make_llm(tmp_path)
+    llm.map_tokens = 6
+    llm.num_tokens = None
+    text = 'aa bb. cc dd. ee ff. gg hh.'
+    # chunks of two sentences overlapping by one, as recorded by the splitter
+    metadatas = [{'start': 0, 'end': 13, 'tokens': 4}, {'start': 7, 'end': 20, 'tokens': 4}, {'start': 14, 'end': 27, 'tokens': 4}]
+    doc = Document(source='report', text=text, num_tokens=8, chunks=[text[m['start']:m['end']] for m in metadatas], chunk_metadatas=metadatas)
+
+    # the overlapping `cc dd.` is only sent once
+    assert llm._doc_sections(doc) == ['aa bb. cc dd.', 'ee ff. gg hh.']
+
+
+def chunk(token):
+    return {'choices': [{'delta': {'content': token}}]}
+
+
+def test_stream_caches_the_full_completion(tmp_path, monkeypatch):
+    import openai
+    from openai.openai_object import OpenAIObject
+
+    llm = LLM(openai_api_key='sk-test', cache=ResponseCache(str(tmp_path / 'responses.db')))
+    stream = [OpenAIObject.construct_from(chunk(token)) for token in ['Threat ', 'actor ', 'report']]
+    monkeypatch.setattr(openai.ChatCompletion, 'create', lambda **params: iter(stream))
+
+    assert list(llm._stream_openai('prompt', cache_key='key')) == ['Threat ', 'actor ', 'report']
+    assert llm.cache.get('key') == 'Threat actor report'
+    assert list(llm._stream_openai('prompt', cache_key='key')) == ['Threat actor report']
+
+
+def test_read_prompt_only_accepts_template_names():
+    from trs.prompts import prompt_names, read_prompt
+
+    assert {'summary', 'combine', 'qna'} <= set(prompt_names())
+    assert '{document}' in read_prompt('summary')
+    assert read_prompt('../prompts/summary') is None
+    assert read_prompt('missing') is None
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from trs.cache import FetchCache
+from trs.loader import Loader
+
+
+HTML = '<html><body><p>APT report mentions 203.0.113.7</p></body></html>'
+
+
+@pytest.fixture
+def loader(tmp_path):
+    return Loader(cache=FetchCache(str(tmp_path / 'fetch.db')), max_age=60)
+
+
+def test_fresh_cached_page_needs_no_request(loader):
+    loader.cache.set('https://example.com', html=HTML, text='cached text', etag='"v1"')
+
+    doc, headers, cached = loader.prepare_fetch('https://example.com')
+    assert doc.text == 'cached text' and headers == {}
+
+
+def test_stale_page_is_revalidated(loader):
+    loader.cache.set('https://example.com', html=HTML, text='cached text', etag='"v1"', last_modified='Mon')
+    loader.max_age = 0
+
+    doc, headers, cached = loader.prepare_fetch('https://example.com')
+    assert doc is None
+    assert headers == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon'}
+
+    doc = loader.finish_fetch('https://example.com', 304, '', {}, cached)
+    assert doc.text == 'cached text'
+    assert loader.cache.get('https://example.com')['fetched_at'] > cached['fetched_at']
+
+
+def test_unchanged_html_skips_parsing(loader, monkeypatch):
+    loader.cache.set('https://example.com', html=HTML, text='cached text')
+    cached = loader.cache.get('https://example.com')
+    monkeypatch.setattr('unstructured.partition.html.partition_html', pytest.fail)
+
+    doc = loader.finish_fetch('https://example.com', 200, HTML, {'ETag': '"v2"'}, cached)
+    assert doc.text == 'cached text'
+    assert loader.cache.get('https://example.com')['etag'] == '"v2"'
+
+
+def test_changed_html_is_parsed_and_cached(loader, monkeypatch):
+    # the real partitioner needs NLTK data downloads
+    monkeypatch.setattr(
+        'unstructured.partition.html.partition_html',
+        lambda text: [SimpleNamespace(text='APT report'), SimpleNamespace(text='mentions 203.0.113.7')]
+    )
+    doc = loader.finish_fetch('https://example.com', 200, HTML, {}, None)
+    assert doc.text == 'APT report\nmentions 203.0.113.7'
+    assert loader.cache.get('https://example.com')['text'] == doc.text
+
+    with pytest.raises(ValueError):
+        loader.finish_fetch('https://example.com', 404, '', {}, None)
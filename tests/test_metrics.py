@@ -0,0 +1,37 @@
+import pytest
+
+from trs.metrics import METRICS, estimate_cost, record_tokens, span, trace
+
+
+def stream(stage):
+    with span(stage):
+        yield 'a'
+        yield 'b'
+
+
+def test_abandoned_stream_is_not_an_error():
+    tokens = stream('test_abandoned')
+    next(tokens)
+    tokens.close()
+
+    stats = METRICS.snapshot()['stages']['test_abandoned']
+    assert stats['count'] == 1 and stats['errors'] == 0
+
+
+def test_failed_stage_is_an_error():
+    with pytest.raises(ValueError):
+        with span('test_failed'):
+            raise ValueError('boom')
+    assert METRICS.snapshot()['stages']['test_failed']['errors'] == 1
+    assert 'trs_stage_errors_total{stage="test_failed"} 1' in METRICS.prometheus()
+
+
+def test_trace_collects_spans_tokens_and_cost():
+    with trace() as current:
+        with span('test_traced'):
+            record_tokens('gpt-4', prompt=1000, completion=500)
+
+    summary = current.summary()
+    assert summary['stages']['test_traced']['count'] == 1
+    assert summary['tokens'] == {'gpt-4': {'prompt': 1000, 'completion': 500}}
+    assert summary['cost_usd'] == pytest.approx(estimate_cost('gpt-4', prompt=1000, completion=500)) == pytest.approx(0.06)
@@ -0,0 +1,53 @@
+import argparse
+import threading
+import time
+
+from trs.embeddings import HashingEmbeddings, LocalEmbeddings
+from trs.options import add_backend_args, configure_scheduler, trs_kwargs
+from trs.scheduler import Scheduler
+
+
+def parse(*argv):
+    parser = argparse.ArgumentParser()
+    add_backend_args(parser)
+    return parser.parse_args(argv)
+
+
+def test_trs_kwargs_from_shared_options():
+    kwargs = trs_kwargs(parse('--embeddings', 'hashing', '--embed-batch-size', '8', '--no-cache'), 'sk-test')
+
+    assert isinstance(kwargs['embeddings'], HashingEmbeddings)
+    assert kwargs['embeddings'].batch_size == 8 and kwargs['embeddings'].max_workers == 1
+    assert kwargs['use_cache'] is False and kwargs['fetch_max_age'] == 0
+    assert kwargs['qna_context_tokens'] == 6000 and kwargs['openai_key'] == 'sk-test'
+
+
+def test_configure_scheduler_only_overrides_given_limits():
+    scheduler = Scheduler()
+    before = scheduler._budgets['embeddings'].rpm
+    configure_scheduler(parse('--chat-rpm', '10'), scheduler=scheduler)
+
+    assert scheduler._budgets['chat'].rpm == 10
+    assert scheduler._budgets['embeddings'].rpm == before
+
+
+def test_local_model_is_loaded_once(monkeypatch):
+    loads = []
+
+    class SlowModel:
+        def __init__(self, preferred_providers):
+            loads.append(preferred_providers)
+            time.sleep(0.05)
+
+        def __call__(self, texts):
+            return [[1.0] * 384 for _ in texts]
+
+    monkeypatch.setattr('chromadb.utils.embedding_functions.ONNXMiniLM_L6_V2', SlowModel)
+    backend = LocalEmbeddings()
+    threads = [threading.Thread(target=backend._embed_batch, args=(['text'],)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fakes import make_pdf, synthetic_report
+from trs import loader as loader_module
+from trs.loader import Loader
+from trs.utils import sha256
+
+
+PAGES = [synthetic_report(2, seed=page) for page in range(7)]
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'report.pdf'
+    path.write_bytes(make_pdf(PAGES))
+    return str(path)
+
+
+class CountingPool:
+    """In-process stand-in for the PDF process pool that records how many ranges were submitted"""
+
+    def __init__(self) -> None:
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args):
+        self.submitted += 1
+        return self.pool.submit(*args)
+
+
+def test_parallel_extraction_matches_sequential(pdf_path):
+    sequential = list(Loader(pdf_workers=1).iter_pdf_pages(pdf_path))
+    loader = Loader(pdf_workers=2, pdf_parallel_pages=2, pdf_pages_per_task=2)
+    try:
+        assert list(loader.iter_pdf_pages(pdf_path)) == sequential
+        # the pool is shared by later PDFs
+        pool = loader.pdf_pool
+        assert list(loader.iter_pdf_pages(pdf_path)) == sequential
+        assert loader.pdf_pool is pool
+    finally:
+        loader.close()
+    assert [page for page, _ in sequential] == list(range(1, 8))
+
+
+def test_page_ranges_are_submitted_as_they_are_consumed(pdf_path):
+    loader = Loader(pdf_workers=2, pdf_parallel_pages=2, pdf_pages_per_task=1)
+    loader._pdf_pool = pool = CountingPool()
+
+    pages = loader.iter_pdf_pages(pdf_path)
+    next(pages)
+    assert pool.submitted == 3
+    pages.close()
+    assert pool.submitted == 3
+
+
+def test_workers_reuse_parsed_pdfs(pdf_path, monkeypatch):
+    monkeypatch.setattr(loader_module, '_READERS', loader_module.OrderedDict())
+    first = loader_module._extract_page_range(pdf_path, (0, 2))
+    second = loader_module._extract_page_range(pdf_path, (2, 4))
+
+    assert len(loader_module._READERS) == 1
+    assert first[0] == 0 and second[0] == 2 and len(second[1]) == 2
+
+
+def test_streamed_pdf_split_matches_full_text_split(trs, pdf_path):
+    trs.loader.pdf_workers = 1
+    full = trs.loader.pdf(pdf_path)
+    chunks = trs._split(full)
+
+    doc, streamed = trs._load_and_split(pdf_path)
+
+    assert doc.text == '' and doc.metadata == full.metadata
+    assert streamed == chunks and doc.chunk_metadatas == full.chunk_metadatas
+    assert doc.content_hash == sha256(full.text)
+    assert {metadata['page'] for metadata in doc.chunk_metadatas} == set(range(1, 8))
+
+    trs._index_documents([(doc, streamed)])
+    assert trs.registry.get(pdf_path).content_hash == sha256(full.text)
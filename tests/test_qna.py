@@ -0,0 +1,29 @@
+import openai
+from openai.openai_object import OpenAIObject
+
+from trs.schema import Document
+
+
+def stream_chat(monkeypatch, tokens, fail=False):
+    """Stream `tokens` from the chat API, dropping the connection afterwards if `fail`"""
+    def create(**params):
+        for token in tokens:
+            yield OpenAIObject.construct_from({'choices': [{'delta': {'content': token}}]})
+        if fail:
+            raise openai.error.APIConnectionError('connection reset')
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', create)
+
+
+def test_stream_qna_only_caches_completed_answers(trs, monkeypatch):
+    question = 'What does APT29 deploy?'
+    trs.index_document(Document(source='report', text='APT29 deploys WellMess.'))
+
+    stream_chat(monkeypatch, ['Well', 'Mess'], fail=True)
+    assert ''.join(trs.stream_qna(question)) == 'WellMess'
+    assert trs.cached_answer(question) is None
+
+    stream_chat(monkeypatch, ['Well', 'Mess'])
+    answer = ''.join(trs.stream_qna(question))
+    assert answer.startswith('WellMess')
+    assert trs.cached_answer(question) == answer
@@ -0,0 +1,28 @@
+import json
+
+from trs.registry import FAILED, SourceRegistry
+
+
+def test_registry_imports_legacy_json(tmp_path):
+    legacy = tmp_path / 'urls.json'
+    legacy.write_text(json.dumps(['https://a.example/report', 'https://b.example/report']))
+    registry = SourceRegistry(str(tmp_path / 'db' / 'sources.db'))
+
+    assert registry.import_json(str(legacy)) == 2
+    assert registry.import_json(str(tmp_path / 'missing.json')) == 0
+    assert len(registry) == 2
+    assert 'https://a.example/report' in registry
+
+
+def test_registry_only_counts_indexed_sources_as_processed(tmp_path):
+    registry = SourceRegistry(str(tmp_path / 'sources.db'))
+    registry.add('ok', content_hash='abc', chunk_ids=['1', '2'])
+    registry.add('broken', status=FAILED)
+
+    assert 'ok' in registry and 'broken' not in registry
+    record = registry.get('ok')
+    assert record.content_hash == 'abc' and record.chunk_ids == ['1', '2']
+    assert [record.source for record in registry.records()] == ['ok', 'broken']
+
+    registry.add('broken', chunk_ids=['3'])
+    assert 'broken' in registry and len(registry) == 2
@@ -0,0 +1,60 @@
+import json
+
+import openai
+import pytest
+from openai.api_requestor import APIRequestor
+from openai.openai_object import OpenAIObject
+
+from trs.cache import ResponseCache
+from trs.llm import LLM
+from trs.scheduler import SCHEDULER, Scheduler, _classify
+
+
+def rate_limit_error(code):
+    """A 429 built the way openai raises it from a response"""
+    body = {'error': {'message': 'slow down', 'type': 'requests', 'code': code}}
+    return APIRequestor(key='sk-test').handle_error_response(json.dumps(body), 429, body, {'retry-after': '2'})
+
+
+def test_exhausted_quota_is_not_retried():
+    err = rate_limit_error('insufficient_quota')
+    assert isinstance(err, openai.error.RateLimitError) and err.code is None
+
+    calls = []
+
+    def request():
+        calls.append(1)
+        raise err
+
+    assert _classify(err) == (False, None, False)
+    with pytest.raises(openai.error.RateLimitError):
+        Scheduler(backoff=0).call('chat', request)
+    assert len(calls) == 1
+    assert _classify(rate_limit_error('rate_limit_exceeded')) == (True, 2.0, True)
+
+
+def test_stream_holds_its_slot_until_closed():
+    scheduler = Scheduler({'chat': {'max_concurrency': 1}})
+    budget = scheduler._budgets['chat']
+
+    stream = scheduler.stream('chat', lambda: iter(['a', 'b', 'c']))
+    assert next(stream) == 'a' and budget.in_flight == 1
+    stream.close()
+    assert budget.in_flight == 0
+
+    assert list(scheduler.stream('chat', lambda: iter(['x', 'y']))) == ['x', 'y']
+    assert budget.in_flight == 0
+
+
+def test_llm_stream_releases_its_slot_when_the_reader_stops(tmp_path, monkeypatch):
+    chunks = [OpenAIObject.construct_from({'choices': [{'delta': {'content': token}}]}) for token in ['a', 'b']]
+    monkeypatch.setattr(openai.ChatCompletion, 'create', lambda **params: iter(chunks))
+    llm = LLM(openai_api_key='sk-test', cache=ResponseCache(str(tmp_path / 'responses.db')))
+    budget = SCHEDULER._budgets['chat']
+    before = budget.in_flight
+
+    stream = llm._stream_openai('prompt', cache_key='key')
+    assert next(stream) == 'a' and budget.in_flight == before + 1
+    stream.close()
+    assert budget.in_flight == before
+    assert llm.cache.get('key') is None
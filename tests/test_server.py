@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from trs.jobs import JobQueue
+from trs.schema import IngestResult
+from trs.server import create_app, resolve_source
+
+
+class StubTRS:
+    """AsyncTRS stand-in that records what it was asked to load"""
+
+    def __init__(self) -> None:
+        self.loaded = []
+        self.trs = SimpleNamespace(ingest_many=self.ingest_many)
+
+    async def custom(self, url, prompt_name):
+        self.loaded.append(url)
+        return f'{prompt_name} of {url}'
+
+    async def detections(self, url):
+        self.loaded.append(url)
+        return 'detections'
+
+    def ingest_many(self, sources):
+        self.loaded.extend(sources)
+        return [IngestResult(source=source, success=True) for source in sources]
+
+    async def close(self):
+        pass
+
+
+def call(source_dir, method, path, body):
+    atrs = StubTRS()
+
+    async def run():
+        app = create_app(atrs, JobQueue(workers=1), source_dir=source_dir)
+        async with TestClient(TestServer(app)) as client:
+            response = await client.request(method, f'{path}?wait=5', json=body)
+            return response.status, await response.json()
+
+    status, payload = asyncio.run(run())
+    return status, payload, atrs.loaded
+
+
+@pytest.fixture
+def pdf_dir(tmp_path):
+    (tmp_path / 'pdfs').mkdir()
+    (tmp_path / 'pdfs' / 'report.pdf').write_bytes(b'%PDF-1.4')
+    (tmp_path / 'secret.txt').write_text('secret')
+    return str(tmp_path / 'pdfs')
+
+
+def test_resolve_source(pdf_dir):
+    assert resolve_source('https://example.com/a') == 'https://example.com/a'
+    assert resolve_source('/etc/passwd') is None
+    assert resolve_source('file:///etc/passwd', pdf_dir) is None
+    assert resolve_source('report.pdf', pdf_dir).endswith('/pdfs/report.pdf')
+    assert resolve_source('../secret.txt', pdf_dir) is None
+    assert resolve_source(['https://example.com'], pdf_dir) is None
+
+
+def test_local_paths_are_rejected_without_a_source_dir():
+    status, payload, loaded = call(None, 'POST', '/detect', {'url': '/etc/passwd'})
+    assert status == 400 and '/etc/passwd' in payload['error']
+    assert loaded == []
+
+
+def test_ingest_rejects_any_disallowed_source(pdf_dir):
+    status, _, loaded = call(pdf_dir, 'POST', '/ingest', {'sources': ['https://example.com', '../secret.txt']})
+    assert status == 400 and loaded == []
+
+    status, payload, loaded = call(pdf_dir, 'POST', '/ingest', {'sources': ['https://example.com', 'report.pdf']})
+    assert status == 200 and payload['status'] == 'done'
+    assert loaded[0] == 'https://example.com' and loaded[1].endswith('/pdfs/report.pdf')
+
+
+def test_custom_prompt_must_be_a_known_template():
+    status, payload, loaded = call(None, 'POST', '/custom', {'url': 'https://example.com', 'prompt': '../../etc/passwd'})
+    assert status == 400 and 'Unknown prompt' in payload['error']
+    assert loaded == []
+
+    status, payload, loaded = call(None, 'POST', '/custom', {'url': 'https://example.com', 'prompt': 'qna'})
+    assert status == 400 and 'Unknown prompt' in payload['error']
+    assert loaded == []
+
+    status, payload, loaded = call(None, 'POST', '/custom', {'url': 'https://example.com', 'prompt': 'detect'})
+    assert status == 200 and payload['result'] == 'detect of https://example.com'
@@ -0,0 +1,37 @@
+import pytest
+
+from trs.embeddings import HashingEmbeddings
+from trs.schema import Document
+
+
+def test_snapshot_round_trip(make_trs, workdir, monkeypatch):
+    source = make_trs()
+    source.index_document(Document(source='report', text='APT29 deploys WellMess and beacons to 203.0.113.7.'))
+    snapshot = str(workdir / 'snapshot')
+    source.export_snapshot(snapshot)
+
+    (workdir / 'target').mkdir()
+    monkeypatch.chdir(workdir / 'target')
+    target = make_trs()
+
+    assert target.import_snapshot(snapshot) == source.vdb.count()
+    assert target.vdb.count() == source.vdb.count() and len(target.lexical) == len(source.lexical)
+    assert 'report' in target.registry
+    assert target.ioc_index.backfilled and target.lexical.backfilled
+    assert [hit.source for hit in target.lookup_ioc('203.0.113[.]7')] == ['report']
+    assert [hit.source for hit in target.lexical.search('WellMess')] == ['report']
+
+
+def test_snapshot_import_rejects_other_embeddings(make_trs, workdir, monkeypatch):
+    source = make_trs()
+    source.index_document(Document(source='report', text='APT29 deploys WellMess.'))
+    snapshot = str(workdir / 'snapshot')
+    source.export_snapshot(snapshot)
+
+    (workdir / 'target').mkdir()
+    monkeypatch.chdir(workdir / 'target')
+    target = make_trs(embeddings=HashingEmbeddings(dimension=64))
+
+    with pytest.raises(ValueError):
+        target.import_snapshot(snapshot)
+    assert target.vdb.count() == 0
@@ -0,0 +1,22 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY = ['openai', 'chromadb', 'tiktoken', 'unstructured', 'PyPDF2', 'numpy']
+
+CODE = f'''
+import sys
+from trs.main import TRS
+TRS(openai_key='sk-test')
+print(','.join(name for name in {HEAVY!r} if name in sys.modules))
+'''
+
+
+def test_constructing_trs_imports_no_heavy_dependencies(tmp_path):
+    env = {**os.environ, 'PYTHONPATH': ROOT, 'LOGURU_LEVEL': 'WARNING'}
+    result = subprocess.run([sys.executable, '-c', CODE], cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
@@ -0,0 +1,43 @@
+import threading
+
+from trs.schema import Document, Summary
+
+
+class BarrierLLM:
+    """LLM stand-in whose summary and mindmap stages only finish if they run at the same time"""
+
+    def __init__(self) -> None:
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def summarize(self, doc):
+        self.barrier.wait()
+        return Summary(source=doc.source, summary=f'summary of {doc.source}')
+
+    def mindmap(self, doc):
+        self.barrier.wait()
+        return 'mindmap'
+
+
+def test_iter_summarize_runs_stages_concurrently(trs, monkeypatch):
+    text = 'The loader beacons to 203.0.113.7 and evil-domain.com.'
+    monkeypatch.setattr(trs.loader, 'url', lambda source: Document(source=source, text=text))
+    trs._llm = BarrierLLM()
+
+    results = dict(trs.iter_summarize('https://example.com/report'))
+
+    assert results['summary'] == 'summary of https://example.com/report'
+    assert results['mindmap'] == 'mindmap'
+    assert '203.0.113.7' in results['iocs'].ips
+    assert 'evil-domain.com' in results['iocs'].domains
+
+
+def test_summary_is_stored_once_for_new_sources(trs, monkeypatch):
+    monkeypatch.setattr(trs.loader, 'url', lambda source: Document(source=source, text='report text'))
+    trs._llm = BarrierLLM()
+
+    trs.summarize('https://example.com/report')
+    trs._llm = BarrierLLM()
+    trs.summarize('https://example.com/report')
+
+    summaries = trs.vdb.list_records(where={'type': 'summary'})
+    assert [record['text'] for record in summaries] == ['summary of https://example.com/report']
@@ -0,0 +1,84 @@
+import pytest
+
+from trs.embeddings import HashingEmbeddings
+from trs.vectordb import VectorDB, build_where, chunk_id
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self) -> None:
+        super().__init__()
+        self.embedded = []
+
+    def _embed_batch(self, texts):
+        self.embedded.extend(texts)
+        return super()._embed_batch(texts)
+
+
+@pytest.fixture
+def vdb(tmp_path):
+    return VectorDB(collection_name='test', db_dir=str(tmp_path / 'chroma'), embeddings=CountingEmbeddings())
+
+
+def test_add_texts_skips_stored_and_duplicate_chunks(vdb):
+    ok, ids = vdb.add_texts(['alpha', 'beta', 'alpha'], [{'source': 'a'}] * 3)
+    assert ok and ids == [chunk_id('alpha', 'a'), chunk_id('beta', 'a'), chunk_id('alpha', 'a')]
+    assert vdb.count() == 2
+
+    ok, again = vdb.add_texts(['alpha', 'beta'], [{'source': 'a'}] * 2)
+    assert ok and again == ids[:2]
+    assert vdb.count() == 2
+    assert vdb.embeddings.embedded == ['alpha', 'beta']
+
+
+def test_add_texts_reuses_embeddings_across_sources(vdb):
+    vdb.add_texts(['shared chunk', 'only in a'], [{'source': 'a'}] * 2)
+    vdb.add_texts(['shared chunk', 'only in b'], [{'source': 'b'}] * 2)
+
+    assert vdb.count() == 4
+    assert vdb.embeddings.embedded == ['shared chunk', 'only in a', 'only in b']
+    stored = vdb.get_embeddings([chunk_id('shared chunk', 'a'), chunk_id('shared chunk', 'b')])
+    assert stored[chunk_id('shared chunk', 'a')] == pytest.approx(stored[chunk_id('shared chunk', 'b')])
+
+
+def test_list_records_pages_without_overlap(vdb):
+    texts = [f'chunk {i}' for i in range(7)]
+    vdb.add_texts(texts, [{'source': 'a', 'type': 'chunk'}] * 7)
+
+    pages = [vdb.list_records(limit=3, offset=offset) for offset in (0, 3, 6, 9)]
+    assert [len(page) for page in pages] == [3, 3, 1, 0]
+    assert sorted(record['text'] for page in pages for record in page) == sorted(texts)
+    assert all(record['metadata']['source'] == 'a' for record in pages[0])
+
+
+def test_build_where_combines_filters():
+    assert build_where() is None
+    assert build_where(source='a') == {'source': 'a'}
+    assert build_where(where={'page': 2}, source='a', doc_type='chunk') == {
+        '$and': [{'page': 2}, {'source': 'a'}, {'type': 'chunk'}]
+    }
+
+
+def test_query_many_embeds_once_and_filters(vdb):
+    vdb.add_texts(['lazarus wiper malware', 'phishing kit'], [{'source': 'a', 'type': 'chunk'}] * 2)
+    vdb.add_texts(['lazarus summary'], [{'source': 'b', 'type': 'summary'}])
+    vdb.embeddings.embedded.clear()
+
+    wiper, phishing = vdb.query_many(['lazarus wiper', 'phishing'], n_results=1)
+    assert vdb.embeddings.embedded == ['lazarus wiper', 'phishing']
+    assert wiper[0]['text'] == 'lazarus wiper malware'
+    assert phishing[0]['text'] == 'phishing kit'
+
+    [summaries] = vdb.query_many(['lazarus'], n_results=3, doc_type='summary')
+    assert [record['metadata']['source'] for record in summaries] == ['b']
+
+
+def test_reopening_with_another_backend_is_refused(tmp_path):
+    db_dir = str(tmp_path / 'chroma')
+    vdb = VectorDB(collection_name='test', db_dir=db_dir, embeddings=HashingEmbeddings(dimension=256))
+    vdb.add_texts(['alpha'], [{'source': 'a'}])
+
+    with pytest.raises(ValueError):
+        VectorDB(collection_name='test', db_dir=db_dir, embeddings=HashingEmbeddings(dimension=128))
+
+    reopened = VectorDB(collection_name='test', db_dir=db_dir, embeddings=HashingEmbeddings(dimension=256))
+    assert reopened.collection.metadata['embedding_dim'] == 256
@@ -1,18 +1,28 @@
 import os
 import sys
-import openai
 import argparse
-import tiktoken
+import threading
 
 from loguru import logger
 
-from typing import Tuple
-
-from rich.console import Console
-from rich.markdown import Markdown
 from colored import Fore, Back, Style
 
 from trs.main import TRS
+from trs.metrics import METRICS, start_trace
+from trs.options import add_backend_args, configure_scheduler, trs_kwargs
+
+
+def render_stream(console, tokens) -> str:
+    """Render streamed markdown tokens as they arrive"""
+    from rich.live import Live
+    from rich.markdown import Markdown
+
+    text = ''
+    with Live(Markdown(text), console=console, refresh_per_second=8, vertical_overflow='visible') as live:
+        for token in tokens:
+            text += token
+            live.update(Markdown(text))
+    return text
 
 
 if __name__ == '__main__':
@@ -21,34 +31,129 @@ if __name__ == '__main__':
         description='Chat with and summarize CTI reports'
     )
 
-    parser.add_argument(
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument(
         '-c', '--chat',
-        required=True,
         action='store_true',
         help='Enter chat mode'
     )
 
+    mode.add_argument(
+        '-i', '--ingest',
+        metavar='FILE',
+        help='Ingest URLs/PDF paths listed in FILE (one per line) and exit'
+    )
+
+    mode.add_argument(
+        '--export',
+        metavar='DIR',
+        help='Export the knowledge base to a snapshot directory DIR and exit'
+    )
+
+    mode.add_argument(
+        '--import',
+        dest='import_dir',
+        metavar='DIR',
+        help='Import a snapshot directory DIR created with --export and exit'
+    )
+
+    parser.add_argument(
+        '--checkpoint',
+        metavar='FILE',
+        help='Checkpoint file used to resume an interrupted --ingest run'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=8,
+        help='Number of concurrent fetch/parse workers for --ingest'
+    )
+
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print per-stage timings, token counts and estimated cost after each command'
+    )
+
+    parser.add_argument(
+        '--metrics-file',
+        metavar='FILE',
+        help='Write aggregate metrics in the Prometheus text format to FILE'
+    )
+
+    add_backend_args(parser)
+
     args = parser.parse_args()
+    show_timings, metrics_file = args.timings, args.metrics_file
 
     OPENAI_KEY = os.environ.get('OPENAI_API_KEY')
     if OPENAI_KEY is None:
         logger.error('OPENAI_API_KEY environment variable not set')
         sys.exit(1)
 
-    trs = TRS(openai_key=OPENAI_KEY)
+    configure_scheduler(args)
+    trs = TRS(**trs_kwargs(args, OPENAI_KEY))
+
+    if args.ingest:
+        with open(args.ingest, 'r') as fp:
+            sources = [line.strip() for line in fp if line.strip() and not line.startswith('#')]
+
+        results = trs.ingest_many(
+            sources,
+            max_workers=args.workers,
+            checkpoint_path=args.checkpoint
+        )
+
+        for result in results:
+            if result.skipped:
+                status = f'{Fore.yellow}skipped{Style.reset}'
+            elif result.success:
+                status = f'{Fore.green}ok ({result.chunks} chunks){Style.reset}'
+            else:
+                status = f'{Fore.red}failed: {result.error}{Style.reset}'
+            print(f'* {result.source} - {status}')
+
+        if metrics_file:
+            METRICS.write(metrics_file)
+        sys.exit(0 if all(result.success for result in results) else 1)
+
+    if args.export or args.import_dir:
+        try:
+            if args.export:
+                manifest = trs.export_snapshot(args.export)
+                print(f'* exported {manifest["count"]} records and {manifest["sources"]} sources to {args.export}')
+            else:
+                imported = trs.import_snapshot(args.import_dir)
+                print(f'* imported {imported} records from {args.import_dir}')
+        except Exception as err:
+            logger.error(f'Snapshot failed: {err}')
+            sys.exit(1)
+
+        if metrics_file:
+            METRICS.write(metrics_file)
+        sys.exit(0)
 
     COMMAND_HANDLERS = {
-        '!summ': trs.summarize,
-        '!detect': trs.detections,
-        '!custom': trs.custom
+        '!summ': trs.iter_summarize,
+        '!detect': trs.stream_detections,
+        '!custom': lambda prompt_name, url: trs.stream_custom(url=url, prompt_name=prompt_name)
     }
 
     if args.chat:
+        from rich.console import Console
+        from rich.markdown import Markdown
+
+        # check OpenAI connectivity without delaying the prompt
+        threading.Thread(target=trs.check_connection, daemon=True).start()
+
         console = Console()
         print(f'{Style.BOLD}{Fore.cyan_3}commands:{Style.reset}')
-        print(f'* {Fore.cyan_3}!summ <url>{Style.reset} - summarize a threat report')
-        print(f'* {Fore.cyan_3}!detect <url>{Style.reset} - identify detections in report')
-        print(f'* {Fore.cyan_3}!custom <prompt_name> <url>{Style.reset} - process URL with a custom prompt')
+        print(f'* {Fore.cyan_3}!summ <url|pdf>{Style.reset} - summarize a threat report')
+        print(f'* {Fore.cyan_3}!detect <url|pdf>{Style.reset} - identify detections in report')
+        print(f'* {Fore.cyan_3}!custom <prompt_name> <url|pdf>{Style.reset} - process URL or PDF with a custom prompt')
+        print(f'* {Fore.cyan_3}!pdf <path>{Style.reset} - add a PDF report to the database')
+        print(f'* {Fore.cyan_3}!ioc <indicator>{Style.reset} - find reports mentioning an IP, domain, URL, hash, email, or CVE')
         print(f'* {Fore.cyan_3}!exit|!quit{Style.reset} - exit application')
 
         print(f'{Style.BOLD}{Fore.dark_orange_3b}ready to chat!{Style.reset}\n')
@@ -61,27 +166,59 @@ if __name__ == '__main__':
                     logger.info('exiting')
                     break
 
+                command_trace = start_trace()
                 command, *args = prompt.split()
                 handler = COMMAND_HANDLERS.get(command.lower())
-                
-                if handler:
+
+                if command.lower() == '!pdf':
+                    doc = trs.pdf_to_doc(file_path=' '.join(args))
+                    print('🤖 >>')
+                    if doc:
+                        print(f'loaded {doc.metadata["pages"]} pages from {doc.source}')
+                    else:
+                        print('failed to load pdf')
+
+                elif command.lower() == '!ioc':
+                    print('🤖 >>')
+                    if not args:
+                        print('usage: !ioc <indicator>')
+                        continue
+                    hits = trs.lookup_ioc(' '.join(args))
+                    if not hits:
+                        print('indicator not found')
+                    sources = {}
+                    for hit in hits:
+                        sources.setdefault(hit.source, []).append(hit.chunk_id)
+                    for source, chunk_ids in sources.items():
+                        print(f'* {source} ({len(chunk_ids)} chunks)')
+
+                elif handler:
                     result = handler(*args)
 
                     if command.lower() == '!summ':
-                        summary, mindmap, iocs = result
                         print('🤖 >>')
-                        console.print(Markdown(summary))
-                        console.print(Markdown(mindmap))
-                        print(iocs)
+                        # render each stage as soon as it finishes
+                        for stage, stage_result in result:
+                            if stage_result is None:
+                                logger.warning(f'no {stage} result')
+                            elif stage == 'iocs':
+                                print(stage_result)
+                            else:
+                                console.print(Markdown(stage_result))
 
                     else:
                         print('🤖 >>')
-                        console.print(Markdown(result))
+                        render_stream(console, result)
                 
                 else:
-                    result = trs.qna(prompt=prompt)
+                    result = trs.stream_qna(prompt=prompt)
                     print('🤖 >>')
-                    console.print(Markdown(result))
+                    render_stream(console, result)
+
+                if show_timings:
+                    print(f'{Fore.grey_50}{command_trace.format()}{Style.reset}')
+                if metrics_file:
+                    METRICS.write(metrics_file)
 
 
         except KeyboardInterrupt:
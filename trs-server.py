@@ -0,0 +1,73 @@
+import os
+import sys
+import argparse
+
+from loguru import logger
+
+from trs.aio import AsyncTRS
+from trs.jobs import JobQueue
+from trs.options import add_backend_args, configure_scheduler, trs_kwargs
+from trs.server import create_app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='trs-server',
+        description='Serve TRS analysis, QnA and ingest as JSON endpoints'
+    )
+
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Address to listen on'
+    )
+
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8080,
+        help='Port to listen on'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=8,
+        help='Number of jobs processed concurrently'
+    )
+
+    parser.add_argument(
+        '--max-queue',
+        type=int,
+        default=100,
+        help='Maximum number of queued jobs before requests are rejected with HTTP 429'
+    )
+
+    parser.add_argument(
+        '--max-connections',
+        type=int,
+        default=100,
+        help='Size of the outbound HTTP connection pool (page fetches and OpenAI)'
+    )
+
+    parser.add_argument(
+        '--source-dir',
+        help='Directory of local files (e.g. PDFs) clients may reference by path; without it only http(s) URLs are accepted'
+    )
+
+    add_backend_args(parser)
+
+    args = parser.parse_args()
+
+    OPENAI_KEY = os.environ.get('OPENAI_API_KEY')
+    if OPENAI_KEY is None:
+        logger.error('OPENAI_API_KEY environment variable not set')
+        sys.exit(1)
+
+    configure_scheduler(args)
+
+    from aiohttp import web
+
+    atrs = AsyncTRS(max_connections=args.max_connections, **trs_kwargs(args, OPENAI_KEY))
+    jobs = JobQueue(workers=args.workers, max_queue=args.max_queue)
+    web.run_app(create_app(atrs, jobs, source_dir=args.source_dir), host=args.host, port=args.port)
@@ -19,6 +19,7 @@ from rich.markdown import Markdown
 from colored import Fore, Back, Style
 
 from trs.main import TRS
+from trs.vectordb import build_where
 
 
 st.set_page_config(
@@ -33,6 +34,18 @@ def clear_chat_history():
     st.session_state.messages = []
 
 
+def stream_markdown(tokens) -> str:
+    """Render streamed tokens into a placeholder as they arrive"""
+    placeholder = st.empty()
+    text = ''
+    with st.spinner('Processing...'):
+        for token in tokens:
+            text += token
+            placeholder.markdown(text + '▌')
+    placeholder.markdown(text)
+    return text or None
+
+
 def main():
     st.header('TRS - Threat Report Summarizer')
     st.subheader('Web Playground', divider='rainbow')
@@ -51,6 +64,7 @@ def main():
             'Analyze',
             'Chat',
             'Database',
+            'IOC Lookup',
             'History',
         ]
     )
@@ -61,26 +75,41 @@ def main():
 
         url = st.text_input('Enter URL to process:', key='url_input')
         prompt_dir = 'prompts/'
-        prompt_list = [prompt.replace('.txt', '') for prompt in os.listdir(prompt_dir) if prompt.replace('.txt', '') not in ['qna', 'mindmap', 'custom1']]
+        prompt_list = [prompt.replace('.txt', '') for prompt in os.listdir(prompt_dir) if prompt.replace('.txt', '') not in ['qna', 'mindmap', 'custom1', 'combine']]
 
         prompt_name = st.selectbox('Select a prompt:', prompt_list, key='prompt_select')
 
         response = None
-        iocs = None
-        mindmap = None
+        rendered = False
 
         if st.button('Submit', key='process_button'):
             if url:
                 if prompt_name == 'detect':
-                    with st.spinner('Processing...'):
-                        response = trs.detections(url=url)
+                    response = stream_markdown(trs.stream_detections(url=url))
+                    rendered = True
                 elif prompt_name == 'summary':
+                    # render each stage as soon as it finishes
+                    summary_slot, iocs_slot, mindmap_slot = st.empty(), st.empty(), st.empty()
                     with st.spinner('Processing...'):
-                        summ, mindmap, iocs = trs.summarize(url=url)
-                        response = summ  # or whatever you want to assign to response
+                        for stage, result in trs.iter_summarize(url=url):
+                            if stage == 'summary':
+                                response = result
+                                if result:
+                                    summary_slot.write(result)
+                            elif stage == 'iocs':
+                                if result:
+                                    with iocs_slot.container():
+                                        st.subheader('IOCs')
+                                        st.write(result)
+                            elif stage == 'mindmap':
+                                if result:
+                                    with mindmap_slot.container():
+                                        st.subheader('Mindmap')
+                                        stmd.st_mermaid(result)
+                    rendered = True
                 elif prompt_name:
-                    with st.spinner('Processing...'):
-                        response = trs.custom(url=url, prompt=prompt_name)
+                    response = stream_markdown(trs.stream_custom(url=url, prompt_name=prompt_name))
+                    rendered = True
 
             if response is not None:
                 st.session_state['history'].append({
@@ -89,15 +118,8 @@ def main():
                     'prompt': prompt_name,
                     'response': response
                 })
-                st.write(response)
-
-                if iocs:
-                    st.subheader('IOCs')
-                    st.write(iocs)
-                
-                if mindmap:
-                    st.subheader('Mindmap')
-                    stmd.st_mermaid(mindmap)
+                if not rendered:
+                    st.write(response)
 
             else:
                 st.write('No response received.')
@@ -126,15 +148,17 @@ def main():
             with st.chat_message('user'):
                 st.markdown(chat_input)
 
-            with st.spinner('Thinking...'):
-                qna_answer = trs.qna(prompt=chat_input)
-
-                # Add assistant response to chat history
-                st.session_state.messages.append({'role': 'assistant', 'content': qna_answer})
-
-            # Display assistant response in chat message container
+            # Display assistant response in chat message container as it streams
             with st.chat_message('assistant'):
-                st.markdown(qna_answer)
+                placeholder = st.empty()
+                qna_answer = ''
+                for token in trs.stream_qna(prompt=chat_input):
+                    qna_answer += token
+                    placeholder.markdown(qna_answer + '▌')
+                placeholder.markdown(qna_answer)
+
+            # Add assistant response to chat history
+            st.session_state.messages.append({'role': 'assistant', 'content': qna_answer})
 
 
     elif page == 'History':
@@ -154,13 +178,60 @@ def main():
     elif page == 'Database':
         st.title('Database Viewer')
         st.markdown(f'**Total records:** {trs.vdb.count()}')
-        st.caption('Viewer restricted to 10k records')
-        data = trs.vdb.get()
-        df = pd.DataFrame.from_dict(data)
-        df = df.head(10000)
-        st.dataframe(df.iloc[:,[0, 3, 2, 1]])
 
+        col_source, col_type, col_size, col_page = st.columns([4, 2, 1, 1])
+        source = col_source.text_input('Source:', key='db_source').strip()
+        record_type = col_type.selectbox('Type:', ['all', 'summary'], key='db_type')
+        page_size = col_size.selectbox('Page size:', [50, 100, 500], key='db_page_size')
+        page_num = col_page.number_input('Page:', min_value=1, value=1, step=1, key='db_page')
+
+        records = trs.vdb.list_records(
+            limit=page_size,
+            offset=(page_num - 1) * page_size,
+            where=build_where(
+                source=source or None,
+                doc_type=None if record_type == 'all' else record_type
+            )
+        )
+        if records:
+            df = pd.DataFrame([
+                {
+                    'id': record['id'],
+                    'source': record['metadata'].get('source'),
+                    'type': record['metadata'].get('type', 'chunk'),
+                    'text': record['text']
+                }
+                for record in records
+            ])
+            st.dataframe(df, use_container_width=True)
+        else:
+            st.write('No records found.')
+
+    elif page == 'IOC Lookup':
+        st.title('IOC Lookup')
+        indicator = st.text_input('IP, domain, URL, hash, email, or CVE:', key='ioc_input').strip()
+        if indicator:
+            hits = trs.lookup_ioc(indicator)
+            if hits:
+                df = pd.DataFrame([hit.dict() for hit in hits])
+                st.markdown(f'**{df["source"].nunique()} sources** mention `{hits[0].indicator}`')
+                st.dataframe(
+                    df.groupby(['source', 'kind'])['chunk_id'].count().reset_index(name='chunks'),
+                    use_container_width=True
+                )
+            else:
+                st.write('Indicator not found.')
 
-if __name__ == '__main__':
+
+@st.cache_resource
+def get_trs() -> TRS:
+    """Single TRS instance shared across sessions and reruns"""
     trs = TRS(openai_key=st.secrets['OPENAI_API_KEY'])
-    main()
\ No newline at end of file
+    if not trs.check_connection():
+        st.error('Error connecting to OpenAI; check OPENAI_API_KEY in .streamlit/secrets.toml')
+    return trs
+
+
+if __name__ == '__main__':
+    trs = get_trs()
+    main()
@@ -0,0 +1,256 @@
+import os
+import json
+import asyncio
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from loguru import logger
+
+from .context import format_sources
+from .embeddings import OpenAIEmbeddings
+from .lexical import is_exact_query
+from .main import TRS
+from .metrics import record_tokens, span
+from .scheduler import SCHEDULER, RetryableError, estimate_tokens, parse_retry_after
+from .schema import Document, Indicators, Summary
+from .iocs import extract_iocs
+from .utils import advance, is_url
+
+if TYPE_CHECKING:
+    import aiohttp
+
+    from .llm import LLM, Steps
+
+
+OPENAI_API_BASE = 'https://api.openai.com/v1'
+
+
+class AsyncTRS:
+    """Asyncio front-end to `TRS`.
+
+    URL fetches and OpenAI chat/embedding requests go through one pooled
+    `aiohttp` session using this instance's API key, so many analyses can
+    run concurrently in a single event loop without touching the global
+    `openai` module state. Parsing, chunking and database writes reuse the
+    synchronous `TRS` components and run in worker threads.
+
+    Use as an async context manager, or call `close()` when done.
+    """
+
+    def __init__(
+        self,
+        openai_key: str,
+        max_connections: int = 100,
+        trs: Optional[TRS] = None,
+        api_base: str = OPENAI_API_BASE,
+        timeout: float = 600,
+        **trs_kwargs
+    ) -> None:
+        self.openai_key = openai_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.api_base = api_base.rstrip('/')
+        self.trs = trs or TRS(openai_key=openai_key, **trs_kwargs)
+        self._session = None
+
+    async def __aenter__(self) -> 'AsyncTRS':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> 'aiohttp.ClientSession':
+        if self._session is None or self._session.closed:
+            # imported here to keep `import trs` fast
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        import aiohttp
+
+        try:
+            async with self.session.post(
+                f'{self.api_base}/{path}',
+                json=payload,
+                headers={'Authorization': f'Bearer {self.openai_key}'}
+            ) as response:
+                text = await response.text()
+        except aiohttp.ClientConnectionError as err:
+            raise RetryableError(f'Connection error: {err}')
+
+        try:
+            body = json.loads(text)
+        except ValueError:
+            # e.g. an HTML error page from a proxy
+            body = text
+
+        if response.status >= 400:
+            error = body.get('error', body) if isinstance(body, dict) else body
+            message = f'HTTP {response.status}: {error}'
+            quota = isinstance(error, dict) and error.get('code') == 'insufficient_quota'
+            if (response.status == 429 and not quota) or response.status >= 500:
+                raise RetryableError(
+                    message,
+                    retry_after=parse_retry_after(response.headers),
+                    rate_limited=response.status == 429
+                )
+            raise ValueError(message)
+        return body
+
+    async def _openai(self, path: str, payload: dict) -> dict:
+        """POST to the OpenAI API through the shared rate limit scheduler"""
+        return await SCHEDULER.acall(
+            'embeddings' if path == 'embeddings' else 'chat',
+            lambda: self._post(path, payload),
+            tokens=estimate_tokens(payload),
+            usage=lambda body: (body.get('usage') or {}).get('total_tokens')
+        )
+
+    async def _embed(self, texts: List[str], model: str) -> List[List[float]]:
+        with span('embed'):
+            body = await self._openai('embeddings', {'model': model, 'input': texts})
+        record_tokens(model, embedding=body.get('usage', {}).get('prompt_tokens', 0))
+        return [item['embedding'] for item in sorted(body['data'], key=lambda item: item['index'])]
+
+    async def _llm(self) -> 'LLM':
+        # the first access imports openai and tiktoken; keep that off the event loop
+        return await asyncio.to_thread(lambda: self.trs.llm)
+
+    async def _call_openai(self, llm: 'LLM', request: dict) -> Optional[str]:
+        """Async counterpart of `LLM._call_openai()`; cache and token work runs in worker threads"""
+        cached, params = await asyncio.to_thread(lambda: llm.prepare_request(**request))
+        if params is None:
+            return cached
+
+        try:
+            with span('llm'):
+                body = await self._openai('chat/completions', params)
+        except Exception as err:
+            logger.error(f'Error calling OpenAI: {err}')
+            return None
+
+        return await asyncio.to_thread(llm.finish_request, body, request.get('cache_key'))
+
+    async def _run_steps(self, llm: 'LLM', steps: 'Steps') -> Optional[str]:
+        """Drive an `LLM` request plan, sending each batch of requests concurrently"""
+        done, requests = await asyncio.to_thread(advance, steps)
+        while not done:
+            results = await asyncio.gather(*[self._call_openai(llm, request) for request in requests])
+            done, requests = await asyncio.to_thread(advance, steps, list(results))
+        return requests
+
+    async def _generic_prompt(self, prompt_name: str, doc: Document) -> Optional[str]:
+        llm = await self._llm()
+        return await self._run_steps(llm, llm.prompt_steps(prompt_name, doc))
+
+    async def _fetch_url(self, url: str) -> Optional[Document]:
+        loader = self.trs.loader
+        doc, headers, cached = await asyncio.to_thread(loader.prepare_fetch, url)
+        if doc is not None:
+            return doc
+
+        try:
+            import aiohttp
+            timeout = aiohttp.ClientTimeout(total=loader.timeout)
+            with span('fetch'):
+                async with self.session.get(url, headers=headers, timeout=timeout) as response:
+                    html = await response.text()
+                    status, response_headers = response.status, dict(response.headers)
+            return await asyncio.to_thread(loader.finish_fetch, url, status, html, response_headers, cached)
+        except Exception as err:
+            logger.error(f'error retrieving html: {url} - {err}')
+            return None
+
+    async def url_to_doc(self, url: str) -> Optional[Document]:
+        """Fetch a URL (or load a local PDF) and index it if it is new"""
+        logger.info(f'processing: {url}')
+        if not is_url(url) and await asyncio.to_thread(os.path.isfile, url):
+            return await asyncio.to_thread(self.trs.source_to_doc, url)
+
+        doc = await self._fetch_url(url)
+        if doc is None:
+            logger.error(f'Error retrieving Document: {url}')
+            return None
+
+        await asyncio.to_thread(self.trs.index_document, doc)
+        return doc
+
+    async def _summary(self, doc: Document, is_new: bool) -> Optional[str]:
+        summary = await self._generic_prompt('summary', doc)
+        if summary and is_new:
+            await asyncio.to_thread(self.trs.store_summary, Summary(source=doc.source, summary=summary))
+        return summary
+
+    async def summarize(self, url: str) -> Tuple[Optional[str], Optional[str], Optional[Indicators]]:
+        is_new = await asyncio.to_thread(lambda: url not in self.trs.registry)
+        doc = await self.url_to_doc(url)
+        if doc is None:
+            return None, None, None
+
+        results = await asyncio.gather(
+            self._summary(doc, is_new),
+            self._generic_prompt('mindmap', doc),
+            asyncio.to_thread(span('iocs')(extract_iocs), doc.text),
+            return_exceptions=True
+        )
+        for stage, result in zip(['summary', 'mindmap', 'iocs'], results):
+            if isinstance(result, Exception):
+                logger.error(f'Error running {stage} stage: {result}')
+        return tuple(None if isinstance(result, Exception) else result for result in results)
+
+    async def detections(self, url: str) -> Optional[str]:
+        doc = await self.url_to_doc(url)
+        if doc is None:
+            return None
+        return await self._generic_prompt('detect', doc)
+
+    async def custom(self, url: str, prompt_name: str) -> Optional[str]:
+        doc = await self.url_to_doc(url)
+        if doc is None:
+            return None
+        return await self._generic_prompt(prompt_name, doc)
+
+    async def qna(self, prompt: str) -> Optional[str]:
+        logger.info(f'processing: {prompt}')
+        answer = self.trs.cached_answer(prompt)
+        if answer is not None:
+            return answer
+
+        vdb = await asyncio.to_thread(lambda: self.trs.vdb)
+        embedding = None
+        # exact-token queries are usually answered from the lexical index alone
+        if not is_exact_query(prompt):
+            try:
+                if isinstance(vdb.embeddings, OpenAIEmbeddings):
+                    embedding = (await self._embed([prompt], model=vdb.embeddings.model))[0]
+                elif self.trs.qna_cache.enabled:
+                    embedding = (await asyncio.to_thread(vdb.embeddings.embed, [prompt]))[0]
+            except Exception as err:
+                logger.error(f'Error embedding query: {err}')
+                return None
+
+        if embedding is not None:
+            answer = self.trs.cached_answer(prompt, embedding=embedding)
+            if answer is not None:
+                return answer
+
+        # without a precomputed embedding the query is embedded in the worker thread
+        context, citations, response = await asyncio.to_thread(self.trs.build_context, prompt, embedding=embedding)
+        llm = await self._llm()
+        request = await asyncio.to_thread(llm.qna_request, prompt, context)
+        if request is None:
+            return None
+
+        answer = await self._call_openai(llm, request)
+        if answer:
+            answer += format_sources(answer, citations)
+            self.trs.qna_cache.set(prompt, answer, results=response, embedding=embedding)
+        return answer
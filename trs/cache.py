@@ -0,0 +1,321 @@
+import os
+import time
+import sqlite3
+import threading
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from loguru import logger
+
+from .lexical import identifiers, iter_terms, query_terms
+from .utils import sha256
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class ResponseCache:
+    """Two tier (memory LRU + SQLite on disk) cache of LLM responses.
+
+    The on-disk size is tracked as a running total; expired rows are purged
+    (and the total re-read from disk) every `purge_every` writes.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_items: int = 256,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: Optional[float] = 30 * 24 * 60 * 60,
+        enabled: bool = True,
+        purge_every: int = 256
+    ) -> None:
+        self.db_path = db_path
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.purge_every = purge_every
+
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._conn.commit()
+        self._total = self._stored_bytes()
+        self._writes = 0
+
+    @staticmethod
+    def make_key(model: str, template: str, text: str) -> str:
+        """Content-addressed key from the model, prompt template and document text"""
+        return sha256('\0'.join([model, sha256(template), sha256(text)]))
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                value, created = item
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                'SELECT value, created, size FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created, size = row
+            if self._expired(created):
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                self._total -= size
+                return None
+
+            self._conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+            self._remember(key, value, created)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._remember(key, value, now)
+            try:
+                replaced = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                    (key, value, size, now, now)
+                )
+                self._total += size - (replaced[0] if replaced else 0)
+                self._writes += 1
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as err:
+                logger.error(f'Failed to write response cache: {err}')
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _evict(self) -> None:
+        if self._writes % self.purge_every == 0:
+            if self.ttl is not None:
+                self._conn.execute('DELETE FROM responses WHERE created < ?', (time.time() - self.ttl,))
+            # also picks up rows written by other processes sharing the cache
+            self._total = self._stored_bytes()
+
+        if self._total <= self.max_bytes:
+            return
+
+        # drop least recently used rows until we are back under the size limit
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall():
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._memory.pop(key, None)
+            self._total -= size
+            if self._total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+            self._total = 0
+
+
+class FetchCache:
+    """SQLite cache of fetched HTML, extracted text and HTTP validators keyed by URL"""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'url TEXT PRIMARY KEY, html_hash TEXT NOT NULL, html TEXT NOT NULL, text TEXT NOT NULL, '
+            'etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT html_hash, html, text, etag, last_modified, fetched_at FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ['html_hash', 'html', 'text', 'etag', 'last_modified', 'fetched_at']
+        return dict(zip(keys, row))
+
+    def set(self, url: str, html: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO pages (url, html_hash, html, text, etag, last_modified, fetched_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (url, sha256(html), html, text, etag, last_modified, time.time())
+                )
+                self._conn.commit()
+            except sqlite3.Error as err:
+                logger.error(f'Failed to write fetch cache: {err}')
+
+    def touch(self, url: str) -> None:
+        """Mark a cached page as freshly validated"""
+        with self._lock:
+            self._conn.execute('UPDATE pages SET fetched_at = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
+
+
+class QnACache:
+    """In-memory LRU of chat answers, matched by question text or embedding similarity.
+
+    Similar questions only match when they name the same identifiers, since
+    `APT29` and `APT28` questions embed almost identically.
+
+    Each entry remembers the chunks its answer was built from. It is dropped
+    when newly indexed chunks come from one of those sources, contain every
+    term of the question, or embed closer to the question than the furthest
+    chunk the answer used.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_items: int = 256, enabled: bool = True) -> None:
+        self.threshold = threshold
+        self.max_items = max_items
+        self.enabled = enabled
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return ' '.join(question.lower().split()).rstrip('?.! ')
+
+    @staticmethod
+    def _unit(vector: List[float]) -> 'np.ndarray':
+        import numpy as np
+
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, question: str, embedding: Optional[List[float]] = None) -> Optional[str]:
+        """Answer to the same question, or to the most similar one above the threshold naming the same identifiers"""
+        if not self.enabled:
+            return None
+
+        key = self.normalize(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and embedding is not None:
+                query = self._unit(embedding)
+                query_identifiers = identifiers(question)
+                best = self.threshold
+                for candidate_key, candidate in self._entries.items():
+                    if candidate['embedding'] is None or len(candidate['embedding']) != len(query):
+                        continue
+                    if candidate['identifiers'] != query_identifiers:
+                        continue
+                    similarity = float(candidate['embedding'] @ query)
+                    if similarity >= best:
+                        key, entry, best = candidate_key, candidate, similarity
+
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry['answer']
+
+    def set(self, question: str, answer: str, results: List[dict], embedding: Optional[List[float]] = None) -> None:
+        if not self.enabled:
+            return
+
+        distances = [item['distance'] for item in results if item.get('distance') is not None]
+        entry = {
+            'answer': answer,
+            'embedding': self._unit(embedding) if embedding is not None else None,
+            'terms': set(query_terms(question)),
+            'identifiers': identifiers(question),
+            'sources': {(item.get('metadata') or {}).get('source') for item in results},
+            'max_distance': max(distances) if distances else None,
+        }
+        with self._lock:
+            key = self.normalize(question)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def needs_embeddings(self) -> bool:
+        """Whether `invalidate()` would compare chunk embeddings against any entry"""
+        with self._lock:
+            return any(entry['max_distance'] is not None for entry in self._entries.values())
+
+    def invalidate(
+        self,
+        sources: Iterable[str],
+        texts: Iterable[str],
+        embeddings: Optional[List[List[float]]] = None
+    ) -> int:
+        """Drop entries that newly indexed chunks could change the answer to"""
+        if not self._entries:
+            return 0
+
+        sources = set(sources)
+        chunk_terms = [set(iter_terms(text)) for text in texts]
+        vectors = [self._unit(vector) for vector in embeddings or []]
+
+        def stale(entry: dict) -> bool:
+            if entry['sources'] & sources:
+                return True
+            if entry['terms'] and any(entry['terms'] <= terms for terms in chunk_terms):
+                return True
+            if entry['embedding'] is None or entry['max_distance'] is None:
+                return False
+            return any(
+                len(vector) == len(entry['embedding']) and 1 - float(entry['embedding'] @ vector) < entry['max_distance']
+                for vector in vectors
+            )
+
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if stale(entry)]
+            for key in keys:
+                del self._entries[key]
+
+        if keys:
+            logger.info(f'Invalidated {len(keys)} cached answers')
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,21 +1,145 @@
-from llama_index.text_splitter import SentenceSplitter
+import re
+
+from typing import Iterator, List, Tuple
 
 from loguru import logger
 
-from typing import List
+from .schema import Chunk
+from .utils import get_encoding
+
+
+# a segment ends after a newline run, or after sentence punctuation
+# (plus closing quotes/brackets) followed by whitespace
+BOUNDARY_RE = re.compile(r'\n\s*|(?<=[.!?])["\')\]]*[ \t]+')
+WORD_RE = re.compile(r'\S+\s*')
 
 
 class TextSplitter:
-    def __init__(self, chunk_size: int, overlap: int):
-        self.splitter = SentenceSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=overlap
-        )
+    """Token-aware sentence/paragraph splitter.
+
+    Text is cut into sentence and paragraph segments, each segment is
+    tokenized once, and segments are packed into chunks of at most
+    `chunk_size` tokens. Consecutive chunks share up to `overlap` tokens
+    of whole segments. Segments longer than `chunk_size` are split on
+    words (and, for a single giant word, on characters).
+    """
+
+    def __init__(self, chunk_size: int, overlap: int, encoding_name: str = 'cl100k_base'):
+        if overlap >= chunk_size:
+            raise ValueError(f'overlap ({overlap}) must be smaller than chunk_size ({chunk_size})')
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.encoding_name = encoding_name
+
+    def _count(self, texts: List[str]) -> List[int]:
+        encoding = get_encoding(self.encoding_name)
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+    @staticmethod
+    def _segments(text: str) -> List[Tuple[int, int]]:
+        spans, start = [], 0
+        for match in BOUNDARY_RE.finditer(text):
+            if match.end() > start:
+                spans.append((start, match.end()))
+                start = match.end()
+        if start < len(text):
+            spans.append((start, len(text)))
+        return spans
+
+    def _split_oversized(self, text: str, start: int, end: int) -> Tuple[List[Tuple[int, int]], List[int]]:
+        words = [(m.start(), m.end()) for m in WORD_RE.finditer(text, start, end)]
+        if text[start:end].strip() == '' or not words:
+            return [(start, end)], [0]
+        words[0] = (start, words[0][1])
+
+        counts = self._count([text[s:e] for s, e in words])
+        spans, span_counts = [], []
+        for (s, e), count in zip(words, counts):
+            if count <= self.chunk_size:
+                spans.append((s, e))
+                span_counts.append(count)
+                continue
+
+            # a single "word" bigger than a chunk (base64 blobs, minified code)
+            guess = max(1, (e - s) * self.chunk_size // count)
+            piece_start = s
+            while piece_start < e:
+                piece_end, piece_count = self._fit(text, piece_start, e, guess)
+                spans.append((piece_start, piece_end))
+                span_counts.append(piece_count)
+                piece_start = piece_end
+        return spans, span_counts
+
+    def _fit(self, text: str, start: int, end: int, guess: int) -> Tuple[int, int]:
+        """Largest `stop` in (start, end] where text[start:stop] fits in a chunk, and its token count.
+
+        Gallops out from `start + guess` characters, then bisects. Only a
+        single character that is itself over `chunk_size` can exceed it.
+        """
+        lo, lo_count = start + 1, self._count([text[start:start + 1]])[0]
+        hi = min(end, start + guess)
+        while True:
+            count = self._count([text[start:hi]])[0]
+            if count > self.chunk_size:
+                break
+            lo, lo_count = hi, count
+            if hi == end:
+                return lo, lo_count
+            hi = min(end, start + 2 * (hi - start))
+
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            count = self._count([text[start:mid]])[0]
+            if count <= self.chunk_size:
+                lo, lo_count = mid, count
+            else:
+                hi = mid
+        return lo, lo_count
+
+    def iter_chunks(self, text: str) -> Iterator[Chunk]:
+        """Yield chunks with their character offsets into `text` and token counts"""
+        segments = self._segments(text)
+        counts = self._count([text[s:e] for s, e in segments])
+
+        spans, span_counts = [], []
+        for (s, e), count in zip(segments, counts):
+            if count > self.chunk_size:
+                sub_spans, sub_counts = self._split_oversized(text, s, e)
+                spans.extend(sub_spans)
+                span_counts.extend(sub_counts)
+            else:
+                spans.append((s, e))
+                span_counts.append(count)
+
+        i, n = 0, len(spans)
+        while i < n:
+            j, tokens = i, 0
+            while j < n and (j == i or tokens + span_counts[j] <= self.chunk_size):
+                tokens += span_counts[j]
+                j += 1
+
+            start, end = spans[i][0], spans[j - 1][1]
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start:
+                yield Chunk(text=text[start:end], start=start, end=end, num_tokens=tokens)
+
+            if j >= n:
+                break
+
+            # step back over whole segments to build the overlap, but only as far as
+            # still leaves room for segment j; otherwise the next chunk would hold
+            # nothing but overlap
+            limit = min(self.overlap, self.chunk_size - span_counts[j])
+            k, back = j, 0
+            while k - 1 > i and back + span_counts[k - 1] <= limit:
+                k -= 1
+                back += span_counts[k]
+            i = k
 
     def split(self, text: str) -> List[str]:
-        # slim this down to `return split_text` only,
-        # the rest of this crap is for temp debug purposes
-        logger.info(f'Splitting text (len:{len(text)})')
-        chunks = self.splitter.split_text(text)
-        logger.info(f'Chunks: {len(chunks)}')
+        chunks = [chunk.text for chunk in self.iter_chunks(text)]
+        logger.debug(f'Split text (len:{len(text)}) into {len(chunks)} chunks')
         return chunks
@@ -0,0 +1,133 @@
+import re
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .schema import Citation
+
+
+# chunks are trimmed of whitespace, so touching chunks can be a character apart
+ADJACENT_CHARS = 1
+CITATION_RE = re.compile(r'\[(\d+(?:\s*,\s*\d+)*)\]')
+
+
+def _passage(item: dict, rank: int, num_tokens: Callable[[str], int]) -> dict:
+    metadata = item.get('metadata') or {}
+    span = None
+    # summaries and chunks stored before offsets were recorded can't be merged
+    if metadata.get('type') != 'summary' and 'start' in metadata and 'end' in metadata:
+        span = (metadata['start'], metadata['end'])
+    return {
+        'source': metadata.get('source', ''),
+        'span': span,
+        'text': item['text'],
+        'tokens': metadata.get('tokens') or num_tokens(item['text']),
+        'pages': {metadata['page']} if 'page' in metadata else set(),
+        'chunk_ids': [item['id']],
+        'rank': rank
+    }
+
+
+def _join(first: dict, second: dict) -> dict:
+    """Join two passages of the same source where `second` starts before `first` ends (or right after)"""
+    start, end = first['span']
+    second_start, second_end = second['span']
+    joined = {
+        **first,
+        'pages': first['pages'] | second['pages'],
+        'chunk_ids': first['chunk_ids'] + second['chunk_ids'],
+        'rank': min(first['rank'], second['rank'])
+    }
+    if second_end <= end:
+        return joined
+
+    skip = max(0, end - second_start)
+    added = second['text'][skip:]
+    # token counts are cached per chunk; estimate the non-overlapping part proportionally
+    added_tokens = round(second['tokens'] * len(added) / max(1, len(second['text'])))
+    joined.update(
+        span=(start, second_end),
+        text=first['text'] + ('' if second_start <= end else ' ') + added,
+        tokens=first['tokens'] + added_tokens
+    )
+    return joined
+
+
+def merge_passages(items: List[dict], num_tokens: Callable[[str], int]) -> List[dict]:
+    """Merge overlapping or adjacent chunks of the same source, ordered by their best rank"""
+    passages = [_passage(item, rank, num_tokens) for rank, item in enumerate(items)]
+    merged = [passage for passage in passages if passage['span'] is None]
+
+    by_source: Dict[str, List[dict]] = {}
+    for passage in passages:
+        if passage['span'] is not None:
+            by_source.setdefault(passage['source'], []).append(passage)
+
+    for source_passages in by_source.values():
+        current = None
+        for passage in sorted(source_passages, key=lambda p: p['span']):
+            if current is not None and passage['span'][0] <= current['span'][1] + ADJACENT_CHARS:
+                current = _join(current, passage)
+            else:
+                if current is not None:
+                    merged.append(current)
+                current = passage
+        merged.append(current)
+
+    return sorted(merged, key=lambda passage: passage['rank'])
+
+
+def pack_context(items: List[dict], budget: int, num_tokens: Callable[[str], int]) -> List[dict]:
+    """Choose ranked chunks greedily while the merged passages fit in `budget` tokens.
+
+    Chunks overlapping an already chosen passage only cost their new text,
+    so neighbouring hits extend a passage instead of repeating it.
+    """
+    header_tokens: Dict[str, int] = {}
+
+    def cost(passages: List[dict]) -> int:
+        total = 0
+        for passage in passages:
+            if passage['source'] not in header_tokens:
+                header_tokens[passage['source']] = num_tokens(passage['source']) + 8
+            total += passage['tokens'] + header_tokens[passage['source']]
+        return total
+
+    selected = []
+    for item in items:
+        if cost(merge_passages(selected + [item], num_tokens)) <= budget:
+            selected.append(item)
+    return merge_passages(selected, num_tokens)
+
+
+def _pages(pages: set) -> str:
+    if not pages:
+        return ''
+    low, high = min(pages), max(pages)
+    return f' (page {low})' if low == high else f' (pages {low}-{high})'
+
+
+def format_context(passages: List[dict]) -> Tuple[str, List[Citation]]:
+    """Number each passage under a citation header; returns the context and its citations"""
+    blocks, citations = [], []
+    for number, passage in enumerate(passages, start=1):
+        citation = Citation(
+            number=number,
+            source=passage['source'],
+            pages=sorted(passage['pages']),
+            chunk_ids=passage['chunk_ids']
+        )
+        citations.append(citation)
+        blocks.append(f'[{number}] {citation.source}{_pages(passage["pages"])}\n{passage["text"]}')
+    return '\n\n'.join(blocks), citations
+
+
+def format_sources(answer: Optional[str], citations: List[Citation]) -> str:
+    """Source list for the citation numbers referenced in an answer"""
+    if not answer:
+        return ''
+    numbers = {int(n) for match in CITATION_RE.findall(answer) for n in match.split(',')}
+    lines = [
+        f'[{citation.number}] {citation.source}{_pages(set(citation.pages))}'
+        for citation in citations if citation.number in numbers
+    ]
+    return '\n\nSources:\n' + '\n'.join(lines) if lines else ''
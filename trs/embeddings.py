@@ -0,0 +1,159 @@
+import math
+import hashlib
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from loguru import logger
+
+from .metrics import record_tokens, span, submit
+from .scheduler import SCHEDULER, estimate_tokens
+
+
+class EmbeddingBackend:
+    """Base class for embedding backends.
+
+    Subclasses implement `_embed_batch()`; `embed()` splits the input into
+    batches of `batch_size` texts and runs up to `max_workers` batches
+    concurrently. `name`, `model` and `dimension` are recorded on each
+    collection so vectors from different backends are never mixed.
+    """
+
+    name = 'base'
+
+    def __init__(self, model: str, dimension: Optional[int] = None, batch_size: int = 64, max_workers: int = 1) -> None:
+        self.model = model
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with span('embed'):
+            if len(batches) == 1 or self.max_workers <= 1:
+                results = [self._embed_batch(batch) for batch in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                    futures = [submit(pool, self._embed_batch, batch) for batch in batches]
+                    results = [future.result() for future in futures]
+
+        vectors = [[float(v) for v in vector] for batch in results for vector in batch]
+        if self.dimension is None and vectors:
+            self.dimension = len(vectors[0])
+        return vectors
+
+    def describe(self) -> dict:
+        """Collection metadata identifying the vectors this backend produces"""
+        return {
+            'embedding_backend': self.name,
+            'embedding_model': self.model,
+            'embedding_dim': self.dimension or 0
+        }
+
+
+class OpenAIEmbeddings(EmbeddingBackend):
+    """OpenAI embeddings API; batches are sent as parallel requests"""
+
+    name = 'openai'
+    DIMENSIONS = {'text-embedding-ada-002': 1536, 'text-embedding-3-small': 1536, 'text-embedding-3-large': 3072}
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = 'text-embedding-ada-002',
+        batch_size: int = 256,
+        max_workers: int = 4
+    ) -> None:
+        super().__init__(model=model, dimension=self.DIMENSIONS.get(model), batch_size=batch_size, max_workers=max_workers)
+        self.api_key = api_key
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        import openai
+
+        # the key is passed per request so the global openai state is left alone
+        response = SCHEDULER.call(
+            'embeddings',
+            lambda: openai.Embedding.create(input=texts, model=self.model, api_key=self.api_key),
+            tokens=estimate_tokens({'input': texts}),
+            usage=lambda response: (response.get('usage') or {}).get('total_tokens')
+        )
+        record_tokens(self.model, embedding=(response.get('usage') or {}).get('prompt_tokens', 0))
+        return [item['embedding'] for item in sorted(response['data'], key=lambda item: item['index'])]
+
+
+class LocalEmbeddings(EmbeddingBackend):
+    """all-MiniLM-L6-v2 on CPU through onnxruntime (bundled with chromadb).
+
+    The model (~80MB) is downloaded to ~/.cache/chroma on first use; after
+    that embedding runs fully offline.
+    """
+
+    name = 'local'
+
+    def __init__(self, batch_size: int = 64, max_workers: int = 1) -> None:
+        super().__init__(model='all-MiniLM-L6-v2', dimension=384, batch_size=batch_size, max_workers=max_workers)
+        self._fn = None
+        self._fn_lock = threading.Lock()
+
+    def _load(self):
+        # concurrent batches must not each download and load the model
+        with self._fn_lock:
+            if self._fn is None:
+                from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+                logger.info(f'Loading local embedding model: {self.model}')
+                self._fn = ONNXMiniLM_L6_V2(preferred_providers=['CPUExecutionProvider'])
+        return self._fn
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        fn = self._fn or self._load()
+        return fn(texts)
+
+
+def hash_embedding(text: str, dim: int = 256) -> List[float]:
+    """Deterministic hashed bag-of-words vector, L2 normalized"""
+    vector = [0.0] * dim
+    for token in text.lower().split():
+        token = token.strip('.,;:!?()[]{}"\'')
+        if not token:
+            continue
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], 'little') % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class HashingEmbeddings(EmbeddingBackend):
+    """Feature-hashed bag of words; no model download, fully deterministic.
+
+    Only captures exact term overlap, so it suits offline testing and
+    benchmarking rather than semantic search.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dimension: int = 256, batch_size: int = 1024, max_workers: int = 1) -> None:
+        super().__init__(model=f'hashing-{dimension}', dimension=dimension, batch_size=batch_size, max_workers=max_workers)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [hash_embedding(text, self.dimension) for text in texts]
+
+
+BACKENDS = ['openai', 'local', 'hashing']
+
+
+def get_backend(name: str, openai_key: Optional[str] = None, **kwargs) -> EmbeddingBackend:
+    if name == 'openai':
+        return OpenAIEmbeddings(api_key=openai_key, **kwargs)
+    if name == 'local':
+        return LocalEmbeddings(**kwargs)
+    if name == 'hashing':
+        return HashingEmbeddings(**kwargs)
+    raise ValueError(f'Unknown embedding backend: {name} (expected one of {", ".join(BACKENDS)})')
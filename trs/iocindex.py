@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import threading
+
+from typing import Iterable, Iterator, List, Optional
+
+from loguru import logger
+
+from .iocs import iter_iocs, refang
+from .schema import IOCHit
+
+
+class IOCIndex:
+    """SQLite inverted index from normalized indicator to sources and chunk IDs"""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._backfilled = False
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS iocs ('
+            'indicator TEXT NOT NULL, kind TEXT NOT NULL, source TEXT NOT NULL, chunk_id TEXT NOT NULL, '
+            'PRIMARY KEY (indicator, source, chunk_id)) WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS iocs_source ON iocs (source)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.commit()
+
+    @property
+    def backfilled(self) -> bool:
+        """True once the chunks stored before this index existed have been indexed"""
+        if not self._backfilled:
+            with self._lock:
+                row = self._conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone()
+            self._backfilled = row is not None
+        return self._backfilled
+
+    def mark_backfilled(self) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', '1')")
+            self._conn.commit()
+        self._backfilled = True
+
+    def add_chunks(self, source: str, chunks: List[str], chunk_ids: List[str]) -> int:
+        """Index the indicators found in each chunk of a source"""
+        rows = {
+            (ioc, kind, source, chunk_id)
+            for chunk, chunk_id in zip(chunks, chunk_ids)
+            for kind, ioc in iter_iocs(chunk, defang_urls=False)
+        }
+        if not self.add_rows(rows):
+            return 0
+
+        logger.info(f'Indexed {len(rows)} indicators for {source}')
+        return len(rows)
+
+    def add_rows(self, rows: Iterable[tuple]) -> bool:
+        """Insert `(indicator, kind, source, chunk_id)` rows, e.g. from `iter_rows()`"""
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO iocs (indicator, kind, source, chunk_id) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+                self._conn.commit()
+            except sqlite3.Error as err:
+                logger.error(f'Failed to update IOC index: {err}')
+                return False
+        return True
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Stream every `(indicator, kind, source, chunk_id)` row over a separate read connection"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield from conn.execute('SELECT indicator, kind, source, chunk_id FROM iocs')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize(indicator: str) -> str:
+        """Normalize a (possibly defanged) indicator the same way it was indexed"""
+        indicator = indicator.strip()
+        for _, ioc in iter_iocs(indicator, defang_urls=False):
+            return ioc
+        return refang(indicator).lower()
+
+    def lookup(self, indicator: str, limit: Optional[int] = 1000) -> List[IOCHit]:
+        normalized = self.normalize(indicator)
+        if not normalized:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT indicator, kind, source, chunk_id FROM iocs WHERE indicator = ? LIMIT ?',
+                (normalized, limit if limit is not None else -1)
+            ).fetchall()
+        return [IOCHit(indicator=row[0], kind=row[1], source=row[2], chunk_id=row[3]) for row in rows]
+
+    def sources(self, indicator: str) -> List[str]:
+        return list(dict.fromkeys(hit.source for hit in self.lookup(indicator, limit=None)))
@@ -1,28 +1,149 @@
-import iocextract
+import re
+import ipaddress
+
+from typing import Dict, Iterable, Iterator, Tuple
+from urllib.parse import urlsplit
 
 from .schema import Indicators
 
 
-def update_iocs(iocs, ext_func, content, defang=False):
-    if ext_func == iocextract.extract_urls:
-        for ioc in ext_func(content, defang=defang):
-            if ioc not in iocs:
-                iocs.append(ioc)
-    else:
-        for ioc in ext_func(content):
-            if ioc not in iocs:
-                iocs.append(ioc)
+# common defang styles, e.g. hxxp://evil[.]com, user[@]evil(.)com
+REFANG_RE = re.compile(
+    r'hxxp|\[\.\]|\(\.\)|\{\.\}|\[dot\]|\(dot\)|\[:\]|\[://\]|\[@\]|\[at\]',
+    re.IGNORECASE
+)
+REFANG_MAP = {
+    '[.]': '.', '(.)': '.', '{.}': '.', '[dot]': '.', '(dot)': '.',
+    '[:]': ':', '[://]': '://', '[@]': '@', '[at]': '@'
+}
+
+_OCTET = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+_HEX4 = r'[A-Fa-f0-9]{1,4}'
+
+# a single pass over the text; earlier alternatives win, so URLs and emails
+# consume the domains inside them before the bare domain pattern is tried
+IOC_RE = re.compile(
+    r'(?P<url>\b(?:https?|ftp)://[^\s<>"\'`]+)'
+    r'|(?P<email>\b[A-Za-z0-9._%+-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,24}\b)'
+    r'|(?P<cve>\bCVE-\d{4}-\d{4,7}\b)'
+    rf'|(?P<ipv6>(?<![\w:])(?:(?:{_HEX4}:){{7}}{_HEX4}|(?:{_HEX4}:){{1,7}}:(?:{_HEX4}(?::{_HEX4}){{0,6}})?)(?![\w:]))'
+    rf'|(?P<ipv4>\b{_OCTET}(?:\.{_OCTET}){{3}}\b)'
+    r'|(?P<hash>\b(?:[A-Fa-f0-9]{128}|[A-Fa-f0-9]{64}|[A-Fa-f0-9]{40}|[A-Fa-f0-9]{32})\b)'
+    r'|(?P<ssdeep>\b\d{1,10}:[A-Za-z0-9/+]{3,}:[A-Za-z0-9/+]{3,}\b)'
+    r'|(?P<domain>\b(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,24}\b)',
+    re.IGNORECASE
+)
+
+# file extensions that would otherwise be picked up as domain TLDs
+FILE_EXTENSIONS = {
+    'exe', 'dll', 'sys', 'bat', 'cmd', 'ps1', 'vbs', 'js', 'jse', 'hta', 'lnk', 'scr',
+    'py', 'sh', 'php', 'asp', 'aspx', 'jsp', 'html', 'htm', 'txt', 'log', 'ini', 'cfg',
+    'dat', 'bin', 'tmp', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'pdf', 'rtf', 'iso',
+    'img', 'vhd', 'msi', 'jar', 'json', 'xml', 'yaml', 'yml', 'png', 'jpg', 'jpeg', 'gif',
+    'zip', 'rar', '7z', 'gz', 'tar', 'db', 'sqlite', 'csv', 'md', 'go', 'rs', 'cpp', 'cs'
+}
+
+# bare `word.word` tokens are only domains when the last label is a real TLD;
+# this keeps code (`os.path.join`, `System.Net.WebClient`) and run-together
+# prose out of the results. Country codes plus generic TLDs seen in reports.
+TLDS = frozenset('''
+    ac ad ae af ag ai al am ao aq ar as at au aw ax az ba bb bd be bf bg bh bi bj bm bn bo br bs bt bw by bz
+    ca cc cd cf cg ch ci ck cl cm cn co cr cu cv cw cx cy cz de dj dk dm do dz ec ee eg er es et eu fi fj fk
+    fm fo fr ga gd ge gf gg gh gi gl gm gn gp gq gr gs gt gu gw gy hk hm hn hr ht hu id ie il im in io iq ir
+    is it je jm jo jp ke kg kh ki km kn kp kr kw ky kz la lb lc li lk lr ls lt lu lv ly ma mc md me mg mh mk
+    ml mm mn mo mp mq mr ms mt mu mv mw mx my mz na nc ne nf ng ni nl no np nr nu nz om pa pe pf pg ph pk pl
+    pm pn pr ps pt pw py qa re ro rs ru rw sa sb sc sd se sg sh si sk sl sm sn so sr ss st su sv sx sy sz tc
+    td tf tg th tj tk tl tm tn to tr tt tv tw tz ua ug uk us uy uz va vc ve vg vi vn vu wf ws ye yt za zm zw
+    com net org info biz gov edu mil int arpa name pro mobi asia tel travel jobs aero coop museum cat post xxx
+    app dev xyz top site online club shop store tech space website fun icu buzz cloud host vip win bid loan
+    men review stream download racing party date trade science cricket faith accountant monster rest best
+    cyou sbs lol quest bond cfd beauty hair skin makeup digital network services solutions support email
+    group company center world today life news media studio agency global ltd inc llc pics photo wiki tools
+    systems software security pub kim gdn cam guru ninja rocks social chat games casino bet money finance
+    bank cash exchange market trading live blog
+'''.split())
+
+FIELDS = ['ips', 'ipv6s', 'urls', 'domains', 'emails', 'hashes', 'cves']
+
+
+def refang(content: str) -> str:
+    return REFANG_RE.sub(lambda m: REFANG_MAP.get(m.group(0).lower(), 'http'), content)
+
+
+def defang_url(url: str) -> str:
+    # iocextract is only needed for defanging; import it on first use
+    import iocextract
+    return iocextract.defang_data(url)
+
+
+def _url_host(url: str) -> str:
+    try:
+        return urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+
+
+def iter_iocs(content: str, defang_urls: bool = True) -> Iterator[Tuple[str, str]]:
+    """Yield normalized `(field, indicator)` pairs found in one pass over the text"""
+    for match in IOC_RE.finditer(refang(content)):
+        kind, ioc = match.lastgroup, match.group()
+
+        if kind == 'url':
+            ioc = ioc.rstrip('.,;:!?)]}')
+            yield 'urls', defang_url(ioc) if defang_urls else ioc
+            host = _url_host(ioc)
+            if '.' in host and host.rsplit('.', 1)[1].isalpha():
+                yield 'domains', host
+        elif kind == 'email':
+            yield 'emails', ioc.lower()
+            yield 'domains', ioc.split('@', 1)[1].lower()
+        elif kind == 'cve':
+            yield 'cves', ioc.upper()
+        elif kind == 'ipv6':
+            # skip things like `a::b` or `dead::beef` from code snippets
+            if any(c.isdigit() for c in ioc):
+                try:
+                    yield 'ipv6s', str(ipaddress.IPv6Address(ioc))
+                except ValueError:
+                    pass
+        elif kind == 'ipv4':
+            yield 'ips', ioc
+        elif kind == 'hash':
+            yield 'hashes', ioc.lower()
+        elif kind == 'ssdeep':
+            yield 'hashes', ioc
+        elif kind == 'domain':
+            tld = ioc.rsplit('.', 1)[1].lower()
+            if tld in TLDS and tld not in FILE_EXTENSIONS:
+                yield 'domains', ioc.lower()
+
+
+class IOCExtractor:
+    """Incremental single-pass indicator extractor.
+
+    Call `feed()` with each chunk of text (chunks may overlap) and
+    `indicators()` for the deduplicated results in first-seen order.
+    """
+
+    def __init__(self, defang_urls: bool = True) -> None:
+        self.defang_urls = defang_urls
+        # dicts keep insertion order and give O(1) dedupe
+        self._found: Dict[str, Dict[str, None]] = {field: {} for field in FIELDS}
+
+    def feed(self, content: str) -> None:
+        for field, ioc in iter_iocs(content, defang_urls=self.defang_urls):
+            self._found[field][ioc] = None
+
+    def indicators(self) -> Indicators:
+        return Indicators(**{field: list(found) for field, found in self._found.items()})
 
 
-def extract_iocs(content: str):
-    iocs = Indicators(
-        ips=[],
-        urls=[],
-        hashes=[]
-    )
+def extract_iocs_from_chunks(chunks: Iterable[str]) -> Indicators:
+    extractor = IOCExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+    return extractor.indicators()
 
-    update_iocs(iocs.ips, iocextract.extract_ipv4s, content)
-    update_iocs(iocs.urls, iocextract.extract_urls, content, defang=True)
-    update_iocs(iocs.hashes, iocextract.extract_hashes, content)
 
-    return iocs
\ No newline at end of file
+def extract_iocs(content: str) -> Indicators:
+    return extract_iocs_from_chunks([content])
@@ -0,0 +1,130 @@
+import json
+import uuid
+import asyncio
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from .metrics import trace
+from .schema import Job
+from .utils import sha256
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+class JobQueue:
+    """Bounded asyncio work queue that coalesces identical requests.
+
+    A job is keyed by its operation name and parameters. Submitting a key
+    that is already queued or running returns the existing job instead of
+    starting a new computation. At most `max_queue` jobs wait for one of
+    the `workers` tasks; beyond that `submit()` raises `QueueFull` so callers
+    can apply backpressure. Finished jobs are kept for polling until
+    `max_history` newer jobs have finished.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100, max_history: int = 1000) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_history = max_history
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[str, str] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._finished: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def make_key(op: str, params: dict) -> str:
+        return sha256(json.dumps([op, params], sort_keys=True))
+
+    def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._queue = [], None
+
+    def submit(self, op: str, params: dict, func: Callable[[], Awaitable[Any]]) -> Tuple[Job, bool]:
+        """Queue `func` under `(op, params)`; returns `(job, coalesced)`"""
+        self.start()
+        key = self.make_key(op, params)
+
+        job_id = self._inflight.get(key)
+        if job_id is not None:
+            job = self._jobs[job_id]
+            job.subscribers += 1
+            logger.info(f'Coalescing {op} request into job {job.id}')
+            return job, True
+
+        job = Job(id=uuid.uuid4().hex, op=op, key=key, status=QUEUED, created=datetime.now())
+        try:
+            self._queue.put_nowait((job, func))
+        except asyncio.QueueFull:
+            raise QueueFull(f'Job queue is full ({self.max_queue} pending)')
+
+        self._jobs[job.id] = job
+        self._inflight[key] = job.id
+        self._events[job.id] = asyncio.Event()
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def running(self) -> int:
+        return len(self._inflight) - self.pending()
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to `timeout` seconds for a job to finish"""
+        event = self._events.get(job.id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job, func = await self._queue.get()
+            job.status, job.started = RUNNING, datetime.now()
+            with trace() as job_trace:
+                try:
+                    job.result = await func()
+                    job.status = DONE
+                except Exception as err:
+                    logger.error(f'Job {job.id} ({job.op}) failed: {err}')
+                    job.status, job.error = FAILED, str(err)
+                finally:
+                    job.metrics = job_trace.summary()
+                    job.finished = datetime.now()
+                    self._inflight.pop(job.key, None)
+                    self._events.pop(job.id).set()
+                    self._retire(job)
+                    self._queue.task_done()
+
+    def _retire(self, job: Job) -> None:
+        self._finished[job.id] = None
+        while len(self._finished) > self.max_history:
+            old_id, _ = self._finished.popitem(last=False)
+            self._jobs.pop(old_id, None)
@@ -0,0 +1,180 @@
+import os
+import re
+import sqlite3
+import threading
+
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from loguru import logger
+
+from .iocs import refang
+from .schema import LexicalHit
+
+
+# words joined by dots or hyphens stay whole, e.g. t1059.001, cve-2023-34362, evil.com
+TERM_RE = re.compile(r'\w+(?:[.\-]\w+)*')
+PART_RE = re.compile(r'[.\-]')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'did', 'do', 'does', 'for', 'from', 'has', 'have',
+    'how', 'i', 'in', 'is', 'it', 'its', 'me', 'of', 'on', 'or', 'that', 'the', 'their', 'this', 'to', 'was',
+    'were', 'what', 'when', 'where', 'which', 'who', 'why', 'with', 'you', 'about', 'any', 'tell', 'describe',
+    'summarize', 'explain', 'list'
+}
+
+
+def iter_terms(text: str) -> Iterator[str]:
+    """Lowercased terms of (refanged) text; compound terms also yield their parts"""
+    for match in TERM_RE.finditer(refang(text).lower()):
+        term = match.group(0)
+        yield term
+        if PART_RE.search(term):
+            yield from (part for part in PART_RE.split(term) if part)
+
+
+def is_identifier(term: str) -> bool:
+    """Terms with digits, dots or hyphens name one specific thing, e.g. apt29, t1059.001, evil.com"""
+    return bool(PART_RE.search(term)) or any(c.isdigit() for c in term)
+
+
+def identifiers(text: str) -> Set[str]:
+    """Identifier terms of `text`, whole (compound terms are not split into parts)"""
+    return {term for term in TERM_RE.findall(refang(text).lower()) if is_identifier(term)}
+
+
+def query_terms(query: str) -> List[str]:
+    return [term for term in dict.fromkeys(iter_terms(query)) if term not in STOPWORDS]
+
+
+def is_exact_query(query: str) -> bool:
+    """True for short queries made only of exact tokens.
+
+    That is a single name (`Emotet`), or up to three identifiers such as
+    technique IDs, CVEs, hashes and indicators (`T1059.001`, `CVE-2023-34362`).
+    These are answered from the lexical index without embedding the query.
+    """
+    words = TERM_RE.findall(refang(query).lower())
+    if not words or len(words) > 3:
+        return False
+    if len(words) == 1:
+        return words[0] not in STOPWORDS
+    return all(is_identifier(word) for word in words)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked ID lists; each ID scores the sum of 1 / (k + rank) over the lists"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """SQLite FTS5 index of chunk terms, ranked with BM25.
+
+    Kept alongside the vector database and updated as chunks are stored,
+    so exact tokens (technique IDs, malware names, CVEs, hashes) can be
+    matched without an embedding.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._backfilled = False
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            'rowid INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, source TEXT NOT NULL)'
+        )
+        # terms are pre-tokenized by iter_terms; keep dots and hyphens inside tokens
+        self._conn.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5('
+            'terms, tokenize="unicode61 tokenchars \'._-\'")'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+
+    @property
+    def backfilled(self) -> bool:
+        """True once the chunks stored before this index existed have been indexed"""
+        if not self._backfilled:
+            with self._lock:
+                row = self._conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled'").fetchone()
+            self._backfilled = row is not None
+        return self._backfilled
+
+    def mark_backfilled(self) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', '1')")
+            self._conn.commit()
+        self._backfilled = True
+
+    def add_chunks(self, source: str, chunks: List[str], chunk_ids: List[str]) -> int:
+        """Index the terms of each chunk of a source; chunks already indexed are skipped"""
+        added = self.add_rows(
+            (chunk_id, source, ' '.join(iter_terms(chunk))) for chunk, chunk_id in zip(chunks, chunk_ids)
+        )
+        logger.info(f'Indexed {added} chunks for {source} in lexical index')
+        return added
+
+    def add_rows(self, rows: Iterable[Tuple[str, str, str]]) -> int:
+        """Insert pre-tokenized `(chunk_id, source, terms)` rows, e.g. from `iter_rows()`"""
+        added = 0
+        with self._lock:
+            try:
+                for chunk_id, source, terms in rows:
+                    cursor = self._conn.execute(
+                        'INSERT OR IGNORE INTO chunks (chunk_id, source) VALUES (?, ?)', (chunk_id, source)
+                    )
+                    if cursor.rowcount:
+                        self._conn.execute(
+                            'INSERT INTO chunk_terms (rowid, terms) VALUES (?, ?)', (cursor.lastrowid, terms)
+                        )
+                        added += 1
+                self._conn.commit()
+            except sqlite3.Error as err:
+                self._conn.rollback()
+                logger.error(f'Failed to update lexical index: {err}')
+                return 0
+        return added
+
+    def iter_rows(self) -> Iterator[Tuple[str, str, str]]:
+        """Stream every `(chunk_id, source, terms)` row over a separate read connection"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield from conn.execute(
+                'SELECT chunks.chunk_id, chunks.source, chunk_terms.terms FROM chunks '
+                'JOIN chunk_terms ON chunk_terms.rowid = chunks.rowid'
+            )
+        finally:
+            conn.close()
+
+    def search(self, query: str, limit: int = 10, require_all: bool = False) -> List[LexicalHit]:
+        """BM25-ranked chunks matching any (or, with `require_all`, every) query term"""
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        expression = (' AND ' if require_all else ' OR ').join(f'"{term}"' for term in terms)
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    'SELECT chunks.chunk_id, chunks.source, bm25(chunk_terms) AS rank FROM chunk_terms '
+                    'JOIN chunks ON chunks.rowid = chunk_terms.rowid '
+                    'WHERE chunk_terms MATCH ? ORDER BY rank LIMIT ?',
+                    (expression, limit)
+                ).fetchall()
+            except sqlite3.Error as err:
+                logger.error(f'Failed to search lexical index: {err}')
+                return []
+
+        # bm25() is lower-is-better; flip it so higher scores rank first
+        return [LexicalHit(chunk_id=row[0], source=row[1], score=-row[2]) for row in rows]
@@ -1,92 +1,426 @@
-import os
+import math
 import openai
-import tiktoken
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from loguru import logger
+from .cache import ResponseCache
+from .metrics import record_tokens, span, submit
+from .prompts import read_prompt
+from .scheduler import SCHEDULER, estimate_tokens
+from .utils import advance, get_encoding
 from .schema import Document, Summary
-from typing import Optional
+from typing import TYPE_CHECKING, Generator, Iterator, List, Optional, Tuple
 
+if TYPE_CHECKING:
+    from .chunker import TextSplitter
 
-PROMPT_DIR = os.path.abspath(os.path.join(os.path.abspath('.'), 'prompts'))
+
+SYSTEM_PROMPT = 'You are a helpful AI cybersecurity assistant.'
+
+# a request plan: yields batches of `_call_openai()` kwargs, receives their results, returns the final result
+Steps = Generator[List[dict], List[Optional[str]], Optional[str]]
+# a streamed completion: yields tokens, returns the full text, or None if the request failed
+Stream = Generator[str, None, Optional[str]]
 
 
 class LLM:
-    def __init__(self, openai_api_key: str) -> None:
+    def __init__(
+        self,
+        openai_api_key: str,
+        cache: Optional[ResponseCache] = None,
+        splitter: Optional['TextSplitter'] = None,
+        check_connection: bool = False
+    ) -> None:
         openai.api_key = openai_api_key
+        self.cache = cache
+        self.splitter = splitter
         self.model = 'gpt-4-1106-preview'
         self.encoding_name = 'cl100k_base'
         self.token_limit = 128000
+        # room left for the completion when deciding if a prompt fits
+        self.completion_tokens = 4096
+        # max document tokens sent in each map step of a map-reduce call
+        self.map_tokens = 32000
+        self.map_workers = 4
+
+        if check_connection:
+            self.check_connection(raise_error=True)
 
+    def check_connection(self, raise_error: bool = False) -> bool:
         try:
             openai.Model.list()
+            return True
         except Exception as err:
             logger.error(f'Error connecting to OpenAI: {err}')
-            raise
+            if raise_error:
+                raise
+            return False
 
     def num_tokens(self, text: str) -> int:
         try:
-            encoding = tiktoken.get_encoding(self.encoding_name)
-            return len(encoding.encode(text))
+            encoding = get_encoding(self.encoding_name)
+            return len(encoding.encode(text, disallowed_special=()))
         except Exception as err:
             logger.error(f'Error retrieving encoding: {err}')
             return 0
-    
-    def _read_prompt(self, prompt_name: str) -> Optional[str]:
-        path = os.path.join(PROMPT_DIR, f'{prompt_name}.txt')
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                return f.read()
-        logger.error(f'Prompt not found: {path}')
-        return None
 
-    def _call_openai(self, user_prompt: str, system_prompt: Optional[str] = None) -> Optional[str]:
-        system_prompt = system_prompt or 'You are a helpful AI cybersecurity assistant.'
-        
-        token_counts = [self.num_tokens(p) for p in [user_prompt, system_prompt]]
+    def doc_tokens(self, doc: Document) -> int:
+        """Token count of a document, computed once and cached on the Document"""
+        if doc.num_tokens is None:
+            doc.num_tokens = self.num_tokens(doc.text)
+        return doc.num_tokens
+
+    def read_prompt(self, prompt_name: str) -> Optional[str]:
+        return read_prompt(prompt_name)
+
+    def _prepare_messages(
+        self,
+        user_prompt: str,
+        system_prompt: str,
+        prompt_tokens: Optional[int] = None
+    ) -> Optional[List[dict]]:
+        token_counts = [prompt_tokens or self.num_tokens(user_prompt), self.num_tokens(system_prompt)]
         if 0 in token_counts:
-            logger.warn('Failed to get token count for prompts')
+            logger.warning('Failed to get token count for prompts')
             return None
 
         if sum(token_counts) > self.token_limit:
             logger.error(f'Token limit exceeded: limit {self.token_limit}, used {sum(token_counts)}')
             return None
 
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt}
+        ]
+
+    def prepare_request(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        prompt_tokens: Optional[int] = None
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """Cached response for a prompt, or the chat completion parameters to request it.
+
+        Returns `(cached, None)` on a cache hit, `(None, params)` when the
+        request should be sent, and `(None, None)` if it cannot be sent.
+        """
+        if cache_key and self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info('Using cached OpenAI response')
+                return cached, None
+
+        messages = self._prepare_messages(user_prompt, system_prompt or SYSTEM_PROMPT, prompt_tokens)
+        if messages is None:
+            return None, None
+        return None, {'model': self.model, 'messages': messages}
+
+    def finish_request(self, response: dict, cache_key: Optional[str] = None) -> Optional[str]:
+        """Content of a chat completion response; records its token usage and caches it"""
         try:
-            params = {
-                'model': self.model,
-                'messages': [
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_prompt}
-                ]
-            }
-            response = openai.ChatCompletion.create(**params)
-            return response.choices[0].message['content']
+            content = response['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError) as err:
+            logger.error(f'Unexpected OpenAI response: {err}')
+            return None
+
+        usage = response.get('usage') or {}
+        record_tokens(self.model, prompt=usage.get('prompt_tokens', 0), completion=usage.get('completion_tokens', 0))
+        if cache_key and self.cache and content:
+            self.cache.set(cache_key, content)
+        return content
+
+    def _call_openai(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        prompt_tokens: Optional[int] = None
+    ) -> Optional[str]:
+        cached, params = self.prepare_request(user_prompt, system_prompt, cache_key, prompt_tokens)
+        if params is None:
+            return cached
+
+        try:
+            with span('llm'):
+                response = SCHEDULER.call(
+                    'chat',
+                    lambda: openai.ChatCompletion.create(**params),
+                    tokens=estimate_tokens(params),
+                    usage=lambda response: (response.get('usage') or {}).get('total_tokens')
+                )
+        except Exception as err:
+            logger.error(f'Error calling OpenAI: {err}')
+            return None
+
+        return self.finish_request(response, cache_key)
+
+    def _stream_openai(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        prompt_tokens: Optional[int] = None
+    ) -> Stream:
+        """Same as `_call_openai` but yields the completion as tokens arrive.
+
+        Returns the full completion once the stream ends, or None if the
+        request failed or produced no content.
+        """
+        cached, params = self.prepare_request(user_prompt, system_prompt, cache_key, prompt_tokens)
+        if params is None:
+            if cached is not None:
+                yield cached
+            return cached
+
+        parts = []
+        try:
+            params['stream'] = True
+            # includes the time the caller spends consuming the stream
+            with span('llm_stream'), closing(SCHEDULER.stream(
+                'chat',
+                lambda: openai.ChatCompletion.create(**params),
+                tokens=estimate_tokens(params)
+            )) as stream:
+                for chunk in stream:
+                    token = chunk.choices[0].delta.get('content')
+                    if token:
+                        parts.append(token)
+                        yield token
         except Exception as err:
             logger.error(f'Error calling OpenAI: {err}')
             return None
 
+        completion = ''.join(parts)
+        # streamed responses carry no usage block, so count the tokens ourselves
+        record_tokens(
+            self.model,
+            prompt=(prompt_tokens or self.num_tokens(user_prompt)) + self.num_tokens(system_prompt or SYSTEM_PROMPT),
+            completion=self.num_tokens(completion)
+        )
+
+        if not completion:
+            return None
+        if cache_key and self.cache:
+            self.cache.set(cache_key, completion)
+        return completion
+
+    def run_steps(self, steps: Steps) -> Optional[str]:
+        """Run a request plan from `prompt_steps()` or `map_reduce_steps()`.
+
+        Each batch of requests the plan yields is sent concurrently, on up to
+        `map_workers` threads, and the results are sent back into the plan.
+        `AsyncTRS` drives the same plans from asyncio.
+        """
+        done, requests = advance(steps)
+        while not done:
+            if len(requests) == 1:
+                results = [self._call_openai(**requests[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=self.map_workers) as pool:
+                    futures = [submit(pool, self._call_openai, **request) for request in requests]
+                    results = [future.result() for future in futures]
+            done, requests = advance(steps, results)
+        return requests
+
+    def _document_request(self, template: str, doc: Document) -> Optional[dict]:
+        """Request running `template` over the whole document, or None if it is over the token limit"""
+        prompt_tokens = self.num_tokens(template) + self.doc_tokens(doc)
+        if prompt_tokens + self.completion_tokens > self.token_limit:
+            return None
+        return {
+            'user_prompt': template.format(document=doc.text),
+            'cache_key': ResponseCache.make_key(self.model, template, doc.text),
+            'prompt_tokens': prompt_tokens
+        }
+
+    def prompt_steps(self, prompt_name: str, doc: Document) -> Steps:
+        """Plan the requests for running a prompt over a document.
+
+        A generator that yields lists of `_call_openai()` keyword arguments
+        that may be sent concurrently, receives their results, and returns
+        the final result. Documents over the token limit are map-reduced.
+        """
+        template = self.read_prompt(prompt_name)
+        if not template:
+            return None
+
+        request = self._document_request(template, doc)
+        if request:
+            [result] = yield [request]
+            return result
+        return (yield from self._map_reduce_document(template, doc))
+
     def _generic_prompt(self, prompt_name: str, doc: Document) -> Optional[str]:
-        template = self._read_prompt(prompt_name)
-        if template:
-            return self._call_openai(user_prompt=template.format(document=doc.text))
-        return None
+        return self.run_steps(self.prompt_steps(prompt_name, doc))
+
+    def _stream_generic_prompt(self, prompt_name: str, doc: Document) -> Iterator[str]:
+        template = self.read_prompt(prompt_name)
+        if not template:
+            return
+
+        request = self._document_request(template, doc)
+        if request:
+            yield from self._stream_openai(**request)
+            return
+
+        # map-reduce results are only available once every section is combined
+        result = self.run_steps(self._map_reduce_document(template, doc))
+        if result:
+            yield result
+
+    def _map_reduce_document(self, template: str, doc: Document) -> Steps:
+        cache_key = ResponseCache.make_key(self.model, template, doc.text)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info('Using cached OpenAI response')
+                return cached
+
+        logger.info(f'Document exceeds token limit ({self.doc_tokens(doc)}); using map-reduce: {doc.source}')
+        result = yield from self.map_reduce_steps(template, self._doc_sections(doc))
+        if result and self.cache:
+            self.cache.set(cache_key, result)
+        return result
+
+    def doc_chunks(self, doc: Document) -> List[str]:
+        if doc.chunks is None:
+            if self.splitter is None:
+                raise ValueError('TextSplitter required to process documents over the token limit')
+            doc.chunks, doc.chunk_metadatas = [], []
+            for chunk in self.splitter.iter_chunks(doc.text):
+                doc.chunks.append(chunk.text)
+                doc.chunk_metadatas.append({'start': chunk.start, 'end': chunk.end, 'tokens': chunk.num_tokens})
+        return doc.chunks
+
+    def _doc_sections(self, doc: Document) -> List[str]:
+        """Sections of at most about `map_tokens` tokens covering a document"""
+        chunks = self.doc_chunks(doc)
+        metadatas = doc.chunk_metadatas or []
+        if doc.text and len(metadatas) == len(chunks) and \
+                all({'start', 'end', 'tokens'} <= set(metadata) for metadata in metadatas):
+            return self._cut_sections(doc.text, metadatas)
+        return self._group_chunks(chunks)
+
+    def _cut_sections(self, text: str, metadatas: List[dict]) -> List[str]:
+        """Cut `text` at chunk ends into consecutive sections of at most about `map_tokens` tokens.
+
+        Uses the offsets and token counts recorded when the document was
+        split, so nothing is re-tokenized. Each section starts where the
+        previous one ended, so the overlap between chunks is sent once; the
+        tokens a chunk adds past the previous chunk are estimated from its
+        share of new characters.
+        """
+        sections, start, end, tokens = [], 0, 0, 0
+        for metadata in metadatas:
+            if metadata['end'] <= end:
+                continue
+            new_chars = metadata['end'] - max(metadata['start'], end)
+            added = math.ceil(metadata['tokens'] * new_chars / max(1, metadata['end'] - metadata['start']))
+            if tokens and tokens + added > self.map_tokens:
+                sections.append(text[start:end].strip())
+                start, tokens = end, 0
+            tokens += added
+            end = metadata['end']
+        if tokens:
+            sections.append(text[start:end].strip())
+        return sections
+
+    def _group_chunks(self, chunks: List[str]) -> List[str]:
+        """Pack consecutive chunks into sections of at most `map_tokens` tokens"""
+        sections, current, current_tokens = [], [], 0
+        for chunk in chunks:
+            chunk_tokens = self.num_tokens(chunk)
+            if current and current_tokens + chunk_tokens > self.map_tokens:
+                sections.append('\n'.join(current))
+                current, current_tokens = [], 0
+            current.append(chunk)
+            current_tokens += chunk_tokens
+        if current:
+            sections.append('\n'.join(current))
+        return sections
+
+    def map_reduce_steps(self, template: str, sections: List[str]) -> Steps:
+        """Plan a map-reduce over sections; see `prompt_steps()` for the protocol"""
+        logger.info(f'Processing {len(sections)} sections')
+        partials = yield [
+            {
+                'user_prompt': template.format(document=section),
+                'cache_key': ResponseCache.make_key(self.model, template, section)
+            }
+            for section in sections
+        ]
+
+        failed = [str(i + 1) for i, partial in enumerate(partials) if not partial]
+        if failed:
+            # a result missing sections must not be combined (or cached) as if it were complete
+            logger.error(f'Map-reduce failed for section(s) {", ".join(failed)} of {len(sections)}')
+            return None
+        if len(partials) == 1:
+            return partials[0]
+
+        combine = self.read_prompt('combine')
+        if not combine:
+            return None
+
+        instructions = template.replace('{document}', '').strip()
+        combine_template = combine.replace('{instructions}', instructions)
+        results = '\n\n***\n\n'.join(partials)
+        if self.num_tokens(combine_template) + self.num_tokens(results) + self.completion_tokens <= self.token_limit:
+            [result] = yield [{
+                'user_prompt': combine_template.format(document=results),
+                'cache_key': ResponseCache.make_key(self.model, combine_template, results)
+            }]
+            return result
+
+        # the partial results are still too long; combine them hierarchically
+        return (yield from self.map_reduce_steps(combine_template, self._group_chunks(partials)))
 
     def mindmap(self, doc: Document) -> Optional[str]:
         return self._generic_prompt('mindmap', doc)
 
+    def stream_mindmap(self, doc: Document) -> Iterator[str]:
+        return self._stream_generic_prompt('mindmap', doc)
+
     def summarize(self, doc: Document) -> Optional[Summary]:
         summary = self._generic_prompt('summary', doc)
         if summary:
             return Summary(source=doc.source, summary=summary)
         return None
 
+    def stream_summarize(self, doc: Document) -> Iterator[str]:
+        return self._stream_generic_prompt('summary', doc)
+
     def detect(self, doc: Document) -> Optional[str]:
         return self._generic_prompt('detect', doc)
-    
-    def qna(self, question: str, docs: str) -> Optional[str]:
-        template = self._read_prompt('qna')
+
+    def stream_detect(self, doc: Document) -> Iterator[str]:
+        return self._stream_generic_prompt('detect', doc)
+
+    def qna_request(self, question: str, docs: str) -> Optional[dict]:
+        """`_call_openai()` keyword arguments for answering a question from retrieved documents"""
+        template = self.read_prompt('qna')
         if template:
-            return self._call_openai(user_prompt=template.format(question=question, documents=docs))
+            return {
+                'user_prompt': template.format(question=question, documents=docs),
+                'cache_key': ResponseCache.make_key(self.model, template, f'{question}\0{docs}')
+            }
+        return None
+
+    def qna(self, question: str, docs: str) -> Optional[str]:
+        request = self.qna_request(question, docs)
+        if request:
+            return self._call_openai(**request)
+        return None
+
+    def stream_qna(self, question: str, docs: str) -> Stream:
+        request = self.qna_request(question, docs)
+        if request:
+            return (yield from self._stream_openai(**request))
         return None
 
     def custom(self, prompt_name: str, doc: Document) -> Optional[str]:
         return self._generic_prompt(prompt_name, doc)
+
+    def stream_custom(self, prompt_name: str, doc: Document) -> Iterator[str]:
+        return self._stream_generic_prompt(prompt_name, doc)
@@ -1,56 +1,238 @@
 import os
+import time
+import threading
+import multiprocessing
 
-from typing import List
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 
 from loguru import logger
 
-from unstructured.partition.html import partition_html
-
+from .cache import FetchCache
+from .metrics import span
+from .utils import sha256
 from .schema import Document
 
+if TYPE_CHECKING:
+    import PyPDF2
+
 
 class Loader:
+    def __init__(
+        self,
+        cache: Optional[FetchCache] = None,
+        max_age: float = 24 * 60 * 60,
+        timeout: float = 30,
+        pdf_workers: int = os.cpu_count() or 1,
+        pdf_parallel_pages: int = 50,
+        pdf_pages_per_task: int = 25
+    ) -> None:
+        self.cache = cache
+        self.max_age = max_age
+        self.timeout = timeout
+        self.pdf_workers = pdf_workers
+        self.pdf_parallel_pages = pdf_parallel_pages
+        self.pdf_pages_per_task = pdf_pages_per_task
+        self._pdf_pool = None
+        self._pdf_pool_lock = threading.Lock()
+
+    @property
+    def pdf_pool(self) -> ProcessPoolExecutor:
+        """Process pool shared by every large PDF, started on first use"""
+        if self._pdf_pool is None:
+            with self._pdf_pool_lock:
+                if self._pdf_pool is None:
+                    # PDFs are loaded from worker threads, where forking is unsafe
+                    self._pdf_pool = ProcessPoolExecutor(
+                        max_workers=self.pdf_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._pdf_pool
+
+    def close(self) -> None:
+        with self._pdf_pool_lock:
+            if self._pdf_pool is not None:
+                self._pdf_pool.shutdown(cancel_futures=True)
+                self._pdf_pool = None
+
+    def prepare_fetch(self, source: str) -> Tuple[Optional[Document], dict, Optional[dict]]:
+        """Check the fetch cache for a URL.
+
+        Returns `(doc, headers, cached)`: `doc` is set if the cached copy is
+        fresh enough to use without a request, otherwise `headers` holds the
+        conditional GET headers for revalidating `cached` (if any).
+        """
+        cached = self.cache.get(source) if self.cache else None
+        if cached and time.time() - cached['fetched_at'] < self.max_age:
+            logger.info(f'using cached url: {source}')
+            return self._to_doc(source, cached['text']), {}, cached
+
+        headers = {}
+        if cached:
+            # revalidate the stale copy instead of downloading it again
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        return None, headers, cached
+
+    def finish_fetch(
+        self,
+        source: str,
+        status: int,
+        html: str,
+        response_headers: dict,
+        cached: Optional[dict]
+    ) -> Document:
+        """Turn an HTTP response into a Document, parsing and caching the HTML as needed"""
+        if status == 304 and cached:
+            logger.info(f'url not modified: {source}')
+            self.cache.touch(source)
+            return self._to_doc(source, cached['text'])
+
+        if status >= 400:
+            raise ValueError(f'HTTP {status}')
+
+        if cached and cached['html_hash'] == sha256(html):
+            content = cached['text']
+        else:
+            # imported here to keep `import trs` fast; unstructured is especially slow
+            from unstructured.partition.html import partition_html
+            with span('parse'):
+                elements = partition_html(text=html)
+            content = '\n'.join([elem.text for elem in elements])
+
+        if self.cache:
+            self.cache.set(
+                source,
+                html=html,
+                text=content,
+                etag=response_headers.get('ETag'),
+                last_modified=response_headers.get('Last-Modified')
+            )
+
+        return self._to_doc(source, content)
+
     def url(self, source: str) -> Document:
         """Retrieve a URL and return a Document containing the text"""
         logger.info(f'loading url: {source}')
 
+        doc, headers, cached = self.prepare_fetch(source)
+        if doc is not None:
+            return doc
+
+        import requests
+
         try:
-            elements = partition_html(url=source)
+            with span('fetch'):
+                response = requests.get(source, headers=headers, timeout=self.timeout)
+            return self.finish_fetch(source, response.status_code, response.text, response.headers, cached)
         except Exception as err:
             logger.error(f'error retrieving html: {source} - {err}')
             return None
 
-        content = '\n'.join([elem.text for elem in elements])
-        doc = Document(
+    @staticmethod
+    def _to_doc(source: str, content: str) -> Document:
+        return Document(
             source=source,
             text=content,
             metadata={'type': 'url'}
         )
-        return doc   
 
-    def pdf(self, source: str) -> Document:
-        """Parse a PDF file to text and return a documents"""
+    def iter_pdf_pages(self, source: str) -> Iterator[Tuple[int, str]]:
+        """Yield `(page_number, text)` for each page of a PDF, starting at 1.
 
-        if not os.path.exists(source):
-            logger.error(f'file {source} does not exist')
-            return None
+        PDFs with more than `pdf_parallel_pages` pages are extracted in page
+        ranges across the shared process pool; pages are still yielded in
+        order, with at most `pdf_workers` ranges of a PDF in flight.
+        """
+        import PyPDF2
 
-        texts = []
         with open(source, 'rb') as fp:
-            logger.info(f'loading pdf: {source}')
-
             pdf_reader = PyPDF2.PdfReader(fp)
             num_pages = len(pdf_reader.pages)
 
-            for page_num in range(num_pages):
-                # this could be done better by retaining the page number
-                # from the pdf so it could be used for citations
-                page = pdf_reader.pages[page_num]
-                texts.append(page.extract_text())
+            if self.pdf_workers <= 1 or num_pages <= self.pdf_parallel_pages:
+                for page_num, page in enumerate(pdf_reader.pages, start=1):
+                    yield page_num, page.extract_text() or ''
+                return
+
+        ranges = (
+            (start, min(start + self.pdf_pages_per_task, num_pages))
+            for start in range(0, num_pages, self.pdf_pages_per_task)
+        )
+        logger.info(f'extracting {num_pages} pages across {self.pdf_workers} processes')
+        pool, pending = self.pdf_pool, deque()
+
+        def submit_next() -> None:
+            page_range = next(ranges, None)
+            if page_range is not None:
+                pending.append(pool.submit(_extract_page_range, source, page_range))
+
+        try:
+            for _ in range(self.pdf_workers):
+                submit_next()
+            while pending:
+                start, texts = pending.popleft().result()
+                # keep the workers busy while the caller consumes this range
+                submit_next()
+                for offset, text in enumerate(texts):
+                    yield start + offset + 1, text
+        finally:
+            # e.g. the caller stopped early or a range failed
+            for future in pending:
+                future.cancel()
+
+    def pdf(self, source: str) -> Document:
+        """Parse a PDF file to text and return a Document with page offsets"""
+
+        if not os.path.exists(source):
+            logger.error(f'file {source} does not exist')
+            return None
+
+        logger.info(f'loading pdf: {source}')
+        texts, page_offsets, length = [], [], 0
+        try:
+            with span('pdf'):
+                for _, text in self.iter_pdf_pages(source):
+                    page_offsets.append(length)
+                    texts.append(text)
+                    length += len(text) + 1
+        except Exception as err:
+            logger.error(f'error parsing pdf: {source} - {err}')
+            return None
 
         doc = Document(
             source=source,
             text='\n'.join(texts),
-            metadata={'type': 'pdf'}
+            metadata={'type': 'pdf', 'pages': str(len(texts))},
+            page_offsets=page_offsets
         )
-        return docs
\ No newline at end of file
+        return doc
+
+
+# parsed PDFs kept by each worker process, so a PDF is parsed once per worker, not once per page range
+_READERS: OrderedDict = OrderedDict()
+_MAX_READERS = 2
+
+
+def _pdf_reader(source: str) -> 'PyPDF2.PdfReader':
+    import PyPDF2
+
+    key = (source, os.path.getmtime(source))
+    reader = _READERS.get(key)
+    if reader is None:
+        # reads the whole file into memory, so no file handle is kept open
+        reader = _READERS[key] = PyPDF2.PdfReader(source)
+        while len(_READERS) > _MAX_READERS:
+            _READERS.popitem(last=False)
+    _READERS.move_to_end(key)
+    return reader
+
+
+def _extract_page_range(source: str, page_range: Tuple[int, int]) -> Tuple[int, List[str]]:
+    """Extract the text of pages [start, end) of a PDF (runs in worker processes)"""
+    start, end = page_range
+    pdf_reader = _pdf_reader(source)
+    return start, [pdf_reader.pages[page_num].extract_text() or '' for page_num in range(start, end)]
\ No newline at end of file
@@ -1,18 +1,49 @@
 import os
 import json
-from typing import Tuple
+import hashlib
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 from loguru import logger
 
-from .llm import LLM
-from .loader import Loader
-from .schema import Document, Indicators
+from .cache import FetchCache, QnACache, ResponseCache
+from .context import format_context, format_sources, pack_context
+from .registry import SourceRegistry, INDEXED, FAILED
+from .iocindex import IOCIndex
+from .lexical import LexicalIndex, is_exact_query, reciprocal_rank_fusion
+from .metrics import span, submit
+from .scheduler import BACKGROUND, priority
+from .snapshot import IOCS, LEXICAL, export_snapshot, iter_records, iter_rows, read_manifest, read_sources
+from .schema import Citation, Document, Indicators, IngestResult, IOCHit, SourceRecord, Summary
 from .iocs import extract_iocs
-from .chunker import TextSplitter
-from .vectordb import VectorDB
+from .utils import is_url, sha256
+
+if TYPE_CHECKING:
+    from .embeddings import EmbeddingBackend
+    from .llm import LLM
+    from .loader import Loader
+    from .chunker import TextSplitter
+    from .vectordb import VectorDB
 
 
 class TRS:
-    def __init__(self, openai_key: str):
+    def __init__(
+        self,
+        openai_key: str,
+        use_cache: bool = True,
+        fetch_max_age: float = 24 * 60 * 60,
+        embeddings: Optional['EmbeddingBackend'] = None,
+        qna_cache_threshold: float = 0.95,
+        qna_cache_size: int = 256,
+        qna_context_tokens: int = 6000,
+        qna_candidates: int = 20
+    ):
+        self.openai_key = openai_key
+        self.fetch_max_age = fetch_max_age
+        # embedding backend for the vector database; defaults to OpenAI text-embedding-ada-002
+        self.embeddings = embeddings
         self.vdb_dir = os.path.abspath(
             os.path.join(os.path.abspath('.'), 'data')
         )
@@ -20,33 +51,124 @@ class TRS:
             os.path.join(os.path.abspath('.'), 'data', 'urls.json')
         )
 
-        try:
-            with open(self.urls_path, 'r') as fp:
-                data = fp.read()
-                if data:
-                    self.previous_urls = set(json.loads(data))
-                else:
-                    self.previous_urls = set()
-        except FileNotFoundError:
-            self.previous_urls = set()
-
-        self.splitter = TextSplitter(chunk_size=1024, overlap=200)
-        self.loader = Loader()
-        self.llm = LLM(openai_api_key=openai_key)
-        self.vdb = VectorDB(
-            collection_name='trs',
-            db_dir=self.vdb_dir,
-            n_results=3,
-            openai_key=openai_key
+        self.registry = SourceRegistry(db_path=os.path.join(self.vdb_dir, 'sources.sqlite3'))
+        if len(self.registry) == 0:
+            # one-time migration from the legacy urls.json list
+            self.registry.import_json(self.urls_path)
+
+        self.ioc_index = IOCIndex(db_path=os.path.join(self.vdb_dir, 'iocs.sqlite3'))
+        self.lexical = LexicalIndex(db_path=os.path.join(self.vdb_dir, 'lexical.sqlite3'))
+
+        self.cache = ResponseCache(
+            db_path=os.path.join(self.vdb_dir, 'cache', 'llm.sqlite3'),
+            enabled=use_cache
         )
-    
-    def save_processed_urls(self) -> None:
-        logger.info('saving processed URLs')
-        try:
-            with open(self.urls_path, 'w') as fp:
-                json.dump(list(self.previous_urls), fp)
-        except Exception as err:
-            logger.error(f'Error saving processed URLs: {err}')
+        # answers to recent chat questions, reused for near-identical questions
+        self.qna_cache = QnACache(threshold=qna_cache_threshold, max_items=qna_cache_size, enabled=use_cache)
+        # chat context: up to qna_candidates retrieved chunks, packed into qna_context_tokens
+        self.qna_context_tokens = qna_context_tokens
+        self.qna_candidates = qna_candidates
+
+        # the heavy subsystems (openai, chromadb, unstructured, tiktoken)
+        # are imported and constructed on first use; see the properties below
+        self._lazy_lock = threading.RLock()
+        self._splitter = None
+        self._loader = None
+        self._llm = None
+        self._vdb = None
+
+    def _lazy(self, attr: str, factory):
+        if getattr(self, attr) is None:
+            with self._lazy_lock:
+                if getattr(self, attr) is None:
+                    setattr(self, attr, factory())
+        return getattr(self, attr)
+
+    @property
+    def splitter(self) -> 'TextSplitter':
+        def factory():
+            from .chunker import TextSplitter
+            return TextSplitter(chunk_size=1024, overlap=200)
+        return self._lazy('_splitter', factory)
+
+    @property
+    def loader(self) -> 'Loader':
+        def factory():
+            from .loader import Loader
+            return Loader(
+                cache=FetchCache(db_path=os.path.join(self.vdb_dir, 'cache', 'fetch.sqlite3')),
+                max_age=self.fetch_max_age
+            )
+        return self._lazy('_loader', factory)
+
+    @property
+    def llm(self) -> 'LLM':
+        def factory():
+            from .llm import LLM
+            return LLM(openai_api_key=self.openai_key, cache=self.cache, splitter=self.splitter)
+        return self._lazy('_llm', factory)
+
+    @property
+    def vdb(self) -> 'VectorDB':
+        def factory():
+            from .vectordb import VectorDB
+            return VectorDB(
+                collection_name='trs',
+                db_dir=self.vdb_dir,
+                n_results=3,
+                openai_key=self.openai_key,
+                embeddings=self.embeddings
+            )
+        return self._lazy('_vdb', factory)
+
+    def check_connection(self) -> bool:
+        """Verify OpenAI connectivity; call it explicitly (or from a background thread)"""
+        return self.llm.check_connection()
+
+    def _index_documents(self, batch: List[Tuple[Document, List[str]]]) -> bool:
+        """Embed and store the chunks of one or more documents in a single insert"""
+        texts, metadatas = [], []
+        for doc, doc_chunks in batch:
+            extra = doc.chunk_metadatas or [{} for _ in range(len(doc_chunks))]
+            texts.extend(doc_chunks)
+            metadatas.extend([{'source': doc.source, **chunk_meta} for chunk_meta in extra])
+
+        ids = []
+        if texts:
+            success, ids = self.vdb.add_texts(texts=texts, metadatas=metadatas)
+            if not success:
+                return False
+
+        records, offset = [], 0
+        for doc, doc_chunks in batch:
+            chunk_ids = ids[offset:offset + len(doc_chunks)]
+            with span('ioc_index'):
+                self.ioc_index.add_chunks(doc.source, doc_chunks, chunk_ids)
+            with span('lexical_index'):
+                self.lexical.add_chunks(doc.source, doc_chunks, chunk_ids)
+            records.append(SourceRecord(
+                source=doc.source,
+                content_hash=doc.content_hash or sha256(doc.text),
+                fetched_at=datetime.now(),
+                chunk_ids=chunk_ids,
+                status=INDEXED
+            ))
+            offset += len(doc_chunks)
+
+        logger.info(f'saving {len(records)} processed sources')
+        self.registry.add_many(records)
+        self._invalidate_answers([doc.source for doc, _ in batch], texts, ids)
+        return True
+
+    def _invalidate_answers(self, sources: List[str], texts: List[str], chunk_ids: List[str]) -> None:
+        """Drop cached chat answers that newly indexed chunks could change"""
+        if not len(self.qna_cache):
+            return
+        embeddings = None
+        if self.qna_cache.needs_embeddings():
+            found = self.vdb.get_embeddings(chunk_ids)
+            embeddings = [found[chunk_id] for chunk_id in chunk_ids if chunk_id in found]
+        self.qna_cache.invalidate(sources, texts, embeddings)
 
     def process_document(self, source: str, load_func) -> Document:
         logger.info(f'processing: {source}')
@@ -55,66 +177,491 @@ class TRS:
             logger.error(f'Error retrieving Document: {source}')
             return None
 
-        if source not in self.previous_urls:
-            doc_chunks = self.splitter.split(doc.text)
-            self.vdb.add_texts(
-                texts=doc_chunks,
-                metadatas=[{'source': source} for _ in range(len(doc_chunks))]
+        self.index_document(doc)
+        return doc
+
+    def index_document(self, doc: Document) -> None:
+        """Split and store a loaded document, unless its source is already in the registry"""
+        if doc.source in self.registry:
+            logger.info(f'Source already processed; skipping db insert: {doc.source}')
+            return
+        self._index_documents([(doc, self._split(doc))])
+
+    def _split(self, doc: Document) -> List[str]:
+        """Split a document into chunks, recording each chunk's offsets and token count.
+
+        PDFs are split per page so chunks also keep their page number.
+        """
+        pages = [(None, 0, len(doc.text))]
+        if doc.page_offsets:
+            bounds = doc.page_offsets + [len(doc.text) + 1]
+            pages = [(num, start, end - 1) for num, (start, end) in enumerate(zip(bounds, bounds[1:]), start=1)]
+
+        doc.chunks, doc.chunk_metadatas = [], []
+        with span('split'):
+            for page_num, page_start, page_end in pages:
+                self._split_page(doc, doc.text[page_start:page_end], page_start, page_num)
+
+        logger.info(f'Split {doc.source} into {len(doc.chunks)} chunks')
+        return doc.chunks
+
+    def _split_page(self, doc: Document, text: str, page_start: int, page_num: Optional[int]) -> None:
+        """Append the chunks of one page (or a whole non-PDF document) to `doc.chunks`"""
+        for chunk in self.splitter.iter_chunks(text):
+            metadata = {
+                'start': page_start + chunk.start,
+                'end': page_start + chunk.end,
+                'tokens': chunk.num_tokens
+            }
+            if page_num is not None:
+                metadata['page'] = page_num
+            doc.chunks.append(chunk.text)
+            doc.chunk_metadatas.append(metadata)
+
+    def _split_pdf(self, source: str) -> Tuple[Document, List[str]]:
+        """Split a PDF page by page as pages are extracted, without holding its full text.
+
+        The returned Document has chunks and a content hash but empty `text`;
+        use `Loader.pdf()` when the text itself is needed.
+        """
+        logger.info(f'loading pdf: {source}')
+        doc = Document(source=source, text='', chunks=[], chunk_metadatas=[])
+        # same digest as sha256() of the pages joined with newlines
+        digest, page_start, num_pages = hashlib.sha256(), 0, 0
+        with span('pdf'):
+            for page_num, text in self.loader.iter_pdf_pages(source):
+                if page_num > 1:
+                    digest.update(b'\n')
+                digest.update(text.encode('utf-8'))
+                self._split_page(doc, text, page_start, page_num)
+                page_start += len(text) + 1
+                num_pages = page_num
+
+        doc.content_hash = digest.hexdigest()
+        doc.metadata = {'type': 'pdf', 'pages': str(num_pages)}
+        logger.info(f'Split {source} into {len(doc.chunks)} chunks')
+        return doc, doc.chunks
+
+    @staticmethod
+    def _is_pdf(source: str) -> bool:
+        return not is_url(source) and os.path.isfile(source)
+
+    def _load_func(self, source: str):
+        return self.loader.pdf if self._is_pdf(source) else self.loader.url
+
+    def _load_and_split(self, source: str) -> Tuple[Document, List[str]]:
+        if self._is_pdf(source):
+            return self._split_pdf(source)
+
+        doc = self.loader.url(source=source)
+        if doc is None:
+            raise ValueError(f'Error retrieving Document: {source}')
+        return doc, self._split(doc)
+
+    @staticmethod
+    def _read_checkpoint(checkpoint_path: str) -> set:
+        done = set()
+        try:
+            with open(checkpoint_path, 'r') as fp:
+                for line in fp:
+                    if line.strip():
+                        record = json.loads(line)
+                        if record.get('success'):
+                            done.add(record['source'])
+        except FileNotFoundError:
+            pass
+        return done
+
+    def ingest_many(
+        self,
+        sources: Iterable[str],
+        max_workers: int = 8,
+        embed_workers: int = 2,
+        batch_size: int = 256,
+        checkpoint_path: Optional[str] = None
+    ) -> List[IngestResult]:
+        """Fetch, split and embed many URLs/PDF paths concurrently.
+
+        Sources are loaded and split on a pool of `max_workers` threads while
+        completed documents are grouped into inserts of roughly `batch_size`
+        chunks and embedded on a separate pool of `embed_workers` threads.
+        If `checkpoint_path` is set, one JSON line is appended per finished
+        source and sources already recorded as successful are skipped.
+        """
+        done = self._read_checkpoint(checkpoint_path) if checkpoint_path else set()
+        checkpoint_file = open(checkpoint_path, 'a') if checkpoint_path else nullcontext()
+        # bulk ingestion yields to interactive OpenAI requests
+        with priority(BACKGROUND), checkpoint_file as checkpoint:
+            return self._ingest_many(sources, max_workers, embed_workers, batch_size, done, checkpoint)
+
+    def _ingest_many(
+        self,
+        sources: Iterable[str],
+        max_workers: int,
+        embed_workers: int,
+        batch_size: int,
+        done: set,
+        checkpoint: Optional[TextIO]
+    ) -> List[IngestResult]:
+        results = []
+
+        def record(result: IngestResult) -> None:
+            results.append(result)
+            if not result.success:
+                self.registry.add(result.source, status=FAILED)
+            if checkpoint:
+                checkpoint.write(json.dumps(result.dict()) + '\n')
+                checkpoint.flush()
+
+        pending = []
+        for source in dict.fromkeys(s.strip() for s in sources):
+            if not source:
+                continue
+            if source in self.registry or source in done:
+                record(IngestResult(source=source, success=True, skipped=True))
+            else:
+                pending.append(source)
+
+        logger.info(f'ingesting {len(pending)} sources ({len(results)} already processed)')
+
+        def flush(batch: List[Tuple[Document, List[str]]]) -> List[IngestResult]:
+            try:
+                success = self._index_documents(batch)
+                error = None if success else 'Failed to add texts to collection'
+            except Exception as err:
+                success, error = False, str(err)
+            return [
+                IngestResult(source=doc.source, success=success, chunks=len(chunks), error=error)
+                for doc, chunks in batch
+            ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as load_pool, \
+                ThreadPoolExecutor(max_workers=embed_workers) as embed_pool:
+            queue = iter(pending)
+            loading, embedding = {}, set()
+            batch, batch_chunks = [], 0
+
+            def submit_loads() -> None:
+                # bound the number of loaded-but-not-embedded documents in memory,
+                # and stop loading while the embedding pool is backed up
+                while len(loading) < max_workers * 2 and len(embedding) < embed_workers * 2:
+                    source = next(queue, None)
+                    if source is None:
+                        return
+                    loading[submit(load_pool, self._load_and_split, source)] = source
+
+            def collect(futures) -> None:
+                for future in futures:
+                    embedding.discard(future)
+                    for result in future.result():
+                        record(result)
+
+            submit_loads()
+            while loading or embedding:
+                finished, _ = wait(list(loading) + list(embedding), return_when=FIRST_COMPLETED)
+                collect([f for f in finished if f in embedding])
+
+                for future in [f for f in finished if f in loading]:
+                    source = loading.pop(future)
+                    try:
+                        doc, doc_chunks = future.result()
+                    except Exception as err:
+                        logger.error(f'Failed to ingest {source}: {err}')
+                        record(IngestResult(source=source, success=False, error=str(err)))
+                        continue
+                    batch.append((doc, doc_chunks))
+                    batch_chunks += len(doc_chunks)
+
+                submit_loads()
+                if batch and (batch_chunks >= batch_size or not loading):
+                    embedding.add(submit(embed_pool, flush, batch))
+                    batch, batch_chunks = [], 0
+
+        failed = len([r for r in results if not r.success])
+        logger.info(f'ingest complete: {len(results) - failed} succeeded, {failed} failed')
+        return results
+
+    def export_snapshot(self, path: str, batch_size: int = 1000) -> dict:
+        """Write the vector database, its indexes and the source registry to a snapshot directory"""
+        # records stored before the indexes existed are indexed first
+        self._sync_lexical()
+        self._sync_iocs()
+        return export_snapshot(self.vdb, self.registry, self.ioc_index, self.lexical, path, batch_size=batch_size)
+
+    def import_snapshot(self, path: str, batch_size: int = 1000) -> int:
+        """Load a snapshot from `export_snapshot` without fetching or embedding anything.
+
+        Records are upserted in batches with their stored embeddings and the
+        IOC and lexical index rows are bulk inserted as exported. The snapshot
+        must use the same embedding backend and model as this instance.
+        """
+        manifest = read_manifest(path)
+        backend = self.vdb.embeddings.describe()
+        if (manifest['embedding_backend'], manifest['embedding_model']) != \
+                (backend['embedding_backend'], backend['embedding_model']) or \
+                (backend['embedding_dim'] and manifest['embedding_dim'] and backend['embedding_dim'] != manifest['embedding_dim']):
+            raise ValueError(
+                f'Snapshot holds {manifest["embedding_backend"]}/{manifest["embedding_model"]} embeddings '
+                f'but the {backend["embedding_backend"]}/{backend["embedding_model"]} backend is configured'
             )
-            self.previous_urls.add(source)
-            self.save_processed_urls()
-        else:
-            logger.info(f'Source already processed; skipping db insert: {source}')
 
-        return doc
+        logger.info(f'Importing {manifest["count"]} records from {path}')
+        # an empty store holds exactly the exported index rows afterwards, so no backfill is needed
+        empty = self.vdb.count() == 0
+        imported = 0
+        for ids, texts, metadatas, embeddings in iter_records(path, batch_size=batch_size):
+            success, _ = self.vdb.add_embeddings(texts, embeddings.tolist(), metadatas, ids=ids)
+            if not success:
+                raise RuntimeError(f'Failed to import records {imported}-{imported + len(ids)} from {path}')
+            imported += len(ids)
+            logger.info(f'Imported {imported}/{manifest["count"]} records')
+
+        for rows in iter_rows(path, IOCS):
+            if not self.ioc_index.add_rows(rows):
+                raise RuntimeError(f'Failed to import IOC index from {path}')
+        for rows in iter_rows(path, LEXICAL):
+            self.lexical.add_rows(rows)
+        if empty:
+            self.ioc_index.mark_backfilled()
+            self.lexical.mark_backfilled()
+
+        self.registry.add_many(read_sources(path))
+        self.qna_cache.clear()
+        logger.success(f'Imported {imported} records and {manifest["sources"]} sources from {path}')
+        return imported
 
     def pdf_to_doc(self, file_path: str) -> Document:
         return self.process_document(file_path, self.loader.pdf)
 
     def url_to_doc(self, url: str) -> Document:
         return self.process_document(url, self.loader.url)
+
+    def source_to_doc(self, source: str) -> Document:
+        """Process a URL or a local PDF file path"""
+        return self.process_document(source, self._load_func(source))
     
+    def lookup_ioc(self, indicator: str) -> List[IOCHit]:
+        """Exact-match lookup of the sources and chunks mentioning an indicator"""
+        logger.info(f'looking up indicator: {indicator}')
+        self._sync_iocs()
+        return self.ioc_index.lookup(indicator)
+
+    def _backfill(self, index: Union[IOCIndex, LexicalIndex], skip_types: Tuple[str, ...] = ()) -> None:
+        """One-time indexing of the chunks stored before `index` existed.
+
+        Runs once per index; the index persists a marker when it is done.
+        Records whose metadata type is in `skip_types` are left out.
+        """
+        if index.backfilled:
+            return
+
+        with self._lazy_lock:
+            if index.backfilled:
+                return
+
+            offset, page_size = 0, 1000
+            while True:
+                records = self.vdb.list_records(limit=page_size, offset=offset)
+                by_source = {}
+                for record in records:
+                    metadata = record['metadata'] or {}
+                    if metadata.get('type') not in skip_types:
+                        by_source.setdefault(metadata.get('source', ''), []).append(record)
+                for source, source_records in by_source.items():
+                    index.add_chunks(
+                        source,
+                        [record['text'] for record in source_records],
+                        [record['id'] for record in source_records]
+                    )
+                if len(records) < page_size:
+                    break
+                offset += page_size
+            index.mark_backfilled()
+
+    def _sync_iocs(self) -> None:
+        # summaries are LLM output, not report text, and are never IOC indexed
+        self._backfill(self.ioc_index, skip_types=('summary',))
+
+    def _sync_lexical(self) -> None:
+        self._backfill(self.lexical)
+
+    def retrieve(self, prompt: str, n_results: Optional[int] = None, embedding: Optional[List[float]] = None) -> List[dict]:
+        """Hybrid retrieval: BM25 lexical matches fused with vector search results.
+
+        Queries made only of exact tokens (see `is_exact_query`) that match
+        the lexical index are answered without embedding the query. Pass a
+        precomputed query `embedding` to skip the embedding call otherwise.
+        """
+        self._sync_lexical()
+        n_results = n_results or self.vdb.n_results
+
+        if is_exact_query(prompt):
+            with span('lexical_query'):
+                hits = self.lexical.search(prompt, limit=n_results, require_all=True)
+            if hits:
+                logger.info(f'Found {len(hits)} exact matches; skipping vector search')
+                return self.vdb.get_many([hit.chunk_id for hit in hits])
+
+        candidates = max(n_results * 4, 10)
+        with span('lexical_query'):
+            hits = self.lexical.search(prompt, limit=candidates)
+        vector_results = self.vdb.query_many(
+            [prompt],
+            n_results=candidates,
+            embeddings=[embedding] if embedding is not None else None
+        )[0]
+
+        fused = reciprocal_rank_fusion([
+            [item['id'] for item in vector_results],
+            [hit.chunk_id for hit in hits]
+        ])[:n_results]
+        by_id = {item['id']: item for item in vector_results}
+        by_id.update({
+            item['id']: item
+            for item in self.vdb.get_many([node_id for node_id, _ in fused if node_id not in by_id])
+        })
+        return [{**by_id[node_id], 'score': score} for node_id, score in fused if node_id in by_id]
+
+    def build_context(
+        self,
+        prompt: str,
+        embedding: Optional[List[float]] = None
+    ) -> Tuple[str, List[Citation], List[dict]]:
+        """Retrieve candidate chunks and pack them into a numbered, token-budgeted context.
+
+        Returns the context text, a citation per numbered passage, and the
+        retrieved chunks.
+        """
+        results = self.retrieve(prompt, n_results=self.qna_candidates, embedding=embedding)
+        with span('context'):
+            passages = pack_context(results, self.qna_context_tokens, self.llm.num_tokens)
+            context, citations = format_context(passages)
+        logger.info(f'Packed {len(results)} chunks into {len(passages)} passages')
+        return context, citations, results
+
+    def cached_answer(self, prompt: str, embedding: Optional[List[float]] = None) -> Optional[str]:
+        with span('qna_cache'):
+            answer = self.qna_cache.get(prompt, embedding=embedding)
+        if answer is not None:
+            logger.info('Using cached answer')
+        return answer
+
+    def _lookup_answer(self, prompt: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Cached answer for a question, plus the question embedding to reuse on a miss"""
+        answer = self.cached_answer(prompt)
+        if answer is not None or not self.qna_cache.enabled or is_exact_query(prompt):
+            return answer, None
+
+        embedding = self.vdb.embeddings.embed([prompt])[0]
+        return self.cached_answer(prompt, embedding=embedding), embedding
+
     def qna(self, prompt: str) -> str:
         logger.info(f'processing: {prompt}')
-        response = self.vdb.query(prompt)
-        texts = '\n'.join([item['text'] for item in response])
-        qna_answer = self.llm.qna(question=prompt, docs=texts)
+        answer, embedding = self._lookup_answer(prompt)
+        if answer is not None:
+            return answer
+
+        context, citations, response = self.build_context(prompt, embedding=embedding)
+        qna_answer = self.llm.qna(question=prompt, docs=context)
+        if qna_answer:
+            qna_answer += format_sources(qna_answer, citations)
+            self.qna_cache.set(prompt, qna_answer, results=response, embedding=embedding)
         return qna_answer
 
+    def stream_qna(self, prompt: str) -> Iterator[str]:
+        logger.info(f'processing: {prompt}')
+        answer, embedding = self._lookup_answer(prompt)
+        if answer is not None:
+            return iter([answer])
+
+        context, citations, response = self.build_context(prompt, embedding=embedding)
+
+        def stream() -> Iterator[str]:
+            answer = yield from self.llm.stream_qna(question=prompt, docs=context)
+            # a failed or empty stream returns None; there is nothing to cite or keep
+            if not answer:
+                return
+            sources = format_sources(answer, citations)
+            if sources:
+                yield sources
+            self.qna_cache.set(prompt, answer + sources, results=response, embedding=embedding)
+
+        return stream()
+
     def detections(self, url: str) -> str:
         logger.info(f'processing: {url}')
-        doc = self.url_to_doc(url=url)
+        doc = self.source_to_doc(url)
         detections = self.llm.detect(doc=doc)
         return detections
 
+    def stream_detections(self, url: str) -> Iterator[str]:
+        logger.info(f'processing: {url}')
+        doc = self.source_to_doc(url)
+        if doc is None:
+            return iter(())
+        return self.llm.stream_detect(doc=doc)
+
     def custom(self, url: str, prompt_name: str) -> str:
         logger.info(f'processing: {url}')
-        doc = self.url_to_doc(url=url)
+        doc = self.source_to_doc(url)
         custom = self.llm.custom(prompt_name=prompt_name, doc=doc)
         return custom
 
-    def summarize(self, url: str) -> Tuple[str, str, Indicators]:
+    def stream_custom(self, url: str, prompt_name: str) -> Iterator[str]:
         logger.info(f'processing: {url}')
-        doc = self.url_to_doc(url=url)
-
-        summ = self.llm.summarize(doc=doc)
-
-        if url not in self.previous_urls:
-            # dont need to add the url to the previous
-            # urls list because thats already done in the summarizer
-            self.vdb.add_texts(
-                texts=[summ.summary],
-                metadatas=[
-                    {
-                        'source': summ.source,
-                        'type': 'summary'
-                    }
-                ]
-            )
+        doc = self.source_to_doc(url)
+        if doc is None:
+            return iter(())
+        return self.llm.stream_custom(prompt_name=prompt_name, doc=doc)
+
+    def store_summary(self, result: Summary) -> None:
+        success, ids = self.vdb.add_texts(
+            texts=[result.summary],
+            metadatas=[
+                {
+                    'source': result.source,
+                    'type': 'summary'
+                }
+            ]
+        )
+        if success:
+            self.lexical.add_chunks(result.source, [result.summary], ids)
+            self._invalidate_answers([result.source], [result.summary], ids)
+
+    def iter_summarize(self, url: str) -> Iterator[Tuple[str, Any]]:
+        """Run the summary, mindmap and IOC stages concurrently.
 
-        mindmap = self.llm.mindmap(doc=doc)
+        Yields `(stage, result)` tuples as each stage finishes, where stage
+        is one of `summary`, `mindmap` or `iocs`.
+        """
+        logger.info(f'processing: {url}')
+        is_new = url not in self.registry
+        doc = self.source_to_doc(url)
+        if doc is None:
+            return
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            stages = {
+                submit(pool, self.llm.summarize, doc=doc): 'summary',
+                submit(pool, self.llm.mindmap, doc=doc): 'mindmap',
+                submit(pool, span('iocs')(extract_iocs), doc.text): 'iocs',
+            }
 
-        logger.info('extracting indicators')
-        iocs = extract_iocs(doc.text)
+            for future in as_completed(stages):
+                stage = stages[future]
+                try:
+                    result = future.result()
+                except Exception as err:
+                    logger.error(f'Error running {stage} stage: {err}')
+                    result = None
 
-        return summ.summary, mindmap, iocs
+                if stage == 'summary' and result is not None:
+                    if is_new:
+                        self.store_summary(result)
+                    result = result.summary
+
+                yield stage, result
+
+    def summarize(self, url: str) -> Tuple[str, str, Indicators]:
+        results = dict(self.iter_summarize(url=url))
+        return results.get('summary'), results.get('mindmap'), results.get('iocs')
@@ -0,0 +1,237 @@
+import os
+import time
+import threading
+import contextvars
+
+from bisect import bisect_left
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# USD per 1K tokens as (prompt, completion); embeddings only have a prompt price
+PRICES: Dict[str, Tuple[float, float]] = {
+    'gpt-4-1106-preview': (0.01, 0.03),
+    'gpt-4': (0.03, 0.06),
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'text-embedding-ada-002': (0.0001, 0.0),
+}
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def estimate_cost(model: str, prompt: int = 0, completion: int = 0) -> float:
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt * prompt_price + completion * completion_price) / 1000
+
+
+class Trace:
+    """Spans and token usage recorded while a `trace()` context is active.
+
+    The same Trace is shared by worker threads started with `submit()` or
+    `asyncio.to_thread`, so one trace covers a whole request.
+    """
+
+    def __init__(self) -> None:
+        self.spans: List[Tuple[str, float]] = []
+        self.tokens: Dict[str, Dict[str, int]] = {}
+        self.cost = 0.0
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.spans.append((stage, seconds))
+
+    def add_tokens(self, model: str, kind: str, count: int, cost: float) -> None:
+        with self._lock:
+            by_kind = self.tokens.setdefault(model, {})
+            by_kind[kind] = by_kind.get(kind, 0) + count
+            self.cost += cost
+
+    def stages(self) -> Dict[str, dict]:
+        """Total seconds and call count per stage"""
+        stages = {}
+        with self._lock:
+            for stage, seconds in self.spans:
+                entry = stages.setdefault(stage, {'seconds': 0.0, 'count': 0})
+                entry['seconds'] += seconds
+                entry['count'] += 1
+        return stages
+
+    def summary(self) -> dict:
+        return {
+            'stages': self.stages(),
+            'tokens': {model: dict(kinds) for model, kinds in self.tokens.items()},
+            'cost_usd': round(self.cost, 6)
+        }
+
+    def format(self) -> str:
+        stages = ', '.join(f'{stage} {entry["seconds"]:.2f}s' for stage, entry in self.stages().items())
+        tokens = sum(count for kinds in self.tokens.values() for count in kinds.values())
+        return f'{stages or "no stages"} | {tokens} tokens | ${self.cost:.4f}'
+
+
+_current: 'contextvars.ContextVar[Optional[Trace]]' = contextvars.ContextVar('trs_trace', default=None)
+
+
+class Metrics:
+    """Process-wide aggregates of stage timings, token counts and cost"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List[float]] = {}
+        self._stage_sums: Dict[str, float] = {}
+        self._stage_counts: Dict[str, int] = {}
+        self._stage_errors: Dict[str, int] = {}
+        self._tokens: Dict[Tuple[str, str], int] = {}
+        self._cost: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            buckets = self._stages.setdefault(stage, [0] * len(BUCKETS))
+            idx = bisect_left(BUCKETS, seconds)
+            if idx < len(BUCKETS):
+                buckets[idx] += 1
+            self._stage_sums[stage] = self._stage_sums.get(stage, 0.0) + seconds
+            self._stage_counts[stage] = self._stage_counts.get(stage, 0) + 1
+            if error:
+                self._stage_errors[stage] = self._stage_errors.get(stage, 0) + 1
+
+        trace = _current.get()
+        if trace is not None:
+            trace.add_span(stage, seconds)
+
+    def record_tokens(self, model: str, prompt: int = 0, completion: int = 0, embedding: int = 0) -> None:
+        counts = {'prompt': prompt, 'completion': completion, 'embedding': embedding}
+        costs = {
+            'prompt': estimate_cost(model, prompt=prompt),
+            'completion': estimate_cost(model, completion=completion),
+            'embedding': estimate_cost(model, prompt=embedding),
+        }
+        trace = _current.get()
+        with self._lock:
+            for kind, count in counts.items():
+                if not count:
+                    continue
+                self._tokens[(model, kind)] = self._tokens.get((model, kind), 0) + count
+                self._cost[model] = self._cost.get(model, 0.0) + costs[kind]
+        if trace is not None:
+            for kind, count in counts.items():
+                if count:
+                    trace.add_tokens(model, kind, count, costs[kind])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'stages': {
+                    stage: {
+                        'seconds': self._stage_sums[stage],
+                        'count': self._stage_counts[stage],
+                        'errors': self._stage_errors.get(stage, 0)
+                    }
+                    for stage in self._stage_counts
+                },
+                'tokens': {f'{model}:{kind}': count for (model, kind), count in self._tokens.items()},
+                'cost_usd': dict(self._cost)
+            }
+
+    def prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = [
+            '# HELP trs_stage_seconds Time spent in each pipeline stage',
+            '# TYPE trs_stage_seconds histogram',
+        ]
+        with self._lock:
+            for stage in sorted(self._stages):
+                cumulative = 0
+                for le, count in zip(BUCKETS, self._stages[stage]):
+                    cumulative += count
+                    lines.append(f'trs_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'trs_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self._stage_counts[stage]}')
+                lines.append(f'trs_stage_seconds_sum{{stage="{stage}"}} {self._stage_sums[stage]:.6f}')
+                lines.append(f'trs_stage_seconds_count{{stage="{stage}"}} {self._stage_counts[stage]}')
+
+            lines += [
+                '# HELP trs_stage_errors_total Pipeline stages that raised an exception',
+                '# TYPE trs_stage_errors_total counter',
+            ]
+            lines += [f'trs_stage_errors_total{{stage="{stage}"}} {count}' for stage, count in sorted(self._stage_errors.items())]
+
+            lines += [
+                '# HELP trs_tokens_total Tokens sent to and received from OpenAI',
+                '# TYPE trs_tokens_total counter',
+            ]
+            lines += [
+                f'trs_tokens_total{{model="{model}",kind="{kind}"}} {count}'
+                for (model, kind), count in sorted(self._tokens.items())
+            ]
+
+            lines += [
+                '# HELP trs_cost_usd_total Estimated OpenAI cost in USD',
+                '# TYPE trs_cost_usd_total counter',
+            ]
+            lines += [f'trs_cost_usd_total{{model="{model}"}} {cost:.6f}' for model, cost in sorted(self._cost.items())]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Write the Prometheus text format to a file (e.g. for node_exporter's textfile collector)"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fp:
+            fp.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._stage_sums.clear()
+            self._stage_counts.clear()
+            self._stage_errors.clear()
+            self._tokens.clear()
+            self._cost.clear()
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a pipeline stage; recorded in `METRICS` and the active trace"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except GeneratorExit:
+        # a generator (e.g. a stream) closed early by its consumer ended normally
+        raise
+    except BaseException:
+        error = True
+        raise
+    finally:
+        METRICS.observe(stage, time.perf_counter() - start, error=error)
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Collect the spans and token usage of everything run inside the block"""
+    current = Trace()
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+def start_trace() -> Trace:
+    """Start a new trace in the current context, replacing any active one"""
+    current = Trace()
+    _current.set(current)
+    return current
+
+
+def record_tokens(model: str, prompt: int = 0, completion: int = 0, embedding: int = 0) -> None:
+    METRICS.record_tokens(model, prompt=prompt, completion=completion, embedding=embedding)
+
+
+def submit(pool: Executor, func: Callable, *args, **kwargs) -> Future:
+    """`pool.submit` that carries the active trace into the worker thread"""
+    return pool.submit(contextvars.copy_context().run, func, *args, **kwargs)
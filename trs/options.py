@@ -0,0 +1,108 @@
+import argparse
+
+from typing import Optional
+
+from .embeddings import BACKENDS, EmbeddingBackend, get_backend
+from .scheduler import SCHEDULER, Scheduler
+
+
+def add_backend_args(parser: argparse.ArgumentParser) -> None:
+    """Add the cache, chat context, embedding and OpenAI rate limit options shared by trs-cli and trs-server"""
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Bypass the LLM response and chat answer caches and revalidate cached pages'
+    )
+
+    parser.add_argument(
+        '--qna-cache-threshold',
+        type=float,
+        default=0.95,
+        help='Minimum cosine similarity for a chat question to reuse a cached answer'
+    )
+
+    parser.add_argument(
+        '--qna-cache-size',
+        type=int,
+        default=256,
+        help='Number of chat answers kept in the LRU answer cache'
+    )
+
+    parser.add_argument(
+        '--qna-context-tokens',
+        type=int,
+        default=6000,
+        help='Token budget for the retrieved context sent with each chat question'
+    )
+
+    parser.add_argument(
+        '--embeddings',
+        choices=BACKENDS,
+        default='openai',
+        help='Embedding backend: OpenAI API, local CPU model (offline after first download), or feature hashing'
+    )
+
+    parser.add_argument(
+        '--embed-batch-size',
+        type=int,
+        help='Texts per embedding request/batch (backend default if unset)'
+    )
+
+    parser.add_argument(
+        '--embed-workers',
+        type=int,
+        help='Embedding batches processed in parallel (backend default if unset)'
+    )
+
+    parser.add_argument(
+        '--chat-rpm',
+        type=int,
+        help='OpenAI chat requests per minute (default 500)'
+    )
+
+    parser.add_argument(
+        '--chat-tpm',
+        type=int,
+        help='OpenAI chat tokens per minute (default 300000)'
+    )
+
+    parser.add_argument(
+        '--embed-rpm',
+        type=int,
+        help='OpenAI embedding requests per minute (default 3000)'
+    )
+
+    parser.add_argument(
+        '--embed-tpm',
+        type=int,
+        help='OpenAI embedding tokens per minute (default 1000000)'
+    )
+
+
+def backend_from_args(args: argparse.Namespace, openai_key: Optional[str] = None) -> EmbeddingBackend:
+    """Embedding backend selected by the `add_backend_args()` options"""
+    kwargs = {
+        key: value
+        for key, value in [('batch_size', args.embed_batch_size), ('max_workers', args.embed_workers)]
+        if value is not None
+    }
+    return get_backend(args.embeddings, openai_key=openai_key, **kwargs)
+
+
+def configure_scheduler(args: argparse.Namespace, scheduler: Scheduler = SCHEDULER) -> None:
+    """Apply the OpenAI rate limit options; unset limits keep their defaults"""
+    scheduler.configure('chat', rpm=args.chat_rpm, tpm=args.chat_tpm)
+    scheduler.configure('embeddings', rpm=args.embed_rpm, tpm=args.embed_tpm)
+
+
+def trs_kwargs(args: argparse.Namespace, openai_key: str) -> dict:
+    """`TRS` (or `AsyncTRS`) keyword arguments for the `add_backend_args()` options"""
+    return {
+        'openai_key': openai_key,
+        'use_cache': not args.no_cache,
+        'fetch_max_age': 0 if args.no_cache else 24 * 60 * 60,
+        'qna_cache_threshold': args.qna_cache_threshold,
+        'qna_cache_size': args.qna_cache_size,
+        'qna_context_tokens': args.qna_context_tokens,
+        'embeddings': backend_from_args(args, openai_key=openai_key)
+    }
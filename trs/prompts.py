@@ -0,0 +1,34 @@
+import os
+
+from typing import List, Optional
+
+from loguru import logger
+
+
+PROMPT_DIR = os.path.abspath(os.path.join(os.path.abspath('.'), 'prompts'))
+
+# templates used internally that aren't filled from a single `{document}`
+INTERNAL_PROMPTS = {'qna', 'combine', 'mindmap'}
+
+
+def prompt_names() -> List[str]:
+    """Names of the prompt templates in PROMPT_DIR"""
+    try:
+        return sorted(name[:-len('.txt')] for name in os.listdir(PROMPT_DIR) if name.endswith('.txt'))
+    except FileNotFoundError:
+        return []
+
+
+def custom_prompt_names() -> List[str]:
+    """Names of the prompt templates that can be run against a single document"""
+    return [name for name in prompt_names() if name not in INTERNAL_PROMPTS]
+
+
+def read_prompt(prompt_name: str) -> Optional[str]:
+    """Read a prompt template by name; only names from `prompt_names()` are accepted"""
+    if prompt_name not in prompt_names():
+        logger.error(f'Prompt not found: {prompt_name}')
+        return None
+
+    with open(os.path.join(PROMPT_DIR, f'{prompt_name}.txt'), 'r') as f:
+        return f.read()
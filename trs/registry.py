@@ -0,0 +1,123 @@
+import os
+import json
+import sqlite3
+import threading
+
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from loguru import logger
+
+from .schema import SourceRecord
+
+
+INDEXED = 'indexed'
+FAILED = 'failed'
+
+
+class SourceRegistry:
+    """SQLite registry of processed sources (URLs and PDF paths)"""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # WAL + busy timeout lets several processes ingest into the same registry
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sources ('
+            'source TEXT PRIMARY KEY, content_hash TEXT, fetched_at TEXT NOT NULL, '
+            'chunk_ids TEXT NOT NULL, status TEXT NOT NULL)'
+        )
+        self._conn.commit()
+
+    def import_json(self, path: str) -> int:
+        """Import a legacy urls.json list of processed sources"""
+        try:
+            with open(path, 'r') as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            return 0
+
+        sources = json.loads(data) if data else []
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO sources (source, content_hash, fetched_at, chunk_ids, status) '
+                'VALUES (?, NULL, ?, ?, ?)',
+                [(source, now, '[]', INDEXED) for source in sources]
+            )
+            self._conn.commit()
+
+        logger.info(f'Imported {len(sources)} sources from {path}')
+        return len(sources)
+
+    def __contains__(self, source: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM sources WHERE source = ? AND status = ?', (source, INDEXED)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM sources').fetchone()[0]
+
+    def add(
+        self,
+        source: str,
+        content_hash: Optional[str] = None,
+        chunk_ids: Optional[List[str]] = None,
+        status: str = INDEXED
+    ) -> None:
+        self.add_many([SourceRecord(
+            source=source,
+            content_hash=content_hash,
+            fetched_at=datetime.now(),
+            chunk_ids=chunk_ids or [],
+            status=status
+        )])
+
+    def add_many(self, records: List[SourceRecord]) -> None:
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO sources (source, content_hash, fetched_at, chunk_ids, status) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [
+                        (r.source, r.content_hash, r.fetched_at.isoformat(), json.dumps(r.chunk_ids), r.status)
+                        for r in records
+                    ]
+                )
+                self._conn.commit()
+            except sqlite3.Error as err:
+                logger.error(f'Error saving processed sources: {err}')
+
+    @staticmethod
+    def _to_record(row: tuple) -> SourceRecord:
+        source, content_hash, fetched_at, chunk_ids, status = row
+        return SourceRecord(
+            source=source,
+            content_hash=content_hash,
+            fetched_at=datetime.fromisoformat(fetched_at),
+            chunk_ids=json.loads(chunk_ids),
+            status=status
+        )
+
+    def get(self, source: str) -> Optional[SourceRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT source, content_hash, fetched_at, chunk_ids, status FROM sources WHERE source = ?',
+                (source,)
+            ).fetchone()
+        return self._to_record(row) if row else None
+
+    def records(self) -> Iterator[SourceRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source, content_hash, fetched_at, chunk_ids, status FROM sources ORDER BY fetched_at'
+            ).fetchall()
+        for row in rows:
+            yield self._to_record(row)
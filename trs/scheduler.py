@@ -0,0 +1,339 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+import contextvars
+
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+from loguru import logger
+
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# per-minute budgets and in-flight limits; tune to the account's OpenAI rate limits
+DEFAULT_LIMITS = {
+    'chat': {'rpm': 500, 'tpm': 300000, 'max_concurrency': 16},
+    'embeddings': {'rpm': 3000, 'tpm': 1000000, 'max_concurrency': 8},
+}
+
+_priority: 'contextvars.ContextVar[int]' = contextvars.ContextVar('trs_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run OpenAI requests made inside the block (and in threads started with `metrics.submit`) at `level`"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RetryableError(Exception):
+    """A request failure worth retrying: rate limited, overloaded, or a transient network error"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, rate_limited: bool = False) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds to wait from `Retry-After` / `Retry-After-Ms` response headers"""
+    if not headers:
+        return None
+    headers = {key.lower(): value for key, value in headers.items()}
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000
+        if 'retry-after' in headers:
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Rough token count of a chat or embedding request (4 characters per token)"""
+    texts = [message.get('content') or '' for message in payload.get('messages', [])]
+    inputs = payload.get('input', [])
+    texts.extend([inputs] if isinstance(inputs, str) else inputs)
+    return sum(len(text) for text in texts) // 4
+
+
+def _error_code(err: Exception) -> Optional[str]:
+    """`code` from the error body of an OpenAI response; openai 0.28 leaves `err.code` unset for most errors"""
+    error = getattr(err, 'error', None)
+    if not isinstance(error, dict):
+        body = getattr(err, 'json_body', None)
+        error = body.get('error') if isinstance(body, dict) else None
+    code = error.get('code') if isinstance(error, dict) else None
+    return code or getattr(err, 'code', None)
+
+
+def _classify(err: Exception) -> Tuple[bool, Optional[float], bool]:
+    """(retryable, retry_after, rate_limited) for an exception raised by a request"""
+    if isinstance(err, RetryableError):
+        return True, err.retry_after, err.rate_limited
+    if isinstance(err, asyncio.TimeoutError):
+        return True, None, False
+
+    try:
+        import openai.error as openai_error
+    except ImportError:
+        return False, None, False
+
+    if isinstance(err, openai_error.RateLimitError):
+        # an exhausted quota is also a 429 but won't recover by waiting
+        if _error_code(err) == 'insufficient_quota':
+            return False, None, False
+        return True, parse_retry_after(getattr(err, 'headers', None)), True
+    if isinstance(err, (
+        openai_error.ServiceUnavailableError,
+        openai_error.APIConnectionError,
+        openai_error.Timeout,
+        openai_error.TryAgain
+    )):
+        return True, parse_retry_after(getattr(err, 'headers', None)), False
+    if isinstance(err, openai_error.APIError) and (getattr(err, 'http_status', None) or 0) >= 500:
+        return True, parse_retry_after(getattr(err, 'headers', None)), False
+    return False, None, False
+
+
+class Budget:
+    """Sliding one-minute request and token budget with an in-flight limit"""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, max_concurrency: Optional[int] = None) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        # [timestamp, tokens] per request started in the last minute
+        self.window: deque = deque()
+        self.waiting: list = []
+
+    def wait_time(self, tokens: int, now: float) -> Optional[float]:
+        """Seconds until a request of `tokens` fits, or None to wait for a release"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            return None
+
+        while self.window and self.window[0][0] <= now - 60:
+            self.window.popleft()
+        if self.rpm and len(self.window) >= self.rpm:
+            return self.window[0][0] + 60 - now
+
+        excess = sum(entry[1] for entry in self.window) + tokens - (self.tpm or 0)
+        if self.tpm and self.window and excess > 0:
+            # wait for enough of the oldest requests to leave the window
+            for started, used in self.window:
+                excess -= used
+                if excess <= 0:
+                    return started + 60 - now
+            # a request bigger than the whole budget runs once the window is empty
+            return self.window[-1][0] + 60 - now
+        return 0.0
+
+
+class Scheduler:
+    """Shared rate limiter and retry policy for OpenAI chat and embedding requests.
+
+    Each budget (`chat`, `embeddings`) tracks requests and tokens started in
+    the last minute plus the requests in flight. Waiting requests are served
+    by priority (`INTERACTIVE` before `BACKGROUND`), then in arrival order.
+    Rate limited, overloaded and transient network failures are retried with
+    jittered exponential backoff; a `Retry-After` header pauses the whole
+    budget for that long. Works from threads (`call`) and asyncio (`acall`).
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, dict]] = None,
+        max_retries: int = 6,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._budgets = {name: Budget(**kwargs) for name, kwargs in (limits or DEFAULT_LIMITS).items()}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    def configure(
+        self,
+        name: str,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ) -> None:
+        """Update the limits of a budget; None leaves a limit unchanged"""
+        with self._cond:
+            budget = self._budgets.setdefault(name, Budget())
+            if rpm is not None:
+                budget.rpm = rpm
+            if tpm is not None:
+                budget.tpm = tpm
+            if max_concurrency is not None:
+                budget.max_concurrency = max_concurrency
+            self._cond.notify_all()
+
+    def _grant(self, budget: Budget, ticket: tuple, tokens: int) -> Optional[float]:
+        """Start the request if `ticket` is next and the budget allows it; must hold the lock"""
+        if budget.waiting[0] != ticket:
+            return None
+        now = time.monotonic()
+        wait = budget.wait_time(tokens, now)
+        if wait != 0:
+            return wait
+
+        heapq.heappop(budget.waiting)
+        budget.in_flight += 1
+        budget.window.append([now, tokens])
+        self._cond.notify_all()
+        return 0.0
+
+    def _enqueue(self, name: str) -> Tuple[Budget, tuple]:
+        budget = self._budgets[name]
+        ticket = (_priority.get(), next(self._seq))
+        with self._cond:
+            heapq.heappush(budget.waiting, ticket)
+        return budget, ticket
+
+    def _dequeue(self, budget: Budget, ticket: tuple) -> None:
+        with self._cond:
+            if ticket in budget.waiting:
+                budget.waiting.remove(ticket)
+                heapq.heapify(budget.waiting)
+            self._cond.notify_all()
+
+    def acquire(self, name: str, tokens: int = 0) -> tuple:
+        budget, ticket = self._enqueue(name)
+        try:
+            with self._cond:
+                while True:
+                    wait = self._grant(budget, ticket, tokens)
+                    if wait == 0:
+                        return budget, budget.window[-1]
+                    self._cond.wait(timeout=min(wait, 1.0) if wait is not None else 1.0)
+        except BaseException:
+            self._dequeue(budget, ticket)
+            raise
+
+    async def acquire_async(self, name: str, tokens: int = 0) -> tuple:
+        budget, ticket = self._enqueue(name)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._grant(budget, ticket, tokens)
+                    if wait == 0:
+                        return budget, budget.window[-1]
+                # the event loop can't block on the condition, so poll
+                await asyncio.sleep(min(wait, 1.0) if wait is not None else 0.05)
+        except BaseException:
+            self._dequeue(budget, ticket)
+            raise
+
+    def release(self, slot: tuple, used_tokens: Optional[int] = None) -> None:
+        budget, entry = slot
+        with self._cond:
+            budget.in_flight -= 1
+            if used_tokens:
+                # replace the estimate with the usage OpenAI reported
+                entry[1] = used_tokens
+            self._cond.notify_all()
+
+    def _retry_delay(self, name: str, err: Exception, attempt: int) -> Optional[float]:
+        retryable, retry_after, rate_limited = _classify(err)
+        if not retryable or attempt >= self.max_retries:
+            return None
+
+        if retry_after is not None:
+            # jitter keeps requests that were told the same Retry-After from returning together
+            delay = retry_after + random.uniform(0, self.backoff)
+        else:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None or rate_limited:
+            # everyone sharing the budget backs off, not just this request
+            with self._cond:
+                budget = self._budgets[name]
+                budget.blocked_until = max(budget.blocked_until, time.monotonic() + delay)
+        logger.warning(f'OpenAI {name} request failed ({err}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s')
+        return delay
+
+    def _start(self, name: str, func: Callable[[], Any], tokens: int) -> Tuple[tuple, Any]:
+        """Run `func` in a slot of the `name` budget, retrying transient failures; the caller releases the slot"""
+        for attempt in itertools.count():
+            slot = self.acquire(name, tokens)
+            try:
+                return slot, func()
+            except Exception as err:
+                self.release(slot)
+                delay = self._retry_delay(name, err, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            except BaseException:
+                self.release(slot)
+                raise
+
+    def call(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None
+    ) -> Any:
+        """Run a blocking request within the `name` budget, retrying transient failures"""
+        slot, result = self._start(name, func, tokens)
+        self.release(slot, usage(result) if usage else None)
+        return result
+
+    def stream(self, name: str, func: Callable[[], Iterable[Any]], tokens: int = 0) -> Iterator[Any]:
+        """`call` for streamed responses: yields the items of the iterable `func` returns.
+
+        The request holds its slot until the stream is exhausted or closed,
+        so streams being read count against `max_concurrency`. Only failures
+        before the first item are retried.
+        """
+        slot, items = self._start(name, func, tokens)
+        try:
+            yield from items
+        finally:
+            self.release(slot)
+
+    async def acall(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None
+    ) -> Any:
+        """`call` for coroutines; `func` is called again for each attempt"""
+        for attempt in itertools.count():
+            slot = await self.acquire_async(name, tokens)
+            try:
+                result = await func()
+            except Exception as err:
+                self.release(slot)
+                delay = self._retry_delay(name, err, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.release(slot)
+                raise
+            self.release(slot, usage(result) if usage else None)
+            return result
+
+
+SCHEDULER = Scheduler()
@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, List
+from typing import Any, Optional, Dict, List, Union
 
 
 class Document(BaseModel):
@@ -10,6 +10,33 @@ class Document(BaseModel):
         None,
         description="Optional metadata dict"
     )
+    num_tokens: Optional[int] = Field(
+        None,
+        description="Cached token count of the document text"
+    )
+    chunks: Optional[List[str]] = Field(
+        None,
+        description="Cached TextSplitter chunks of the document text"
+    )
+    chunk_metadatas: Optional[List[Dict[str, Union[str, int]]]] = Field(
+        None,
+        description="Extra metadata for each chunk, e.g. page numbers"
+    )
+    page_offsets: Optional[List[int]] = Field(
+        None,
+        description="Character offset of each page in text (PDFs only)"
+    )
+    content_hash: Optional[str] = Field(
+        None,
+        description="sha256 of the full text, set when the text itself is not kept"
+    )
+
+
+class Chunk(BaseModel):
+    text: str
+    start: int
+    end: int
+    num_tokens: int
 
 
 class Summary(BaseModel):
@@ -26,13 +53,100 @@ class Indicators(BaseModel):
         None,
         description="Optional list of IP addresses"
     )
+    ipv6s: Optional[List[str]] = Field(
+        None,
+        description="Optional list of IPv6 addresses"
+    )
     urls: Optional[List[str]] = Field(
         None,
         description="Optional list of URLs"
     )
+    domains: Optional[List[str]] = Field(
+        None,
+        description="Optional list of domains"
+    )
+    emails: Optional[List[str]] = Field(
+        None,
+        description="Optional list of email addresses"
+    )
     hashes: Optional[List[str]] = Field(
         None,
-        description="Optional list of file hashes"
+        description="Optional list of file hashes (MD5, SHA1, SHA256, SHA512, ssdeep)"
+    )
+    cves: Optional[List[str]] = Field(
+        None,
+        description="Optional list of CVE IDs"
+    )
+
+
+class IOCHit(BaseModel):
+    indicator: str
+    kind: str
+    source: str
+    chunk_id: str
+
+
+class LexicalHit(BaseModel):
+    chunk_id: str
+    source: str
+    score: float
+
+
+class Citation(BaseModel):
+    number: int
+    source: str
+    pages: List[int] = Field(
+        default_factory=list,
+        description="PDF pages the cited passage spans"
+    )
+    chunk_ids: List[str] = Field(
+        default_factory=list,
+        description="IDs of the chunks merged into the cited passage"
+    )
+
+
+class SourceRecord(BaseModel):
+    source: str
+    content_hash: Optional[str] = None
+    fetched_at: datetime
+    chunk_ids: List[str] = Field(
+        default_factory=list,
+        description="IDs of the chunks stored for this source"
+    )
+    status: str
+
+
+class IngestResult(BaseModel):
+    source: str
+    success: bool
+    chunks: int = 0
+    skipped: bool = False
+    error: Optional[str] = Field(
+        None,
+        description="Error message if the source failed"
+    )
+
+
+class Job(BaseModel):
+    id: str
+    op: str
+    key: str = Field(
+        ...,
+        description="Hash of the operation and its parameters; identical requests share a job"
+    )
+    status: str
+    created: datetime
+    started: Optional[datetime] = None
+    finished: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    subscribers: int = Field(
+        1,
+        description="Number of requests coalesced into this job"
+    )
+    metrics: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Per-stage timings, token counts and estimated cost of the job"
     )
 
 
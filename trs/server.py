@@ -0,0 +1,205 @@
+import os
+import json
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, Optional
+
+from loguru import logger
+
+from .aio import AsyncTRS
+from .jobs import JobQueue, QueueFull, QUEUED, RUNNING
+from .metrics import METRICS
+from .prompts import custom_prompt_names
+from .schema import Job
+from .utils import is_url
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+
+def _job_response(job: Job, coalesced: bool = False) -> dict:
+    response = json.loads(job.json(exclude={'key'}))
+    response['coalesced'] = coalesced
+    return response
+
+
+async def _summarize(atrs: AsyncTRS, url: str) -> dict:
+    summary, mindmap, iocs = await atrs.summarize(url)
+    if summary is None and mindmap is None and iocs is None:
+        raise ValueError(f'Failed to process: {url}')
+    return {'summary': summary, 'mindmap': mindmap, 'iocs': iocs.dict() if iocs else None}
+
+
+async def _required(result: Awaitable[Any], error: str) -> Any:
+    value = await result
+    if value is None:
+        raise ValueError(error)
+    return value
+
+
+def resolve_source(source: Any, source_dir: Optional[str] = None) -> Optional[str]:
+    """The source to load for a client-supplied URL or path, or None if it is not allowed.
+
+    http(s) URLs are always allowed. Paths are only allowed when they
+    resolve to a file inside `source_dir`; relative paths are taken
+    relative to it.
+    """
+    if not isinstance(source, str):
+        return None
+    if is_url(source):
+        return source
+    if source_dir is None:
+        return None
+
+    root = os.path.realpath(source_dir)
+    path = os.path.realpath(os.path.join(root, source))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+async def _ingest(atrs: AsyncTRS, sources: List[str]) -> List[dict]:
+    results = await asyncio.to_thread(atrs.trs.ingest_many, sources)
+    return [result.dict() for result in results]
+
+
+def create_app(
+    atrs: AsyncTRS,
+    jobs: JobQueue,
+    max_wait: float = 60,
+    source_dir: Optional[str] = None
+) -> 'web.Application':
+    """Build the aiohttp application exposing TRS operations as JSON endpoints.
+
+    Each POST submits a job and returns `202` with its status, or `200` with
+    the result if the job finishes within `?wait=SECONDS` (capped at
+    `max_wait`). Identical requests that arrive while a job is queued or
+    running share that job. `GET /jobs/{id}` polls a job; finished jobs
+    include their stage timings, token counts and estimated cost.
+    `GET /metrics` serves aggregate metrics in the Prometheus text format.
+
+    Sources must be http(s) URLs, or paths to files inside `source_dir`
+    when it is set; anything else is rejected with `400`, as are unknown
+    prompt names.
+    """
+    from aiohttp import web
+
+    def bad_request(error: str) -> 'web.HTTPBadRequest':
+        return web.HTTPBadRequest(text=json.dumps({'error': error}), content_type='application/json')
+
+    async def submit(request: 'web.Request', op: str, params: dict, func: Callable[[], Awaitable[Any]]) -> 'web.Response':
+        try:
+            wait = min(float(request.query.get('wait', 0)), max_wait)
+        except ValueError:
+            return web.json_response({'error': 'wait must be a number of seconds'}, status=400)
+
+        try:
+            job, coalesced = jobs.submit(op, params, func)
+        except QueueFull as err:
+            return web.json_response({'error': str(err)}, status=429, headers={'Retry-After': '5'})
+
+        if wait > 0:
+            await jobs.wait(job, wait)
+
+        status = 202 if job.status in (QUEUED, RUNNING) else 200
+        return web.json_response(_job_response(job, coalesced), status=status)
+
+    async def read_params(request: 'web.Request', *fields: str) -> dict:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            body = None
+        if not isinstance(body, dict):
+            raise bad_request('Request body must be a JSON object')
+
+        missing = [field for field in fields if not body.get(field)]
+        if missing:
+            raise bad_request(f'Missing fields: {", ".join(missing)}')
+        return {field: body[field] for field in fields}
+
+    async def check_sources(sources: List[Any]) -> List[str]:
+        # resolving paths touches the filesystem
+        resolved = await asyncio.to_thread(lambda: [resolve_source(source, source_dir) for source in sources])
+        rejected = [str(source) for source, path in zip(sources, resolved) if path is None]
+        if rejected:
+            allowed = f'http(s) URLs or files in {source_dir}' if source_dir else 'http(s) URLs'
+            raise bad_request(f'Sources must be {allowed}: {", ".join(rejected)}')
+        return resolved
+
+    async def read_url(request: 'web.Request', *fields: str) -> dict:
+        params = await read_params(request, 'url', *fields)
+        [params['url']] = await check_sources([params['url']])
+        return params
+
+    async def summarize(request: 'web.Request') -> 'web.Response':
+        params = await read_url(request)
+        return await submit(request, 'summarize', params, lambda: _summarize(atrs, params['url']))
+
+    async def detect(request: 'web.Request') -> 'web.Response':
+        params = await read_url(request)
+        return await submit(
+            request, 'detect', params,
+            lambda: _required(atrs.detections(params['url']), f'Failed to process: {params["url"]}')
+        )
+
+    async def custom(request: 'web.Request') -> 'web.Response':
+        params = await read_url(request, 'prompt')
+        if params['prompt'] not in await asyncio.to_thread(custom_prompt_names):
+            return web.json_response({'error': f'Unknown prompt: {params["prompt"]}'}, status=400)
+        return await submit(
+            request, 'custom', params,
+            lambda: _required(atrs.custom(params['url'], params['prompt']), f'Failed to process: {params["url"]}')
+        )
+
+    async def qna(request: 'web.Request') -> 'web.Response':
+        params = await read_params(request, 'question')
+        return await submit(
+            request, 'qna', params,
+            lambda: _required(atrs.qna(params['question']), 'Failed to answer question')
+        )
+
+    async def ingest(request: 'web.Request') -> 'web.Response':
+        params = await read_params(request, 'sources')
+        if not isinstance(params['sources'], list):
+            return web.json_response({'error': 'sources must be a list'}, status=400)
+        params['sources'] = await check_sources(params['sources'])
+        return await submit(request, 'ingest', params, lambda: _ingest(atrs, params['sources']))
+
+    async def get_job(request: 'web.Request') -> 'web.Response':
+        job = jobs.get(request.match_info['job_id'])
+        if job is None:
+            return web.json_response({'error': 'Job not found'}, status=404)
+        return web.json_response(_job_response(job))
+
+    async def health(request: 'web.Request') -> 'web.Response':
+        return web.json_response({
+            'status': 'ok',
+            'pending': jobs.pending(),
+            'running': jobs.running(),
+            'max_queue': jobs.max_queue
+        })
+
+    async def metrics(request: 'web.Request') -> 'web.Response':
+        return web.Response(text=METRICS.prometheus(), headers={'Content-Type': 'text/plain; version=0.0.4'})
+
+    async def on_startup(app: 'web.Application') -> None:
+        jobs.start()
+
+    async def on_cleanup(app: 'web.Application') -> None:
+        await jobs.stop()
+        await atrs.close()
+        logger.info('Server stopped')
+
+    app = web.Application()
+    app.add_routes([
+        web.post('/summarize', summarize),
+        web.post('/detect', detect),
+        web.post('/custom', custom),
+        web.post('/qna', qna),
+        web.post('/ingest', ingest),
+        web.get('/jobs/{job_id}', get_job),
+        web.get('/health', health),
+        web.get('/metrics', metrics),
+    ])
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
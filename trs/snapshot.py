@@ -0,0 +1,171 @@
+import os
+import gzip
+import json
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Tuple
+
+from loguru import logger
+
+from .registry import SourceRegistry
+from .schema import SourceRecord
+
+if TYPE_CHECKING:
+    import numpy as np
+    from .iocindex import IOCIndex
+    from .lexical import LexicalIndex
+    from .vectordb import VectorDB
+
+
+# a snapshot is a directory of:
+#   manifest.json      format version, record count and embedding backend/model/dim
+#   embeddings.npy     float32 matrix, one row per record (memory-mappable with numpy)
+#   records.jsonl.gz   chunk ID, text and metadata per record, in the same order
+#   sources.jsonl      processed-source registry
+#   iocs.jsonl.gz      IOC index rows, so import doesn't re-extract indicators
+#   lexical.jsonl.gz   lexical index rows (pre-tokenized terms)
+SNAPSHOT_VERSION = 1
+MANIFEST = 'manifest.json'
+EMBEDDINGS = 'embeddings.npy'
+RECORDS = 'records.jsonl.gz'
+SOURCES = 'sources.jsonl'
+IOCS = 'iocs.jsonl.gz'
+LEXICAL = 'lexical.jsonl.gz'
+
+
+def export_snapshot(
+    vdb: 'VectorDB',
+    registry: SourceRegistry,
+    ioc_index: 'IOCIndex',
+    lexical: 'LexicalIndex',
+    path: str,
+    batch_size: int = 1000
+) -> dict:
+    """Stream a collection, its indexes and the source registry to a snapshot directory.
+
+    Records are read from Chroma `batch_size` at a time and written straight
+    to disk, so memory use does not grow with the collection.
+    """
+    import numpy as np
+
+    os.makedirs(path, exist_ok=True)
+    total = vdb.count()
+    matrix, written = None, 0
+
+    logger.info(f'Exporting {total} records to {path}')
+    with gzip.open(os.path.join(path, RECORDS), 'wt', encoding='utf-8') as records:
+        # records added while exporting are not included
+        while written < total:
+            results = vdb.collection.get(
+                limit=min(batch_size, total - written),
+                offset=written,
+                include=['documents', 'metadatas', 'embeddings']
+            )
+            if not results['ids']:
+                break
+
+            embeddings = np.asarray(results['embeddings'], dtype=np.float32)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    os.path.join(path, EMBEDDINGS), mode='w+', dtype=np.float32, shape=(total, embeddings.shape[1])
+                )
+            matrix[written:written + len(embeddings)] = embeddings
+
+            for node_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas']):
+                records.write(json.dumps({'id': node_id, 'text': text, 'metadata': metadata}) + '\n')
+            written += len(results['ids'])
+            logger.info(f'Exported {written}/{total} records')
+
+    dim = 0
+    if matrix is not None:
+        dim = matrix.shape[1]
+        matrix.flush()
+        del matrix
+
+    sources = 0
+    with open(os.path.join(path, SOURCES), 'w') as fp:
+        for record in registry.records():
+            fp.write(record.json() + '\n')
+            sources += 1
+
+    _write_rows(os.path.join(path, IOCS), ioc_index.iter_rows())
+    _write_rows(os.path.join(path, LEXICAL), lexical.iter_rows())
+
+    collection_metadata = vdb.collection.metadata or {}
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'created': datetime.now().isoformat(),
+        'collection': vdb.collection_name,
+        'count': written,
+        'sources': sources,
+        'embedding_backend': collection_metadata.get('embedding_backend', vdb.embeddings.name),
+        'embedding_model': collection_metadata.get('embedding_model', vdb.embeddings.model),
+        'embedding_dim': dim
+    }
+    with open(os.path.join(path, MANIFEST), 'w') as fp:
+        json.dump(manifest, fp, indent=2)
+
+    logger.success(f'Exported {written} records and {sources} sources to {path}')
+    return manifest
+
+
+def _write_rows(file_path: str, rows: Iterable[tuple]) -> None:
+    with gzip.open(file_path, 'wt', encoding='utf-8') as fp:
+        for row in rows:
+            fp.write(json.dumps(row) + '\n')
+
+
+def iter_rows(path: str, name: str, batch_size: int = 10000) -> Iterator[List[tuple]]:
+    """Yield batches of index rows (`IOCS` or `LEXICAL`) from a snapshot"""
+    batch = []
+    with gzip.open(os.path.join(path, name), 'rt', encoding='utf-8') as fp:
+        for line in fp:
+            batch.append(tuple(json.loads(line)))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST), 'r') as fp:
+        manifest = json.load(fp)
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f'Unsupported snapshot version: {manifest.get("version")}')
+    return manifest
+
+
+def iter_records(path: str, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[dict], 'np.ndarray']]:
+    """Yield `(ids, texts, metadatas, embeddings)` batches from a snapshot"""
+    manifest = read_manifest(path)
+    if not manifest['count']:
+        return
+
+    import numpy as np
+
+    matrix = np.load(os.path.join(path, EMBEDDINGS), mmap_mode='r')
+    offset, batch = 0, []
+    with gzip.open(os.path.join(path, RECORDS), 'rt', encoding='utf-8') as records:
+        for line in records:
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield _batch(batch, matrix, offset)
+                offset += len(batch)
+                batch = []
+    if batch:
+        yield _batch(batch, matrix, offset)
+
+
+def _batch(batch: List[dict], matrix: 'np.ndarray', offset: int) -> Tuple[List[str], List[str], List[dict], 'np.ndarray']:
+    return (
+        [record['id'] for record in batch],
+        [record['text'] for record in batch],
+        [record['metadata'] for record in batch],
+        matrix[offset:offset + len(batch)]
+    )
+
+
+def read_sources(path: str) -> List[SourceRecord]:
+    with open(os.path.join(path, SOURCES), 'r') as fp:
+        return [SourceRecord.parse_raw(line) for line in fp if line.strip()]
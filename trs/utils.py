@@ -0,0 +1,36 @@
+import hashlib
+
+from functools import lru_cache
+from typing import Any, Generator, Tuple
+from urllib.parse import urlsplit
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def is_url(source: str) -> bool:
+    """True for http(s) URLs; anything else is treated as a local file path"""
+    try:
+        return urlsplit(source).scheme.lower() in ('http', 'https')
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str):
+    """Load (once) and return a tiktoken encoding"""
+    import tiktoken
+    return tiktoken.get_encoding(encoding_name)
+
+
+def advance(steps: Generator, value: Any = None) -> Tuple[bool, Any]:
+    """Send `value` into a generator: `(False, yielded)`, or `(True, returned)` once it finishes.
+
+    Unlike `send()` this never raises StopIteration, which cannot cross
+    `asyncio.to_thread()`.
+    """
+    try:
+        return False, steps.send(value)
+    except StopIteration as stop:
+        return True, stop.value
@@ -1,22 +1,53 @@
-from typing import List, Tuple, Union, Dict
-from chromadb import PersistentClient, Settings
-from chromadb.utils import embedding_functions
+from typing import List, Optional, Tuple, Union, Dict
 from loguru import logger
 
-from uuid import uuid4
+from .embeddings import EmbeddingBackend, OpenAIEmbeddings
+from .metrics import span
+from .utils import sha256
+
+
+def chunk_id(text: str, source: str = '') -> str:
+    """Deterministic ID for a chunk of text from a given source"""
+    return sha256(f'{source}\0{text}')
+
+
+def build_where(
+    where: Optional[dict] = None,
+    source: Optional[str] = None,
+    doc_type: Optional[str] = None
+) -> Optional[dict]:
+    """Combine a Chroma `where` filter with source/type equality filters"""
+    filters = [where] if where else []
+    if source:
+        filters.append({'source': source})
+    if doc_type:
+        filters.append({'type': doc_type})
+
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return filters[0]
+    return {'$and': filters}
 
 
 class VectorDB:
-    def __init__(self, collection_name: str, db_dir: str, n_results: int = 5, openai_key: str = None) -> None:
-        self.embed_fn = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=openai_key,
-            model_name='text-embedding-ada-002'
-        )
+    def __init__(
+        self,
+        collection_name: str,
+        db_dir: str,
+        n_results: int = 5,
+        openai_key: str = None,
+        embeddings: Optional[EmbeddingBackend] = None
+    ) -> None:
+        from chromadb import PersistentClient, Settings
+
+        # embeddings are always computed here and passed to Chroma explicitly
+        self.embeddings = embeddings or OpenAIEmbeddings(api_key=openai_key)
         self.collection_name = collection_name
         self.db_dir = db_dir
         self.n_results = n_results
 
-        self.client: PersistentClient = PersistentClient(
+        self.client = PersistentClient(
             path=self.db_dir,
             settings=Settings(
                 anonymized_telemetry=False,
@@ -28,13 +59,58 @@ class VectorDB:
 
     def get_or_create_collection(self, name: str) -> 'Collection':  # Assuming `Collection` is the return type
         logger.info(f'Using collection: {name}')
-        self.collection = self.client.get_or_create_collection(
-            name=name,
-            embedding_function=self.embed_fn,
-            metadata={'hnsw:space': 'cosine'}
-        )
+        try:
+            # reopening must not pass metadata: Chroma would overwrite the recorded backend with it
+            self.collection = self.client.get_collection(name=name, embedding_function=None)
+        except Exception:
+            # missing collection; the exception type differs between Chroma versions
+            self.collection = self.client.create_collection(
+                name=name,
+                embedding_function=None,
+                metadata={'hnsw:space': 'cosine', **self.embeddings.describe()}
+            )
+        self._check_backend()
         return self.collection
 
+    def _check_backend(self) -> None:
+        """Refuse to mix vectors from different embedding backends in one collection"""
+        metadata = self.collection.metadata or {}
+        if 'embedding_backend' not in metadata:
+            if self.collection.count() == 0:
+                self._record_backend()
+                return
+            # collections created before backends were recorded used OpenAI ada-002
+            metadata = {
+                **metadata,
+                'embedding_backend': 'openai',
+                'embedding_model': 'text-embedding-ada-002',
+                'embedding_dim': 1536
+            }
+            self._record_backend(metadata)
+
+        backend = self.embeddings.describe()
+        same_model = (metadata['embedding_backend'], metadata['embedding_model']) == \
+            (backend['embedding_backend'], backend['embedding_model'])
+        same_dim = not metadata.get('embedding_dim') or not backend['embedding_dim'] or \
+            metadata['embedding_dim'] == backend['embedding_dim']
+        if not (same_model and same_dim):
+            raise ValueError(
+                f'Collection {self.collection.name} holds {metadata["embedding_backend"]}/{metadata["embedding_model"]} '
+                f'embeddings ({metadata.get("embedding_dim")} dims) but the {backend["embedding_backend"]}/'
+                f'{backend["embedding_model"]} backend is configured; use a separate collection or data directory'
+            )
+
+        if not metadata.get('embedding_dim') and backend['embedding_dim']:
+            self._record_backend()
+
+    def _record_backend(self, metadata: Optional[dict] = None) -> None:
+        metadata = {**(self.collection.metadata or {}), **(metadata or self.embeddings.describe())}
+        # the distance function can't be changed after creation, so leave hnsw settings out
+        try:
+            self.collection.modify(metadata={k: v for k, v in metadata.items() if not k.startswith('hnsw:')})
+        except Exception as err:
+            logger.warning(f'Failed to record embedding backend for collection: {err}')
+
     def count(self) -> int:
         return self.collection.count()
 
@@ -42,30 +118,130 @@ class VectorDB:
         logger.info('Getting all documents')
         return self.collection.get()
 
+    def list_records(self, limit: int = 100, offset: int = 0, where: Optional[dict] = None) -> List[dict]:
+        """Page through stored records without loading their embeddings"""
+        records = []
+        try:
+            results = self.collection.get(
+                limit=limit,
+                offset=offset,
+                where=where or None,
+                include=['documents', 'metadatas']
+            )
+            for node_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas']):
+                records.append({
+                    'id': node_id,
+                    'text': text,
+                    'metadata': metadata
+                })
+        except Exception as err:
+            logger.error(f'Failed to list records: {err}')
+        return records
+
+    def get_many(self, ids: List[str]) -> List[dict]:
+        """Fetch records by chunk ID, in the order given; unknown IDs are skipped"""
+        if not ids:
+            return []
+
+        try:
+            results = self.collection.get(ids=list(dict.fromkeys(ids)), include=['documents', 'metadatas'])
+        except Exception as err:
+            logger.error(f'Failed to get records: {err}')
+            return []
+
+        found = {
+            node_id: {'id': node_id, 'text': text, 'metadata': metadata, 'distance': None}
+            for node_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        }
+        return [found[node_id] for node_id in ids if node_id in found]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored embeddings by chunk ID"""
+        if not ids:
+            return {}
+
+        try:
+            results = self.collection.get(ids=list(dict.fromkeys(ids)), include=['embeddings'])
+        except Exception as err:
+            logger.error(f'Failed to get embeddings: {err}')
+            return {}
+        return {node_id: list(embedding) for node_id, embedding in zip(results['ids'], results['embeddings'])}
+
+    def _existing_embeddings(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Look up stored embeddings for chunk text hashes"""
+        found = {}
+        try:
+            results = self.collection.get(
+                where={'hash': {'$in': hashes}},
+                include=['metadatas', 'embeddings']
+            )
+            for metadata, embedding in zip(results['metadatas'], results['embeddings']):
+                found[metadata['hash']] = list(embedding)
+        except Exception as err:
+            logger.warning(f'Failed to look up existing embeddings: {err}')
+        return found
+
     def add_texts(self, texts: List[str], metadatas: List[dict]) -> Tuple[bool, List[str]]:
+        """Add texts to the collection, embedding only chunk text not already stored"""
         success = False
         logger.info(f'Adding {len(texts)} texts')
-        ids = [str(uuid4()) for _ in range(len(texts))]
-        
+        hashes = [sha256(text) for text in texts]
+        ids = [chunk_id(text, metadata.get('source', '')) for text, metadata in zip(texts, metadatas)]
+
         try:
-            self.collection.add(
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
+            # skip chunks already stored for this source (and duplicates within the batch)
+            existing_ids = set(self.collection.get(ids=list(set(ids)), include=[])['ids'])
+            new_idx = {}
+            for idx, node_id in enumerate(ids):
+                if node_id not in existing_ids and node_id not in new_idx:
+                    new_idx[node_id] = idx
+
+            if not new_idx:
+                logger.info('All texts already stored; skipping insert')
+                return (True, ids)
+
+            # reuse embeddings of identical chunk text stored under any source
+            new_hashes = {hashes[idx]: texts[idx] for idx in new_idx.values()}
+            embeddings = self._existing_embeddings(list(new_hashes))
+            missing = [text_hash for text_hash in new_hashes if text_hash not in embeddings]
+            logger.info(f'Embedding {len(missing)} new texts ({len(new_hashes) - len(missing)} reused)')
+            if missing:
+                missing_texts = [new_hashes[text_hash] for text_hash in missing]
+                first_vectors = not (self.collection.metadata or {}).get('embedding_dim')
+                vectors = self.embeddings.embed(missing_texts)
+                embeddings.update(zip(missing, vectors))
+                if first_vectors and vectors:
+                    self._check_backend()
+
+            with span('vdb_add'):
+                self.collection.add(
+                    documents=[texts[idx] for idx in new_idx.values()],
+                    embeddings=[embeddings[hashes[idx]] for idx in new_idx.values()],
+                    metadatas=[{**metadatas[idx], 'hash': hashes[idx]} for idx in new_idx.values()],
+                    ids=list(new_idx)
+                )
             success = True
         except Exception as err:
             logger.error(f'Failed to add texts to collection: {err}')
 
         return (success, ids)
 
-    def add_embeddings(self, texts: List[str], embeddings: List[List[float]], metadatas: List[dict]) -> Tuple[bool, List[str]]:
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict],
+        ids: Optional[List[str]] = None
+    ) -> Tuple[bool, List[str]]:
+        """Upsert precomputed embeddings; `ids` keeps existing chunk IDs (e.g. from a snapshot)"""
         success = False
         logger.info(f'Adding {len(texts)} embeddings')
-        ids = [str(uuid4()) for _ in range(len(texts))]
+        if ids is None:
+            ids = [chunk_id(text, metadata.get('source', '')) for text, metadata in zip(texts, metadatas)]
+        metadatas = [{**metadata, 'hash': sha256(text)} for text, metadata in zip(texts, metadatas)]
 
         try:
-            self.collection.add(
+            self.collection.upsert(
                 documents=texts,
                 embeddings=embeddings,
                 metadatas=metadatas,
@@ -77,31 +253,53 @@ class VectorDB:
 
         return (success, ids)
 
-    def query(self, text: str) -> List[dict]:
-        flattened = []
+    def query(self, text: str, n_results: Optional[int] = None, where: Optional[dict] = None) -> List[dict]:
         logger.info(f'Querying database for: {text}')
+        return self.query_many([text], n_results=n_results, where=where)[0]
+
+    def query_many(
+        self,
+        texts: List[str],
+        n_results: Optional[int] = None,
+        where: Optional[dict] = None,
+        source: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ) -> List[List[dict]]:
+        """Query with several texts at once; all texts are embedded in one batch.
+
+        Pass precomputed query `embeddings` to skip the embedding call.
+        """
+        logger.info(f'Querying database for {len(texts)} texts')
         try:
-            results = self.collection.query(
-                query_texts=[text],
-                n_results=self.n_results)
-
-            logger.info(f'Found {len(results["ids"][0])} results')
-
-            for node_id, text, metadata, distance in zip(
-                results["ids"][0],
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0],
-            ):
-                flattened.append({
+            if embeddings is None:
+                embeddings = self.embeddings.embed(texts)
+            with span('vdb_query'):
+                results = self.collection.query(
+                    query_embeddings=embeddings,
+                    n_results=n_results or self.n_results,
+                    where=build_where(where=where, source=source, doc_type=doc_type)
+                )
+        except Exception as err:
+            logger.error(f'Failed to query database: {err}')
+            return [[] for _ in texts]
+
+        all_flattened = []
+        for ids, documents, metadatas, distances in zip(
+            results["ids"],
+            results["documents"],
+            results["metadatas"],
+            results["distances"],
+        ):
+            logger.info(f'Found {len(ids)} results')
+            all_flattened.append([
+                {
                     'id': node_id,
                     'text': text,
                     'metadata': metadata,
                     'distance': distance
-                })
-
-            return flattened
+                }
+                for node_id, text, metadata, distance in zip(ids, documents, metadatas, distances)
+            ])
 
-        except Exception as err:
-            logger.error(f'Failed to query database: {err}')
-            return []
+        return all_flattened